@@ -0,0 +1,54 @@
+"""Benchmark finding the packages that autoscan scans.
+
+Compares finding the distributions that depend on Morepath with
+:mod:`pkg_resources`, with :mod:`importlib.metadata`, and with a
+cache file, and prints the time it takes to scan each package. As
+this is about startup, each way is timed in a new process, including
+the imports it needs, but not the import of Morepath itself.
+"""
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+import tempfile
+
+from morepath.autosetup import autoscan, morepath_distributions
+
+
+CODE = """
+from timeit import default_timer as timer
+from morepath import autosetup
+start = timer()
+%s
+print(timer() - start)
+"""
+
+
+def cold(code, repeat=5):
+    """Time code in new processes and return the fastest time.
+    """
+    return min(
+        float(subprocess.check_output([sys.executable, '-c', CODE % code]))
+        for i in range(repeat))
+
+
+def main():
+    cache = os.path.join(tempfile.mkdtemp(), 'autoscan.json')
+    morepath_distributions(cache)
+    for label, code in [
+            ('pkg_resources',
+             "autosetup.pkg_resources_distributions('morepath')"),
+            ('importlib.metadata',
+             "autosetup.metadata_distributions('morepath')"),
+            ('cache',
+             "autosetup.morepath_distributions(%r)" % cache)]:
+        print("%-40s %10.2f msec" % (label, cold(code) * 1e3))
+    os.remove(cache)
+
+    for name, duration in autoscan():
+        print("scan %-35s %10.2f msec" % (name, duration * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""Helpers shared by the benchmark scripts.
+
+The scripts in this directory are run directly, for instance::
+
+  $ python benchmark/traject.py
+"""
+from __future__ import print_function
+
+import timeit
+
+
+def bench(label, func, number=10000, repeat=3):
+    """Time a function and print the result.
+
+    :param label: label to print with the result.
+    :param func: function without arguments to time.
+    :param number: amount of calls per timing run.
+    :param repeat: amount of timing runs; the fastest run is reported.
+    :return: the time per call in seconds.
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    per_call = best / number
+    print("%-40s %10.2f usec/call" % (label, per_call * 1e6))
+    return per_call
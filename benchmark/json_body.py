@@ -0,0 +1,95 @@
+"""Benchmark reading a large JSON array request body.
+
+Compares the peak memory use and time of loading all items of a
+JSON array body with :attr:`morepath.Request.body_obj` and iterating
+over them with :meth:`morepath.Request.iter_body_objs`, with the
+``stream_arrays`` setting in the ``json`` section.
+"""
+from __future__ import print_function
+
+import io
+import json
+import time
+import tracemalloc
+
+import morepath
+from webob import BaseRequest
+
+
+class Item(object):
+    def __init__(self, id, title):
+        self.id = id
+        self.title = title
+
+
+def create_app(stream_arrays):
+    class App(morepath.App):
+        pass
+
+    @App.setting(section='json', name='stream_arrays')
+    def get_stream_arrays():
+        return stream_arrays
+
+    @App.load_json()
+    def load_json(json, request):
+        if isinstance(json, dict):
+            return Item(json['id'], json['title'])
+        return json
+
+    App.commit()
+    return App()
+
+
+def measure(label, func):
+    tracemalloc.start()
+    start = time.time()
+    count = func()
+    duration = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("%-40s %8.2f sec %10.1f MB peak %10d items" % (
+        label, duration, peak / 1e6, count))
+
+
+def main():
+    for amount in (10000, 100000, 500000):
+        body = json.dumps([
+            {'id': i, 'title': 'Item %s' % i, 'tags': ['a', 'b', 'c']}
+            for i in range(amount)]).encode('utf-8')
+        print("%s items, %.1f MB body" % (amount, len(body) / 1e6))
+
+        def environ():
+            result = BaseRequest.blank(
+                '/', method='POST', content_type='application/json',
+                body=b'').environ
+            result['wsgi.input'] = io.BytesIO(body)
+            result['CONTENT_LENGTH'] = str(len(body))
+            return result
+
+        app = create_app(False)
+
+        def body_obj():
+            request = app.request(environ())
+            count = 0
+            # load_json gets the whole array, so convert the items here
+            for item in request.body_obj:
+                app._load_json(item, request)
+                count += 1
+            return count
+
+        measure("body_obj", body_obj)
+
+        app = create_app(True)
+
+        def iter_body_objs():
+            request = app.request(environ())
+            count = 0
+            for item in request.iter_body_objs():
+                count += 1
+            return count
+
+        measure("iter_body_objs", iter_body_objs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark rendering JSON responses.
+
+Renders a page of documents with nested authors and comments with
+:func:`morepath.render_json`, with the ``encoder`` and ``recursive``
+settings in the ``json`` section:
+
+* the default: the ``dump_json`` of the page builds the whole
+  structure, calling ``dump_json`` for the nested objects itself,
+
+* ``recursive``: each ``dump_json`` returns nested model objects,
+  which the encoder passes back to ``dump_json``,
+
+* a compact encoder, and the encoders of orjson, ujson or rapidjson
+  if they are installed.
+"""
+from __future__ import print_function
+
+import json
+
+import morepath
+from webob import BaseRequest
+
+from benchutil import bench
+
+
+class Author(object):
+    def __init__(self, id):
+        self.id = id
+        self.name = 'Author %s' % id
+        self.email = 'author%s@example.com' % id
+
+
+class Comment(object):
+    def __init__(self, id, author):
+        self.id = id
+        self.author = author
+        self.text = u'Comment %s with some text \xe9' % id
+
+
+class Document(object):
+    def __init__(self, id, author):
+        self.id = id
+        self.title = 'Document %s' % id
+        self.author = author
+        self.tags = ['tag%s' % i for i in range(5)]
+        self.published = True
+        self.score = id * 1.5
+        self.comments = [Comment(i, author) for i in range(5)]
+
+
+class Page(object):
+    def __init__(self, size):
+        authors = [Author(i) for i in range(10)]
+        self.documents = [Document(i, authors[i % 10]) for i in range(size)]
+
+
+def create_app(recursive, encoder):
+    class App(morepath.App):
+        pass
+
+    @App.setting_section(section='json')
+    def get_json_settings():
+        return {'recursive': recursive, 'encoder': encoder}
+
+    if recursive:
+        def nested(obj, request):
+            return obj
+    else:
+        def nested(obj, request):
+            return request.app._dump_json(obj, request)
+
+    @App.dump_json(model=Page)
+    def dump_page(self, request):
+        return {'documents': [nested(document, request)
+                              for document in self.documents]}
+
+    @App.dump_json(model=Document)
+    def dump_document(self, request):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'author': nested(self.author, request),
+            'tags': self.tags,
+            'published': self.published,
+            'score': self.score,
+            'comments': [nested(comment, request)
+                         for comment in self.comments],
+        }
+
+    @App.dump_json(model=Comment)
+    def dump_comment(self, request):
+        return {
+            'id': self.id,
+            'author': nested(self.author, request),
+            'text': self.text,
+        }
+
+    @App.dump_json(model=Author)
+    def dump_author(self, request):
+        return {'id': self.id, 'name': self.name, 'email': self.email}
+
+    App.commit()
+    return App()
+
+
+def encoders():
+    result = [
+        ('json.dumps', json.dumps),
+        ('compact', json.JSONEncoder(separators=(',', ':')).encode),
+    ]
+    # optional fast encoders that take a default hook
+    for name in ('orjson', 'ujson', 'rapidjson'):
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+        result.append((name, module.dumps))
+    return result
+
+
+def main():
+    for size in (10, 100):
+        page = Page(size)
+        for name, encoder in encoders():
+            for recursive in (False, True):
+                if recursive and name == 'compact':
+                    # JSONEncoder.encode has no default argument
+                    continue
+                app = create_app(recursive, encoder)
+                request = app.request(BaseRequest.blank('/').environ)
+
+                def render():
+                    return morepath.render_json(page, request)
+
+                bench("%s docs, %s%s" % (
+                    size, name, ', recursive' if recursive else ''),
+                    render, number=200)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark rendering a large JSON array.
+
+Compares the peak memory use and time of rendering a list of dumped
+items with :func:`morepath.render_json` and rendering a generator of
+items with :func:`morepath.render_json_stream`.
+"""
+from __future__ import print_function
+
+import time
+import tracemalloc
+
+import morepath
+from webob import BaseRequest
+
+
+class Item(object):
+    def __init__(self, id):
+        self.id = id
+
+
+def create_app():
+    class App(morepath.App):
+        pass
+
+    @App.dump_json(model=Item)
+    def dump_item_json(self, request):
+        return {'id': self.id, 'title': 'Item %s' % self.id}
+
+    App.commit()
+    return App()
+
+
+def measure(label, func):
+    tracemalloc.start()
+    start = time.time()
+    size = func()
+    duration = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("%-40s %8.2f sec %10.1f MB peak %10d bytes" % (
+        label, duration, peak / 1e6, size))
+
+
+def main():
+    app = create_app()
+    request = app.request(BaseRequest.blank('/').environ)
+
+    for amount in (10000, 100000, 1000000):
+        def render():
+            # without streaming the view has to dump the items itself
+            items = [app._dump_json(Item(i), request) for i in range(amount)]
+            return len(morepath.render_json(items, request).body)
+
+        def render_stream():
+            items = (Item(i) for i in range(amount))
+            response = morepath.render_json_stream(items, request)
+            return sum(len(chunk) for chunk in response.app_iter)
+
+        measure("render_json, %d items" % amount, render)
+        measure("render_json_stream, %d items" % amount, render_stream)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark creating many links.
+
+Compares :meth:`morepath.Request.link_many` and
+:meth:`morepath.Request.class_link_many` with calling
+:meth:`morepath.Request.link` and :meth:`morepath.Request.class_link`
+for each item, in a root app, in a mounted app and in an app that is
+mounted five levels deep.
+"""
+from __future__ import print_function
+
+import morepath
+from webob import BaseRequest
+
+from benchutil import bench
+
+
+class Document(object):
+    def __init__(self, id, page=0):
+        self.id = id
+        self.page = page
+
+
+def create_apps():
+    class Root(morepath.App):
+        pass
+
+    class Sub(morepath.App):
+        def __init__(self, name):
+            self.name = name
+
+    for app_class in (Root, Sub):
+        @app_class.path(model=Document, path='documents/{id}')
+        def get_document(id, page=0):
+            return Document(id, page)
+
+    @Root.mount(app=Sub, path='sub/{name}',
+                variables=lambda a: {'name': a.name})
+    def mount_sub(name):
+        return Sub(name)
+
+    Root.commit()
+    root = Root()
+    return root, root.child(Sub, name='foo')
+
+
+def create_deep_app(depth=5):
+    class Level(morepath.App):
+        def __init__(self, name):
+            self.name = name
+
+    @Level.path(model=Document, path='documents/{id}')
+    def get_document(id, page=0):
+        return Document(id, page)
+
+    @Level.mount(app=Level, path='level/{name}',
+                 variables=lambda a: {'name': a.name})
+    def mount_level(name):
+        return Level(name)
+
+    Level.commit()
+    app = Level('root')
+    for i in range(depth):
+        app = app.child(Level, name=str(i))
+    return app
+
+
+def main():
+    root, sub = create_apps()
+    deep = create_deep_app()
+    request = root.request(BaseRequest.blank('/').environ)
+    documents = [Document(str(i), i % 3) for i in range(1000)]
+    variables = [{'id': str(i), 'page': i % 3} for i in range(1000)]
+
+    for label, app in (('root', root), ('mounted', sub), ('deep', deep)):
+        bench("link x 1000, %s" % label,
+              lambda: [request.link(obj, app=app) for obj in documents],
+              number=20)
+        bench("link_many 1000, %s" % label,
+              lambda: request.link_many(documents, app=app),
+              number=20)
+        bench("class_link x 1000, %s" % label,
+              lambda: [request.class_link(Document, dict(v), app=app)
+                       for v in variables],
+              number=20)
+        bench("class_link_many 1000, %s" % label,
+              lambda: request.class_link_many(
+                  Document, [dict(v) for v in variables], app=app),
+              number=20)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Benchmark decoding URL parameters.
+
+Measures :class:`morepath.traject.ParameterFactory` for a path without
+parameters, with a few parameters and with extra parameters.
+"""
+from __future__ import print_function
+
+import morepath
+from morepath.converter import Converter, ListConverter
+from morepath.traject import ParameterFactory
+
+from benchutil import bench
+
+
+def main():
+    app = morepath.App()
+
+    no_params = ParameterFactory({}, {}, [])
+    no_params_request = morepath.Request.blank('/items', app=app)
+
+    names = ['p%s' % i for i in range(15)]
+    converters = {name: Converter(int) for name in names[:5]}
+    converters['tags'] = ListConverter(Converter(str))
+    parameters = dict.fromkeys(names)
+    parameters['tags'] = []
+    few_params = ParameterFactory(parameters, converters, ['p0'])
+    few_params_request = morepath.Request.blank(
+        '/items?p0=1&p1=2&p3=4&p7=foo&p9=bar&tags=a&tags=b', app=app)
+
+    extra_params = ParameterFactory(parameters, converters, ['p0'], True)
+    extra_params_request = morepath.Request.blank(
+        '/items?p0=1&p1=2&p3=4&p7=foo&p9=bar&tags=a&tags=b'
+        '&x=1&y=2&z=3', app=app)
+
+    bench("no parameters", lambda: no_params(no_params_request))
+    bench("few parameters", lambda: few_params(few_params_request))
+    bench("extra parameters", lambda: extra_params(extra_params_request))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark a page that checks the same permissions many times.
+
+Compares checking permissions with :meth:`morepath.Request.permits`
+with and without the ``memoize`` setting in the ``permission``
+section, for a permission rule that takes some time.
+"""
+from __future__ import print_function
+
+import time
+
+import morepath
+from webob import BaseRequest
+
+from benchutil import bench
+
+
+class Document(object):
+    def __init__(self, id):
+        self.id = id
+
+
+class Edit(object):
+    pass
+
+
+def create_app(memoize):
+    class App(morepath.App):
+        pass
+
+    @App.setting(section='permission', name='memoize')
+    def get_memoize():
+        return memoize
+
+    documents = [Document(i) for i in range(10)]
+
+    @App.path(model=Document, path='documents/{id}')
+    def get_document(id):
+        return Document(id)
+
+    @App.permission_rule(model=Document, permission=Edit, identity=None)
+    def may_edit(identity, model, permission):
+        # stands in for looking up an access control list
+        time.sleep(0.00001)
+        return model.id % 2 == 0
+
+    @App.view(model=Document)
+    def document_default(self, request):
+        # every document is shown five times on the page
+        return ''.join(str(request.permits(document, Edit))
+                       for i in range(5) for document in documents)
+
+    App.commit()
+    return App()
+
+
+def main():
+    for memoize in (False, True):
+        app = create_app(memoize)
+
+        def page():
+            return BaseRequest.blank('/documents/1').get_response(app)
+
+        assert page().status_code == 200
+        bench("page, memoize=%s" % memoize, page, number=200)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark the first request of forked worker processes.
+
+Uses the application with many mounted apps from ``startup.py``. A
+master process creates the application and forks workers, like a
+pre-fork server. Each worker handles a request to each mounted app
+and reports how long that took. Compares not preparing the app in the
+master, committing it in the master, and using
+:func:`morepath.prefork.prepare_for_fork`. Only works where
+:func:`os.fork` is available.
+"""
+from __future__ import print_function
+
+import os
+import timeit
+
+from morepath.prefork import prepare_for_fork
+from webtest import TestApp as Client
+
+import startup
+
+
+WORKERS = 4
+
+
+def worker(app, write):
+    client = Client(app)
+    start = timeit.default_timer()
+    for i in range(startup.MOUNTED):
+        client.get('/sub%s/model0/1' % i)
+    duration = timeit.default_timer() - start
+    os.write(write, ('%r\n' % duration).encode('ascii'))
+
+
+def fork_workers(app):
+    read, write = os.pipe()
+    pids = []
+    for i in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker(app, write)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    os.close(write)
+    with os.fdopen(read) as f:
+        return [float(line) for line in f]
+
+
+def main():
+    for label, prepare in [
+            ('not prepared', lambda app: None),
+            ('commit', lambda app: app.commit()),
+            ('prepare_for_fork', prepare_for_fork)]:
+        app = startup.make_app()()
+        prepare(app)
+        durations = fork_workers(app)
+        print("%-40s %10.2f msec/worker" % (
+            label, sum(durations) / len(durations) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""Benchmark publishing requests end to end.
+
+Drives :meth:`morepath.App.__call__` with WSGI environs for a number
+of scenarios, and reports for each scenario:
+
+* the amount of requests per second through the WSGI interface,
+
+* the time per request spent in each stage of publishing: routing
+  (:func:`morepath.publish.resolve_model`), view lookup (including
+  decoding a JSON body for the ``body_model`` predicate), rendering
+  (calling the view, including permission checks and exception views)
+  and producing the WSGI response,
+
+* the peak memory allocated while handling a request, and the amount
+  of memory blocks still allocated after handling many requests, as
+  traced by :mod:`tracemalloc`.
+
+Run it with ``--output`` to write the results to a JSON file, and with
+``--compare`` to compare the results with an earlier JSON file::
+
+  $ python benchmark/publish.py --output before.json
+  $ python benchmark/publish.py --compare before.json
+"""
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+
+import morepath
+import pkg_resources
+from morepath.publish import resolve_model, get_view_name
+from webob import BaseRequest
+
+
+timer = timeit.default_timer
+
+
+class Document(object):
+    def __init__(self, id, page=0):
+        self.id = id
+        self.page = page
+
+
+class Collection(object):
+    def __init__(self):
+        self.documents = [Document(i) for i in range(10)]
+
+
+class Item(object):
+    def __init__(self, title):
+        self.title = title
+
+
+class Edit(object):
+    pass
+
+
+class Conflict(Exception):
+    pass
+
+
+def static_route():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Collection, path='documents')
+    def get_collection():
+        return Collection()
+
+    @App.view(model=Collection)
+    def collection_default(self, request):
+        return "Collection"
+
+    return App(), 'GET', '/documents', None
+
+
+def variable_route():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Document, path='documents/{id}', converters={'id': int})
+    def get_document(id, page=0):
+        return Document(id, page)
+
+    @App.view(model=Document)
+    def document_default(self, request):
+        return "Document %s, page %s" % (self.id, self.page)
+
+    return App(), 'GET', '/documents/12?page=3', None
+
+
+def deep_mount(depth=5):
+    class Level(morepath.App):
+        def __init__(self, name):
+            self.name = name
+
+    @Level.path(model=Document, path='documents/{id}')
+    def get_document(id):
+        return Document(id)
+
+    @Level.json(model=Document)
+    def document_default(self, request):
+        return {'id': self.id, 'link': request.link(self)}
+
+    @Level.mount(app=Level, path='level/{name}',
+                 variables=lambda a: {'name': a.name})
+    def mount_level(name):
+        return Level(name)
+
+    path = ''.join('/level/%s' % i for i in range(depth))
+    return Level('root'), 'GET', path + '/documents/1', None
+
+
+def defer_links():
+    class Root(morepath.App):
+        pass
+
+    class Sub(morepath.App):
+        pass
+
+    @Root.path(model=Collection, path='documents')
+    def get_collection():
+        return Collection()
+
+    @Root.json(model=Collection)
+    def collection_default(self, request):
+        return [request.link(document) for document in self.documents]
+
+    @Root.mount(app=Sub, path='sub')
+    def mount_sub():
+        return Sub()
+
+    @Root.defer_links(model=Document)
+    def defer_document(app, obj):
+        return app.child(Sub())
+
+    @Sub.path(model=Document, path='documents/{id}')
+    def get_document(id):
+        return Document(id)
+
+    return Root(), 'GET', '/documents', None
+
+
+def json_body_model():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Collection, path='documents')
+    def get_collection():
+        return Collection()
+
+    @App.load_json()
+    def load_json(json, request):
+        if json.get('@type') == 'Item':
+            return Item(json['title'])
+        return json
+
+    @App.dump_json(model=Item)
+    def dump_item_json(self, request):
+        return {'@type': 'Item', 'title': self.title}
+
+    @App.json(model=Collection, request_method='POST', body_model=Item)
+    def collection_post(self, request):
+        return request.body_obj
+
+    body = json.dumps({'@type': 'Item', 'title': 'Hello'}).encode('utf-8')
+    return App(), 'POST', '/documents', body
+
+
+def plain_post():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Collection, path='documents')
+    def get_collection():
+        return Collection()
+
+    @App.view(model=Collection, request_method='POST')
+    def collection_post(self, request):
+        return "Uploaded %s bytes" % request.content_length
+
+    body = json.dumps([{'id': i, 'title': 'Document %s' % i}
+                       for i in range(1000)]).encode('utf-8')
+    return App(), 'POST', '/documents', body
+
+
+def permission():
+    class App(morepath.App):
+        pass
+
+    @App.identity_policy()
+    class IdentityPolicy(object):
+        def identify(self, request):
+            return morepath.Identity('editor')
+
+        def remember(self, response, request, identity):
+            pass
+
+        def forget(self, response, request):
+            pass
+
+    @App.verify_identity()
+    def verify_identity(identity):
+        return True
+
+    @App.path(model=Document, path='documents/{id}')
+    def get_document(id):
+        return Document(id)
+
+    @App.permission_rule(model=Document, permission=Edit)
+    def may_edit(identity, model, permission):
+        return identity.userid == 'editor'
+
+    @App.view(model=Document, name='edit', permission=Edit)
+    def document_edit(self, request):
+        return "Editing %s" % self.id
+
+    return App(), 'GET', '/documents/1/edit', None
+
+
+def exception_view():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Document, path='documents/{id}')
+    def get_document(id):
+        return Document(id)
+
+    @App.view(model=Document)
+    def document_default(self, request):
+        raise Conflict()
+
+    @App.view(model=Conflict)
+    def conflict(self, request):
+        @request.after
+        def set_status(response):
+            response.status_code = 409
+        return "Conflict"
+
+    return App(), 'GET', '/documents/1', None
+
+
+SCENARIOS = [
+    ('static_route', static_route),
+    ('variable_route', variable_route),
+    ('deep_mount', deep_mount),
+    ('defer_links', defer_links),
+    ('json_body_model', json_body_model),
+    ('plain_post', plain_post),
+    ('permission', permission),
+    ('exception_view', exception_view),
+]
+
+
+def environ_factory(method, path, body):
+    """Make a function that creates fresh WSGI environs for a request.
+    """
+    kw = {'method': method}
+    if body is not None:
+        kw['body'] = body
+        kw['content_type'] = 'application/json'
+    template = BaseRequest.blank(path, **kw).environ
+    body = body or b''
+
+    def make_environ():
+        environ = template.copy()
+        environ['wsgi.input'] = io.BytesIO(body)
+        return environ
+    return make_environ
+
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+
+def handle(app, environ):
+    return b''.join(app(environ, start_response))
+
+
+def requests_per_second(app, make_environ, number, repeat):
+    best = min(timeit.repeat(lambda: handle(app, make_environ()),
+                             number=number, repeat=repeat))
+    return number / best
+
+
+def stage_times(app, make_environ, number):
+    """Time the stages of publishing, per request in microseconds.
+
+    This follows what :func:`morepath.publish.publish` and the
+    exception view tween do, with timing in between.
+    """
+    routing = view_lookup = render = response = 0.0
+    for i in range(number):
+        environ = make_environ()
+        request = app.request(environ)
+        t0 = timer()
+        obj = resolve_model(request)
+        t1 = timer()
+        request.view_name = get_view_name(request.unconsumed)
+        view = request.app.config.view_lookup.view(
+            request.app, obj, request)
+        t2 = timer()
+        try:
+            result = view(request.app, obj, request)
+        except Exception as exc:
+            exc_view = request.app.get_view.component_by_keys(
+                model=exc.__class__)
+            request.clear_after()
+            result = exc_view(app, exc, request)
+        t3 = timer()
+        b''.join(result(environ, start_response))
+        t4 = timer()
+        routing += t1 - t0
+        view_lookup += t2 - t1
+        render += t3 - t2
+        response += t4 - t3
+    return {
+        'routing_usec': routing / number * 1e6,
+        'view_lookup_usec': view_lookup / number * 1e6,
+        'render_usec': render / number * 1e6,
+        'response_usec': response / number * 1e6,
+    }
+
+
+def memory(app, make_environ, number):
+    """Trace memory allocated while handling requests.
+    """
+    handle(app, make_environ())
+    environ = make_environ()
+    tracemalloc.start()
+    try:
+        handle(app, environ)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for i in range(number):
+            handle(app, make_environ())
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = sum(stat.count_diff
+                   for stat in after.compare_to(before, 'filename'))
+    return {
+        'peak_bytes': peak,
+        'retained_blocks': retained,
+    }
+
+
+def run(names, number, repeat):
+    results = {}
+    for name, scenario in SCENARIOS:
+        if names and name not in names:
+            continue
+        app, method, path, body = scenario()
+        app.commit()
+        make_environ = environ_factory(method, path, body)
+        status = []
+        app(make_environ(), lambda s, h, e=None: status.append(s))
+        result = {
+            'status': status[0],
+            'requests_per_second': requests_per_second(
+                app, make_environ, number, repeat),
+        }
+        result.update(stage_times(app, make_environ, number))
+        result.update(memory(app, make_environ, number))
+        results[name] = result
+    return results
+
+
+def report(results, previous=None):
+    print("%-16s %10s %9s %9s %9s %9s %10s %9s" % (
+        'scenario', 'req/s', 'route us', 'view us', 'render us', 'resp us',
+        'peak KB', 'retained'))
+    for name, scenario in SCENARIOS:
+        if name not in results:
+            continue
+        result = results[name]
+        line = "%-16s %10.0f %9.2f %9.2f %9.2f %9.2f %10.1f %9d" % (
+            name, result['requests_per_second'],
+            result['routing_usec'], result['view_lookup_usec'],
+            result['render_usec'], result['response_usec'],
+            result['peak_bytes'] / 1024.0, result['retained_blocks'])
+        if previous is not None and name in previous:
+            before = previous[name]['requests_per_second']
+            change = (result['requests_per_second'] - before) / before
+            line += " %+6.1f%%" % (change * 100)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('scenarios', nargs='*',
+                        help="scenarios to run (default: all)")
+    parser.add_argument('-n', '--number', type=int, default=2000,
+                        help="requests per timing run")
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help="timing runs; the fastest is reported")
+    parser.add_argument('-o', '--output',
+                        help="write the results to this JSON file")
+    parser.add_argument('-c', '--compare',
+                        help="compare requests per second with this "
+                        "JSON file")
+    args = parser.parse_args()
+
+    results = run(args.scenarios, args.number, args.repeat)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+    report(results, previous)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'morepath': pkg_resources.get_distribution(
+                    'morepath').version,
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'argv': sys.argv[1:],
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark constructing requests.
+
+Constructs :class:`morepath.Request` objects for a corpus of realistic
+paths, most of them already normalized.
+"""
+from __future__ import print_function
+
+import morepath
+from morepath.traject import is_normalized_path
+from webob.request import environ_from_url
+
+from benchutil import bench
+
+
+PATHS = [
+    '/',
+    '/users',
+    '/users/1234',
+    '/users/1234/edit',
+    '/api/v1/documents/8b1f6c0e-5d7a-4d0e-9a42-4b8f2f0e9f6a',
+    '/api/v1/documents/8b1f6c0e-5d7a-4d0e-9a42-4b8f2f0e9f6a/+json',
+    '/static/css/site.css',
+    '/blog/2016/10/some-long-article-title-with-dashes',
+    '/search',
+    '/users/1234/',
+    '/a/./b',
+    '/static//../favicon.ico',
+]
+
+
+def main():
+    app = morepath.App()
+    environs = [environ_from_url(path) for path in PATHS]
+    normalized = [environ for environ, path in zip(environs, PATHS)
+                  if is_normalized_path(path)]
+
+    def construct(environs):
+        def run():
+            for environ in environs:
+                morepath.Request(environ.copy(), app)
+        return run
+
+    bench("all paths (%s)" % len(environs), construct(environs))
+    bench("normalized paths (%s)" % len(normalized), construct(normalized))
+
+
+if __name__ == '__main__':
+    main()
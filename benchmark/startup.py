@@ -0,0 +1,75 @@
+"""Benchmark committing an application with many mounted apps.
+
+Compares :meth:`morepath.App.commit`, which commits all mounted apps
+at startup, with :meth:`morepath.App.lazy_commit`, which commits a
+mounted app when it is first used. For each it reports the time to
+commit and the time of the first request to one of the mounted apps.
+"""
+from __future__ import print_function
+
+import timeit
+
+import morepath
+from webtest import TestApp as Client
+
+
+MOUNTED = 60
+MODELS = 20
+
+
+def mount_factory(app_class):
+    def mount():
+        return app_class()
+    return mount
+
+
+def make_app():
+    """Create a root app with many mounted apps.
+    """
+    class Root(morepath.App):
+        pass
+
+    for i in range(MOUNTED):
+        class Sub(morepath.App):
+            pass
+
+        for j in range(MODELS):
+            class Model(object):
+                def __init__(self, id):
+                    self.id = id
+
+            Sub.path(path='model%s/{id}' % j)(Model)
+
+            def default(self, request):
+                return request.link(self)
+
+            Sub.view(model=Model)(default)
+            Sub.json(model=Model, name='json')(default)
+
+        Root.mount(app=Sub, path='sub%s' % i)(mount_factory(Sub))
+    return Root
+
+
+def timed(func):
+    start = timeit.default_timer()
+    func()
+    return timeit.default_timer() - start
+
+
+def main(repeat=3):
+    for label in ['commit', 'lazy_commit']:
+        commit_times = []
+        request_times = []
+        for i in range(repeat):
+            app_class = make_app()
+            commit_times.append(timed(getattr(app_class, label)))
+            client = Client(app_class())
+            request_times.append(
+                timed(lambda: client.get('/sub0/model0/1')))
+        print("%-40s %10.2f msec" % (label, min(commit_times) * 1e3))
+        print("%-40s %10.2f msec" % (label + ", first request",
+                                     min(request_times) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
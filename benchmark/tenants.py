@@ -0,0 +1,78 @@
+"""Benchmark committing many generated app classes.
+
+Generates an app subclass for each tenant of a base app with a number
+of paths and views, like an application that creates its app classes
+at startup, and reports the time to commit them all and the amount of
+memory still allocated afterwards, as traced by :mod:`tracemalloc`.
+"""
+from __future__ import print_function
+
+import gc
+import timeit
+import tracemalloc
+
+import morepath
+
+
+TENANTS = 1000
+MODELS = 10
+
+
+class Document(object):
+    def __init__(self, id, page=0, tags=None):
+        self.id = id
+        self.page = page
+        self.tags = tags
+
+
+def make_base():
+    class Base(morepath.App):
+        pass
+
+    for i in range(MODELS):
+        model = type('Document%s' % i, (Document,), {})
+        Base.path(path='documents%s/{id}' % i,
+                  converters={'tags': [int]})(model)
+
+        def default(self, request):
+            return request.link(self)
+
+        Base.view(model=model)(default)
+    return Base
+
+
+def make_tenants(base):
+    return [type('Tenant%s' % i, (base,), {}) for i in range(TENANTS)]
+
+
+def commit(app_classes):
+    for app_class in app_classes:
+        app_class.commit()
+
+
+def main(repeat=1):
+    times = []
+    for i in range(repeat):
+        app_classes = make_tenants(make_base())
+        start = timeit.default_timer()
+        commit(app_classes)
+        times.append(timeit.default_timer() - start)
+    print("%-40s %10.2f msec" % ("commit %s tenants" % TENANTS,
+                                 min(times) * 1e3))
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        app_classes = make_tenants(make_base())
+        commit(app_classes)
+        del app_classes
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    print("%-40s %10.1f KB" % ("retained after dropping tenants",
+                               size / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark route matching with and without a compiled traject.
+
+Registers about 400 routes and matches a mix of paths against them,
+first using the tree walk and then using the compiled table.
+"""
+from __future__ import print_function
+
+from morepath.converter import Converter
+from morepath.traject import TrajectRegistry
+
+from benchutil import bench
+
+
+class Model(object):
+    pass
+
+
+def create_traject():
+    traject = TrajectRegistry()
+    for i in range(100):
+        traject.add_pattern('section%s' % i, Model)
+        traject.add_pattern('section%s/{id}' % i, Model,
+                            converters={'id': Converter(int)})
+        traject.add_pattern('section%s/{id}/edit' % i, Model,
+                            converters={'id': Converter(int)})
+        traject.add_pattern('section%s/{id}/item-{name}' % i, Model,
+                            converters={'id': Converter(int)})
+    return traject
+
+
+PATHS = [
+    'section0',
+    'section50/17',
+    'section99/17/edit',
+    'section73/3/item-foo',
+    'section42/not-an-int',
+    'section10/1/+view',
+]
+
+
+def stacks():
+    result = []
+    for path in PATHS:
+        stack = path.split('/')
+        stack.reverse()
+        result.append(stack)
+    return result
+
+
+def main():
+    traject = create_traject()
+    all_stacks = stacks()
+
+    def run():
+        for stack in all_stacks:
+            traject.match(stack)
+
+    bench("tree walk", run)
+    traject.compile()
+    bench("compiled", run)
+
+
+if __name__ == '__main__':
+    main()
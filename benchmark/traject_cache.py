@@ -0,0 +1,57 @@
+"""Benchmark consuming paths with and without the traject cache.
+
+Consumes a few paths repeatedly, as happens when most traffic goes to
+a limited set of URLs.
+"""
+from __future__ import print_function
+
+import morepath
+from morepath.converter import Converter
+from morepath.traject import TrajectRegistry
+
+from benchutil import bench
+
+
+class Model(object):
+    def __init__(self, id=None, name=None):
+        self.id = id
+        self.name = name
+
+
+def create_traject():
+    traject = TrajectRegistry()
+    for i in range(100):
+        traject.add_pattern('section%s' % i, Model)
+        traject.add_pattern('section%s/{id}' % i, Model,
+                            converters={'id': Converter(int)})
+        traject.add_pattern('section%s/{id}/item-{name}' % i, Model,
+                            converters={'id': Converter(int)})
+    return traject
+
+
+PATHS = [
+    '/section0',
+    '/section50/17',
+    '/section73/3/item-foo',
+    '/section10/1/+view',
+]
+
+
+def main():
+    traject = create_traject()
+    app = morepath.App()
+    requests = [morepath.Request.blank(path, app=app) for path in PATHS]
+    stacks = [list(request.unconsumed) for request in requests]
+
+    def run():
+        for request, stack in zip(requests, stacks):
+            request.unconsumed = stack[:]
+            traject.consume(request)
+
+    bench("no cache", run)
+    traject.enable_cache(1000)
+    bench("cache", run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark the memory used by the traject routing tree.
+
+Registers routes like those of an application with many generated
+models, and reports the memory allocated per route, as traced by
+:mod:`tracemalloc`. Model factories and converters are created before
+tracing starts, so only the routing tree itself is measured.
+"""
+from __future__ import print_function
+
+import gc
+import tracemalloc
+
+from morepath.converter import Converter
+from morepath.traject import TrajectRegistry
+
+
+class Model(object):
+    pass
+
+
+def model_factory(id):
+    return Model()
+
+
+def patterns(sections):
+    converters = {'id': Converter(int)}
+    result = []
+    for i in range(sections):
+        result.extend([
+            ('section%s' % i, None),
+            ('section%s/{id}' % i, converters),
+            ('section%s/{id}/edit' % i, converters),
+            ('section%s/{id}/item-{name}' % i, converters),
+            ('section%s/{id}/item-{name}/{version}' % i, converters),
+        ])
+    return result
+
+
+def measure(sections):
+    routes = patterns(sections)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        traject = TrajectRegistry()
+        for path, converters in routes:
+            traject.add_pattern(path, model_factory, converters=converters)
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return len(routes), size
+
+
+def main():
+    for sections in (100, 2000):
+        count, size = measure(sections)
+        print("%-40s %10.0f bytes/route" % (
+            "%s routes" % count, float(size) / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark a chain of tweens.
+
+Compares eight tweens written as functions that call the next handler
+with eight tweens that use :class:`morepath.TweenHooks`, which are
+combined into a single handler, for requests that pass through all
+tweens and for requests where the handler raises an exception that
+the outermost tween handles.
+"""
+from __future__ import print_function
+
+from morepath import TweenHooks
+from morepath.tween import hooks_handler
+
+from benchutil import bench
+
+
+DEPTH = 8
+
+
+def handler(request):
+    if request == 'error':
+        raise ValueError()
+    return 'response'
+
+
+def function_tween(handler, handle_exception):
+    def tween(request):
+        try:
+            response = handler(request)
+        except ValueError:
+            if handle_exception:
+                return 'handled'
+            raise
+        return response
+    return tween
+
+
+def after(request, response):
+    return response
+
+
+def exception(request, exc):
+    return 'handled'
+
+
+def main():
+    functions = handler
+    for i in range(DEPTH):
+        functions = function_tween(functions, i == DEPTH - 1)
+    hooks = [TweenHooks(exception=exception)] + [
+        TweenHooks(after=after) for i in range(DEPTH - 1)]
+    combined = hooks_handler(hooks, handler)
+
+    for request in ['ok', 'error']:
+        bench("function tweens, %s" % request,
+              lambda: functions(request))
+        bench("tween hooks, %s" % request,
+              lambda: combined(request))
+
+
+if __name__ == '__main__':
+    main()
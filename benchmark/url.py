@@ -0,0 +1,60 @@
+"""Benchmark turning paths into URLs.
+
+Compares the quoting in :mod:`morepath.url` with quoting the whole
+path using :func:`urllib.quote` and encoding the URL parameters with
+:func:`morepath.path.fixed_urlencode`, for paths and parameters that
+need no quoting and for ones that do.
+"""
+from __future__ import print_function
+
+from morepath.path import PathInfo, fixed_urlencode
+from morepath.url import PathTemplate, quote_path, encode_query
+
+from benchutil import bench
+
+try:
+    # Python 2
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+
+def old_url(path, parameters):
+    result = '/' + quote(path.encode('utf-8'), '/~')
+    if parameters:
+        parameters = dict((key, [v.encode('utf-8') for v in value])
+                          for (key, value) in parameters.items())
+        result += '?' + fixed_urlencode(parameters, True)
+    return result
+
+
+def main():
+    cases = [
+        ('plain', u'documents/%(id)s', {'id': u'1234'},
+         {'page': [u'3'], 'sort': [u'title']}),
+        ('quoted', u'documents/%(id)s', {'id': u'a b/\xe9'},
+         {'q': [u'hello world'], 'tag': [u'a&b', u'\xe9']}),
+    ]
+    for label, interpolation_path, variables, parameters in cases:
+        template = PathTemplate(interpolation_path)
+        path = interpolation_path % variables
+        bench("quote path, old, %s" % label,
+              lambda: quote(path.encode('utf-8'), '/~'))
+        bench("quote_path, %s" % label,
+              lambda: quote_path(path))
+        bench("PathTemplate.quote, %s" % label,
+              lambda: template.quote(path, variables))
+        bench("urlencode parameters, old, %s" % label,
+              lambda: fixed_urlencode(
+                  dict((key, [v.encode('utf-8') for v in value])
+                       for (key, value) in parameters.items()), True))
+        bench("encode_query, %s" % label,
+              lambda: encode_query(parameters))
+        bench("url, old, %s" % label,
+              lambda: old_url(path, parameters))
+        bench("PathInfo.url, %s" % label,
+              lambda: PathInfo(path, parameters).url('', ''))
+
+
+if __name__ == '__main__':
+    main()
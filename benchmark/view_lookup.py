@@ -0,0 +1,74 @@
+"""Benchmark looking up views.
+
+Compares dispatch through :meth:`morepath.App.get_view` with
+:class:`morepath.view.ViewLookup`, with and without its cache.
+"""
+from __future__ import print_function
+
+import morepath
+from morepath.publish import get_view_name
+from webob import BaseRequest
+
+from benchutil import bench
+
+
+def create_app(cache_size):
+    class App(morepath.App):
+        pass
+
+    @App.setting(section='view', name='cache_size')
+    def get_cache_size():
+        return cache_size
+
+    class Document(object):
+        pass
+
+    @App.path(path='{id}', model=Document)
+    def get_document(id):
+        return Document()
+
+    @App.view(model=Document)
+    def default(self, request):
+        return 'default'
+
+    @App.view(model=Document, name='edit')
+    def edit(self, request):
+        return 'edit'
+
+    @App.view(model=Document, request_method='POST')
+    def post(self, request):
+        return 'post'
+
+    App.commit()
+    return App(), Document()
+
+
+def main():
+    for cache_size in (0, 1000):
+        app, document = create_app(cache_size)
+        requests = [
+            app.request(BaseRequest.blank('/1').environ),
+            app.request(BaseRequest.blank('/1/edit').environ),
+        ]
+        for request in requests:
+            request.unconsumed = request.unconsumed[:-1]
+            request.view_name = get_view_name(request.unconsumed)
+
+        view_lookup = app.config.view_lookup
+
+        if not cache_size:
+            def dispatch():
+                for request in requests:
+                    app.get_view(document, request)
+
+            bench("App.get_view dispatch", dispatch, number=50000)
+
+        def run():
+            for request in requests:
+                view_lookup(app, document, request)
+
+        bench("ViewLookup, cache size %s" % cache_size, run, number=50000)
+
+
+if __name__ == '__main__':
+    main()
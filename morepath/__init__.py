@@ -19,10 +19,12 @@ from .core import (excview_tween_factory as EXCVIEW,
     model_predicate, name_predicate, request_method_predicate,
     body_model_predicate)
 from .core import body_model_predicate as LAST_VIEW_PREDICATE
-from .view import render_json, render_html, redirect
+from .view import render_json, render_json_stream, render_html, redirect
 from .request import Request, Response
 from .autosetup import scan, autoscan
 from .authentication import Identity, IdentityPolicy, NO_IDENTITY
 from .converter import Converter
 from .reify import reify
+from .tween import TweenHooks
 from .run import run
+from .prefork import prepare_for_fork
@@ -15,6 +15,8 @@ To actually serve requests it uses :func:`morepath.publish.publish`.
 Entirely documented in :class:`morepath.App` in the public API.
 """
 
+import threading
+
 import dectate
 from dectate import directive
 import reg
@@ -32,9 +34,32 @@ def cached_key_lookup(key_lookup):
     return reg.DictCachingKeyLookup(key_lookup)
 
 
+commit_lock = threading.RLock()
+"""Lock held while committing, so that threads don't commit at once.
+"""
+
+
 def commit_if_needed(app):
     if not app.is_committed():
-        app.commit()
+        with commit_lock:
+            if not app.is_committed():
+                app.commit()
+
+
+def enter_app(app):
+    """Make sure an app that a request or link enters is committed.
+
+    Its app class is committed if this hasn't happened yet, but not
+    the app classes mounted in it. This makes :meth:`App.lazy_commit`
+    work. After a full commit with :meth:`App.commit` this only checks
+    that the app class is committed.
+
+    :param app: a :class:`morepath.App` instance.
+    """
+    if not app.is_committed():
+        with commit_lock:
+            if not app.is_committed():
+                app.lazy_commit()
 
 
 def dispatch_method(*predicates, **kw):
@@ -44,6 +69,45 @@ def dispatch_method(*predicates, **kw):
 dispatch_method.__doc__ = reg.dispatch_method.__doc__
 
 
+def join_mounted_path(mount_info, info):
+    """Join the path to an app with the path to an object in it.
+
+    :param mount_info: the path to the app, as returned by
+      :meth:`App._get_mount_info`.
+    :param info: a :class:`morepath.path.PathInfo` for the object.
+    :return: a :class:`morepath.path.PathInfo` with the full path.
+    """
+    paths, quoted_paths, mount_info = mount_info
+    parameters = {}
+    parameters.update(info.parameters)
+    parameters.update(mount_info.parameters)
+    return PathInfo(
+        '/'.join(paths + [info.path]).strip('/'), parameters,
+        '/'.join(quoted_paths + [info.quoted_path]).strip('/'))
+
+
+def join_mounted_class_path(mount_info, info):
+    """Join the path to an app with the path for a class in it.
+
+    This joins paths like :meth:`App._get_mounted_class_path` always
+    has, which is slightly different from :func:`join_mounted_path`.
+
+    :param mount_info: the path to the app, as returned by
+      :meth:`App._get_mount_info`.
+    :param info: a :class:`morepath.path.PathInfo` for the class.
+    :return: a :class:`morepath.path.PathInfo` with the full path.
+    """
+    mount_info = mount_info[2]
+    path = mount_info.path
+    quoted_path = mount_info.quoted_path
+    if info.path:
+        path += '/' + info.path
+        quoted_path += '/' + info.quoted_path
+    parameters = info.parameters.copy()
+    parameters.update(mount_info.parameters)
+    return PathInfo(path, parameters, quoted_path)
+
+
 class App(dectate.App):
     """A Morepath-based application object.
 
@@ -71,6 +135,10 @@ class App(dectate.App):
     parent = None
     """The parent in which this app was mounted."""
 
+    _mount_info = None
+
+    _mount_generation = 0
+
     request_class = Request
     """The class of the Request to create. Must be a subclass of
     :class:`morepath.Request`.
@@ -101,6 +169,7 @@ class App(dectate.App):
     defer_links = directive(action.DeferLinksAction)
     defer_class_links = directive(action.DeferClassLinksAction)
     tween_factory = directive(action.TweenFactoryAction)
+    timing_callback = directive(action.TimingCallbackAction)
     identity_policy = directive(action.IdentityPolicyAction)
     verify_identity = directive(action.VerifyIdentityAction)
     dump_json = directive(action.DumpJsonAction)
@@ -136,6 +205,25 @@ class App(dectate.App):
         response = self.publish(request)
         return response(environ, start_response)
 
+    @reify
+    def asgi(self):
+        """This app as an ASGI application.
+
+        See the ASGI_ spec for more information. Model factories,
+        view functions and tweens that are coroutine functions are
+        awaited; others are run in the executor of the event loop.
+        See :mod:`morepath.asgi`.
+
+        This requires Python 3.5 or later.
+
+        .. _ASGI: https://asgi.readthedocs.io
+
+        :return: a :class:`morepath.asgi.ASGIApplication` instance.
+        """
+        # import here as morepath.asgi needs Python 3.5 or later
+        from .asgi import ASGIApplication
+        return ASGIApplication(self)
+
     @reify
     def publish(self):
         """Publish functionality wrapped in tweens.
@@ -151,14 +239,20 @@ class App(dectate.App):
         tween wrapping only happens once when the first request is
         handled and is cached afterwards.
 
+        If timing callbacks are registered with
+        :meth:`App.timing_callback`, this uses
+        :meth:`morepath.timing.TimingRegistry.wrap` instead, which
+        times each stage of publishing.
+
         :return: a function that a :class:`morepath.Request` instance
           and returns a :class:`morepath.Response` instance.
 
         """
         # the last chance we have to commit the app is here, the
         # lookup may not be touched yet at this point
-        if not self.is_committed():
-            self.commit()
+        commit_if_needed(self)
+        if self.config.timing_registry.callbacks:
+            return self.config.timing_registry.wrap(self)
         return self.config.tween_registry.wrap(self)
 
     def ancestors(self):
@@ -206,6 +300,7 @@ class App(dectate.App):
                 return None
             result = factory(**variables)
         result.parent = self
+        enter_app(result)
         return result
 
     def sibling(self, app, **variables):
@@ -236,7 +331,9 @@ class App(dectate.App):
 
         This assumes all app classes involved have already been
         committed previously, for instance by
-        :meth:`morepath.App.commit`.
+        :meth:`morepath.App.commit`. After :meth:`App.lazy_commit`
+        mounted app classes that have not been committed yet are not
+        found.
 
         Mounted apps are discovered in breadth-first order.
 
@@ -269,7 +366,26 @@ class App(dectate.App):
 
         :return: the set of discovered app clasess.
         """
-        return cls.mounted_app_classes(dectate.commit)
+        with commit_lock:
+            return cls.mounted_app_classes(dectate.commit)
+
+    @classmethod
+    def lazy_commit(cls):
+        """Commit the app, but not the apps mounted under it.
+
+        A mounted app class is committed when it is first needed: when
+        a request enters it or when :meth:`App.child` is used to get
+        it, for instance to link to an object in it. This makes
+        startup faster for applications with many mounted apps,
+        especially if only some of them are used by a process.
+        Configuration errors in a mounted app are only reported when
+        it is first needed.
+
+        This is safe to use with multiple threads: only one thread
+        commits an app class at the same time.
+        """
+        with commit_lock:
+            dectate.commit(cls)
 
     @classmethod
     def init_settings(cls, settings):
@@ -468,28 +584,82 @@ class App(dectate.App):
         """
         return self._class_path(obj.__class__, self._path_variables(obj))
 
-    def _get_mounted_path(self, obj):
-        """Path for model obj including mounted path.
+    def _get_mount_info(self):
+        """Path to this app in its mounts.
 
-        Includes path to this app itself, so takes mounting into account.
+        This is computed once and cached on the app instance, as long
+        as its :attr:`App.parent` stays the same and
+        :meth:`App.reset_mounted_path` isn't called for any app.
 
-        :param obj: model object (or :class:`morepath.App` instance).
-        :return: a :class:`morepath.path.PathInfo` with fully resolved
-          path in mounts.
+        :return: a ``paths, quoted_paths, info`` tuple, where
+          ``paths`` is a list of the paths of the mounts from the root
+          down to this app, ``quoted_paths`` is a list of the same paths
+          quoted for use in a URL, and ``info`` is a
+          :class:`morepath.path.PathInfo` with the joined path and the
+          URL parameters of the mounts. ``None`` if no path to this app
+          can be determined.
         """
+        parent = self.parent
+        generation = App._mount_generation
+        cached = self._mount_info
+        if (cached is not None and cached[0] is parent and
+                cached[1] == generation):
+            return cached[2]
         paths = []
+        quoted_paths = []
         parameters = {}
-        app = self
+        obj = self
+        app = parent
+        result = None
         while app is not None:
             info = app._get_path(obj)
             if info is None:
-                return None
+                break
             paths.append(info.path)
+            quoted_paths.append(info.quoted_path)
             parameters.update(info.parameters)
             obj = app
             app = app.parent
-        paths.reverse()
-        return PathInfo('/'.join(paths).strip('/'), parameters)
+        else:
+            paths.reverse()
+            quoted_paths.reverse()
+            result = paths, quoted_paths, PathInfo(
+                '/'.join(paths).strip('/'), parameters,
+                '/'.join(quoted_paths).strip('/'))
+        self._mount_info = parent, generation, result
+        return result
+
+    def reset_mounted_path(self):
+        """Forget the path to this app in its mounts.
+
+        Morepath caches the path to an app instance, including the URL
+        parameters of its mounts, the first time a link is made from
+        it. The cache is discarded automatically when the
+        :attr:`App.parent` of the app changes. If you change the
+        variables that are used to mount this app or one of its
+        parents, you need to call this so that new links use them.
+
+        As the apps mounted in this app cache their path as well,
+        this discards the cached paths of all app instances.
+        """
+        App._mount_generation += 1
+
+    def _get_mounted_path(self, obj):
+        """Path for model obj including mounted path.
+
+        Includes path to this app itself, so takes mounting into account.
+
+        :param obj: model object (or :class:`morepath.App` instance).
+        :return: a :class:`morepath.path.PathInfo` with fully resolved
+          path in mounts.
+        """
+        info = self._get_path(obj)
+        if info is None:
+            return None
+        mount_info = self._get_mount_info()
+        if mount_info is None:
+            return None
+        return join_mounted_path(mount_info, info)
 
     def _get_mounted_class_path(self, model, variables):
         """Path for model class and variables including mounted path.
@@ -506,13 +676,42 @@ class App(dectate.App):
             return None
         if self.parent is None:
             return info
-        mount_info = self.parent._get_mounted_path(self)
-        path = mount_info.path
-        if info.path:
-            path += '/' + info.path
-        parameters = info.parameters.copy()
-        parameters.update(mount_info.parameters)
-        return PathInfo(path, parameters)
+        mount_info = self._get_mount_info()
+        if mount_info is None:
+            return None
+        return join_mounted_class_path(mount_info, info)
+
+    def _get_mounted_path_func(self, model):
+        """Function that gets the mounted path for instances of model.
+
+        Like :meth:`morepath.App._get_mounted_path`, but the path
+        registered for the model class, the function to get its
+        variables and the path to this app in its mounts are looked up
+        only once.
+
+        :param model: model class.
+        :return: a function that takes a model object and returns a
+          :class:`morepath.path.PathInfo`, or ``None`` if no path is
+          registered for ``model`` directly in this app, or if the path
+          to this app cannot be determined.
+        """
+        app_class = self.__class__
+        path = app_class._class_path.component_by_keys(model=model)
+        if path is None:
+            return None
+        get_variables = (
+            app_class._path_variables.component_by_keys(obj=model) or
+            app_class._default_path_variables.component_by_keys(obj=model))
+        if get_variables is None:
+            return None
+        mount_info = self._get_mount_info()
+        if mount_info is None:
+            return None
+
+        def get_mounted_path(obj):
+            info = path(self, model, get_variables(self, obj))
+            return join_mounted_path(mount_info, info)
+        return get_mounted_path
 
     def _get_deferred_mounted_path(self, obj):
         """Path for obj taking into account deferring apps.
@@ -0,0 +1,581 @@
+"""Serve Morepath applications with ASGI.
+
+This publishes requests the same way as :mod:`morepath.publish`, but
+asynchronously. Model factories, view functions and tweens can be
+coroutine functions, in which case they are awaited. Functions that
+are not coroutine functions are run in a thread of the default
+executor of the event loop, so that they do not block it.
+
+Use :attr:`morepath.App.asgi` to get the ASGI application for an app.
+
+This module requires Python 3.5 or later.
+"""
+import asyncio
+import functools
+import io
+import queue
+import sys
+from inspect import iscoroutinefunction
+
+from webob.exc import HTTPOk, HTTPRedirection
+
+from .app import commit_if_needed
+from .core import excview_tween_factory
+from .publish import lookup_view, route
+from .reify import reify
+from .tween import TweenHooks
+from .view import View
+
+
+LOOP_KEY = 'morepath.asgi.loop'
+"""WSGI environ key under which the event loop of a request is stored.
+"""
+
+THREAD_KEY = 'morepath.asgi.thread'
+"""WSGI environ key under which the :class:`RequestThread` of a request
+is stored while a synchronous tween waits for its handler.
+"""
+
+
+def is_async(func):
+    """Check whether calling ``func`` returns an awaitable.
+
+    :param func: a function, or an object with a ``__call__`` method.
+    :return: ``True`` if ``func`` is a coroutine function.
+    """
+    return (iscoroutinefunction(func) or
+            iscoroutinefunction(getattr(func, '__call__', None)))
+
+
+async def run_sync(func, *args):
+    """Run a function in the default executor of the event loop.
+
+    :param func: function to call.
+    :param args: arguments to call ``func`` with.
+    :return: the return value of ``func``.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args))
+
+
+async def run_for_request(request, func, *args):
+    """Run a function for a request in a thread.
+
+    This is the thread of the synchronous tween the request is in, if
+    any, see :class:`RequestThread`, and otherwise a thread of the
+    default executor of the event loop.
+
+    :param request: :class:`morepath.Request` instance.
+    :param func: function to call.
+    :param args: arguments to call ``func`` with.
+    :return: the return value of ``func``.
+    """
+    thread = request.environ.get(THREAD_KEY)
+    if thread is None:
+        return await run_sync(func, *args)
+    return await thread.run(func, *args)
+
+
+class RequestThread(object):
+    """The thread of a synchronous tween that waits for its handler.
+
+    A synchronous tween runs in a thread of the executor, and its
+    handler runs in the event loop. If the handler ran synchronous
+    functions in the executor as well, every request would need more
+    than one thread, and once all threads are taken by tweens that
+    wait, no request could continue. So while a tween waits, the
+    synchronous functions for its request, including those of tweens
+    below it, run in its thread instead.
+
+    :param loop: the event loop of the request.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = queue.Queue()
+
+    def wait(self, future):
+        """Run functions for the request until a future is done.
+
+        Called in the thread itself.
+
+        :param future: a :class:`concurrent.futures.Future`.
+        :return: the result of ``future``.
+        """
+        work = self.queue
+        future.add_done_callback(lambda future: work.put(None))
+        while not future.done():
+            func = work.get()
+            if func is not None:
+                func()
+        return future.result()
+
+    async def run(self, func, *args):
+        """Run a function in the thread.
+
+        :param func: function to call.
+        :param args: arguments to call ``func`` with.
+        :return: the return value of ``func``.
+        """
+        loop = self.loop
+        future = loop.create_future()
+
+        def set_result(result, exc):
+            if future.cancelled():
+                return
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+        def call():
+            try:
+                result = func(*args)
+            except Exception as exc:
+                loop.call_soon_threadsafe(set_result, None, exc)
+            else:
+                loop.call_soon_threadsafe(set_result, result, None)
+
+        self.queue.put(call)
+        return await future
+
+
+async def publish(request):
+    """Handle request and return response.
+
+    Like :func:`morepath.publish.publish`.
+
+    :param request: :class:`morepath.Request` instance.
+    :return: :class:`morepath.Response` instance.
+    """
+    obj = await resolve_model(request)
+    return await resolve_response(obj, request)
+
+
+async def resolve_model(request):
+    """Resolve request to a model object.
+
+    Like :func:`morepath.publish.resolve_model`, and uses the same
+    routing, :func:`morepath.publish.route`, but the model objects are
+    created with :func:`create`.
+
+    :param request: :class:`morepath.Request` instance.
+    :return: model object or ``None`` if not found.
+    """
+    steps = route(request)
+    node, variables = next(steps)
+    while True:
+        obj = await create(node, variables, request)
+        try:
+            node, variables = steps.send(obj)
+        except StopIteration:
+            return obj
+
+
+async def create(node, variables, request):
+    """Create the model object for a node found by routing.
+
+    Model factories that are coroutine functions are awaited, and
+    other model factories are run in the executor.
+
+    :param node: the node, as returned by
+      :meth:`morepath.traject.TrajectRegistry.resolve`.
+    :param variables: the variables for the model factory.
+    :param request: :class:`morepath.Request` instance.
+    :return: model object, or ``None`` if not found.
+    """
+    if node.model_factory is None:
+        return None
+    if is_async(node.model_factory):
+        return await node.create(variables, request)
+    return await run_for_request(request, node.create, variables, request)
+
+
+async def resolve_response(obj, request):
+    """Given model object and request, create response.
+
+    Like :func:`morepath.publish.resolve_response`. The view is looked
+    up with :func:`morepath.publish.lookup_view` and called with
+    :func:`call_view`.
+
+    :param obj: model object to get response for.
+    :param request: :class:`morepath.Request` instance.
+    :return: :class:`morepath.Response` instance.
+    """
+    view = lookup_view(obj, request)
+    return await call_view(view, request.app, obj, request)
+
+
+async def call_view(view, app, obj, request):
+    """Call a view.
+
+    If the view function of a :class:`morepath.view.View` is a
+    coroutine function it is awaited, and the checks for identity
+    and permission before it and the rendering after it are run in a
+    thread with :func:`run_for_request`. Otherwise the whole view is
+    run in a thread. Anything else, such as the fallback that raises
+    :exc:`webob.exc.HTTPNotFound`, is called directly.
+
+    :param view: the view, as returned by
+      :meth:`morepath.view.ViewLookup.view`.
+    :param app: the :class:`morepath.App` instance.
+    :param obj: the model object.
+    :param request: :class:`morepath.Request` instance.
+    :return: :class:`morepath.Response` instance.
+    """
+    if not isinstance(view, View):
+        return view(app, obj, request)
+    if not is_async(view.func):
+        return await run_for_request(request, view, app, obj, request)
+    await run_for_request(request, view.check, obj, request)
+    content = await view.func(obj, request)
+    return await run_for_request(request, view.respond, content, request)
+
+
+def async_tween_factory(tween_factory):
+    """Mark a tween factory as creating a coroutine function.
+
+    The ASGI application calls a tween factory marked with this
+    decorator with a handler that is a coroutine function, and awaits
+    the tween it returns. The tween factory can also return
+    :class:`morepath.tween.TweenHooks`. Use it below the tween factory
+    directive::
+
+      @App.tween_factory()
+      @async_tween_factory
+      def make_tween(app, handler):
+          async def tween(request):
+              return await handler(request)
+          return tween
+
+    Such a tween factory can only be used with ASGI.
+
+    :param tween_factory: the tween factory.
+    :return: ``tween_factory``.
+    """
+    tween_factory.asgi_async = True
+    return tween_factory
+
+
+def is_async_tween_factory(tween_factory):
+    """Check whether a tween factory creates a coroutine function.
+
+    :param tween_factory: a tween factory.
+    :return: ``True`` if it is marked with :func:`async_tween_factory`.
+    """
+    return getattr(tween_factory, 'asgi_async', False)
+
+
+@async_tween_factory
+def async_excview_tween_factory(app, handler):
+    """Exception views.
+
+    Like :func:`morepath.core.excview_tween_factory`, but the
+    exception view is called with :func:`call_view`.
+    """
+    async def excview_tween(request):
+        try:
+            response = await handler(request)
+        except Exception as exc:
+            view = request.app.get_view.component_by_keys(model=exc.__class__)
+            if view is None:
+                raise
+            if not isinstance(exc, (HTTPOk, HTTPRedirection)):
+                request.clear_after()
+            return await call_view(view, app, exc, request)
+        return response
+    return excview_tween
+
+
+def async_hooks_tween(hooks, handler):
+    """Create a tween that calls tween hooks around a handler.
+
+    Like :meth:`morepath.tween.TweenHooks.tween`, but ``handler`` and
+    the resulting tween are coroutine functions. The hooks are called
+    directly.
+
+    :param hooks: a :class:`morepath.tween.TweenHooks` instance.
+    :param handler: a coroutine function that takes a request.
+    :return: a coroutine function that takes a request.
+    """
+    async def tween(request):
+        if hooks.before is not None:
+            response = hooks.before(request)
+            if response is not None:
+                return response
+        try:
+            response = await handler(request)
+        except Exception as exc:
+            if hooks.exception is None:
+                raise
+            result = hooks.exception(request, exc)
+            if result is None:
+                raise
+            return result
+        if hooks.after is not None:
+            response = hooks.after(request, response)
+        return response
+    return tween
+
+
+ASYNC_TWEEN_FACTORIES = {
+    excview_tween_factory: async_excview_tween_factory,
+}
+"""Maps tween factories of :mod:`morepath.core` to async equivalents.
+"""
+
+
+def sync_handler(handler):
+    """Make a handler that can be called from a synchronous tween.
+
+    The synchronous tween runs in a thread; the handler runs
+    ``handler`` in the event loop of the request and waits for the
+    result. While it waits, the thread runs the synchronous functions
+    for the request, see :class:`RequestThread`.
+
+    :param handler: a coroutine function that takes a request.
+    :return: a function that takes a request and returns a response.
+    """
+    def call_handler(request):
+        environ = request.environ
+        loop = environ[LOOP_KEY]
+        # a tween below another synchronous tween runs in the same thread
+        thread = environ.get(THREAD_KEY)
+        outer = thread is None
+        if outer:
+            thread = environ[THREAD_KEY] = RequestThread(loop)
+        try:
+            return thread.wait(
+                asyncio.run_coroutine_threadsafe(handler(request), loop))
+        finally:
+            if outer:
+                del environ[THREAD_KEY]
+    return call_handler
+
+
+def sync_tween(tween):
+    """Make a coroutine function that runs a synchronous tween.
+
+    The tween is run with :func:`run_for_request`.
+
+    :param tween: a function that takes a request.
+    :return: a coroutine function that takes a request.
+    """
+    async def run_tween(request):
+        return await run_for_request(request, tween, request)
+    return run_tween
+
+
+def wrap(app):
+    """Wrap :func:`publish` with the tweens of an app.
+
+    Like :meth:`morepath.tween.TweenRegistry.wrap`. Tween factories
+    in :data:`ASYNC_TWEEN_FACTORIES` are replaced by their async
+    equivalent. Each tween factory is called once. A tween factory
+    marked with :func:`async_tween_factory` is called with a
+    coroutine function as the handler, and the tween it returns is
+    awaited. Other tween factories are called with a handler that can
+    be called from a synchronous tween, made with :func:`sync_handler`,
+    and their tween is run in the executor. This keeps a thread of
+    the executor busy until the handler returns, so for the whole
+    request below the tween; synchronous functions below it run in
+    the same thread. :class:`morepath.tween.TweenHooks`
+    returned by any tween factory are called directly in the event
+    loop with :func:`async_hooks_tween`.
+
+    :param app: an instance of :class:`morepath.App`.
+    :return: a coroutine function that takes a request and returns a
+      response.
+    """
+    result = publish
+    tween_registry = app.config.tween_registry
+    for tween_factory in reversed(tween_registry.sorted_tween_factories()):
+        tween_factory = ASYNC_TWEEN_FACTORIES.get(tween_factory,
+                                                  tween_factory)
+        if is_async_tween_factory(tween_factory):
+            tween = tween_factory(app, result)
+        else:
+            tween = tween_factory(app, sync_handler(result))
+        if isinstance(tween, TweenHooks):
+            tween = async_hooks_tween(tween, result)
+        elif not is_async_tween_factory(tween_factory):
+            tween = sync_tween(tween)
+        result = tween
+    return result
+
+
+def environ_from_scope(scope, body):
+    """Create a WSGI environment for an ASGI HTTP request.
+
+    This follows the WSGI compatibility section of the ASGI
+    specification. ``CONTENT_LENGTH`` is the length of ``body`` if
+    the request has no ``Content-Length`` header.
+
+    :param scope: the ASGI connection scope.
+    :param body: the request body as bytes.
+    :return: a WSGI environ dict.
+    """
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'asgi.scope': scope,
+    }
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+    # the body is read completely, so its length is known even if
+    # the request has no Content-Length header, as with chunked
+    # transfer encoding or HTTP/2
+    environ.setdefault('CONTENT_LENGTH', str(len(body)))
+    return environ
+
+
+async def read_body(receive):
+    """Read the complete body of an ASGI HTTP request.
+
+    :param receive: the ASGI receive callable.
+    :return: the body as bytes.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def send_response(response, environ, send):
+    """Send a response with ASGI.
+
+    The response is called as a WSGI application, so that it handles
+    ``HEAD`` requests and conditional responses in the same way as
+    with WSGI. A response body that is not a list is iterated in the
+    executor.
+
+    :param response: a :class:`webob.response.Response` instance.
+    :param environ: the WSGI environ of the request.
+    :param send: the ASGI send callable.
+    """
+    start = []
+
+    def start_response(status, headers, exc_info=None):
+        start.append((status, headers))
+
+    app_iter = response(environ, start_response)
+    status, headers = start[0]
+    await send({
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers],
+    })
+    try:
+        if isinstance(app_iter, (list, tuple)):
+            for chunk in app_iter:
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+        else:
+            chunks = iter(app_iter)
+            while True:
+                chunk = await run_sync(next, chunks, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+    finally:
+        close = getattr(app_iter, 'close', None)
+        if close is not None:
+            close()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+class ASGIApplication(object):
+    """An app as an ASGI application.
+
+    See the ASGI_ spec for more information. Only HTTP and lifespan
+    connections are supported. The app is committed when the
+    application starts up, or else when the first request is handled.
+
+    .. _ASGI: https://asgi.readthedocs.io
+
+    :param app: a :class:`morepath.App` instance.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    @reify
+    def publish(self):
+        """:func:`publish` wrapped in the tweens of the app.
+
+        See :func:`wrap`.
+        """
+        commit_if_needed(self.app)
+        return wrap(self.app)
+
+    async def __call__(self, scope, receive, send):
+        """Handle an ASGI connection.
+
+        :param scope: the connection scope.
+        :param receive: the ASGI receive callable.
+        :param send: the ASGI send callable.
+        """
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(
+                "Unsupported ASGI connection type: %s" % scope['type'])
+        body = await read_body(receive)
+        environ = environ_from_scope(scope, body)
+        environ[LOOP_KEY] = asyncio.get_event_loop()
+        request = self.app.request(environ)
+        response = await self.publish(request)
+        await send_response(response, environ, send)
+
+    async def lifespan(self, receive, send):
+        """Handle the lifespan protocol.
+
+        The app is committed on startup.
+
+        :param receive: the ASGI receive callable.
+        :param send: the ASGI send callable.
+        """
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # commits the app and wraps the tweens
+                self.publish
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
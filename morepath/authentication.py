@@ -10,8 +10,12 @@ directive.
 See also :class:`morepath.directive.IdentityPolicyRegistry`
 """
 import abc
+import hashlib
+import time
 
+from .cache import LRUCache
 from .compat import with_metaclass
+from .settings import SettingRegistry, get_setting
 
 
 class NoIdentity(object):
@@ -118,3 +122,158 @@ class IdentityPolicy(with_metaclass(abc.ABCMeta)):
         :type request: :class:`morepath.Request`
 
         """
+
+
+class IdentityCache(object):
+    """Cache of verified identities.
+
+    :meth:`morepath.Request.identity` uses it to verify an identity,
+    so that an identity that was verified before isn't verified again
+    with :meth:`morepath.App.verify_identity` until the cache entry
+    expires. Only identities that could be verified are cached.
+
+    The cache is disabled by default. It is configured with the
+    settings in the ``identity`` section:
+
+    ``cache_size``
+      the maximum amount of users to cache identities for in an
+      :class:`morepath.cache.LRUCache`. The default is ``0``, which
+      disables the cache unless ``cache_store`` is set.
+
+    ``cache_ttl``
+      the amount of seconds a verified identity is cached. The default
+      is ``60``.
+
+    ``cache_store``
+      the store to cache identities in instead of an ``LRUCache``, for
+      instance a :class:`morepath.cache.MappingStore`. It must have
+      ``get``, ``put`` and ``delete`` methods. Optional.
+
+    The cache is keyed on a hash of :meth:`Identity.as_dict`, so an
+    identity with different information, such as another password,
+    is verified again. The entries of a user are removed with
+    :meth:`forget`, which :meth:`morepath.App.forget_identity` does
+    for the identity of the request.
+
+    :param setting_registry: a :class:`morepath.settings.SettingRegistry`
+      instance.
+    """
+    factory_arguments = {
+        'setting_registry': SettingRegistry,
+    }
+
+    def __init__(self, setting_registry):
+        self.setting_registry = setting_registry
+        self.store = None
+        self.ttl = 60
+
+    def install(self):
+        """Set up the cache with the settings.
+        """
+        settings = self.setting_registry
+        size = get_setting(settings, 'identity', 'cache_size', 0)
+        self.ttl = get_setting(settings, 'identity', 'cache_ttl', 60)
+        self.store = get_setting(settings, 'identity', 'cache_store')
+        if self.store is None and size:
+            self.store = LRUCache(size)
+
+    def verify(self, app, identity):
+        """Verify an identity, using the cache.
+
+        :param app: the :class:`morepath.App` instance to verify the
+          identity with.
+        :param identity: the :class:`Identity` to verify.
+        :return: ``True`` if the identity can be verified.
+        """
+        store = self.store
+        if store is None:
+            return app._verify_identity(identity)
+        key = identity_key(identity)
+        now = time.time()
+        entries = store.get(identity.userid)
+        if entries is not None and entries.get(key, 0) > now:
+            return True
+        verified = app._verify_identity(identity)
+        if verified:
+            entries = dict((k, expires) for k, expires
+                           in (entries or {}).items() if expires > now)
+            entries[key] = now + self.ttl
+            store.put(identity.userid, entries)
+        return verified
+
+    def forget(self, userid):
+        """Remove the cached identities of a user.
+
+        :param userid: the userid of the user.
+        """
+        if self.store is not None:
+            self.store.delete(userid)
+
+
+def identity_key(identity):
+    """The key for an identity in the :class:`IdentityCache`.
+
+    This is a hash, so that the cache doesn't contain information
+    such as passwords.
+
+    :param identity: an :class:`Identity`.
+    :return: a hex digest of the identity information.
+    """
+    info = repr(sorted(identity.as_dict().items()))
+    return hashlib.sha256(info.encode('utf-8')).hexdigest()
+
+
+class PermissionMemo(object):
+    """Memo of permission checks within a request.
+
+    :class:`morepath.view.View` and :meth:`morepath.Request.permits`
+    use it to check permissions with :meth:`morepath.App._permits`. A
+    page that embeds views and shows links depending on permissions
+    may check the same permission on the same object many times; with
+    the memo the permission rules run once per request for each
+    identity, object and permission.
+
+    The memo is disabled by default. Enable it with the ``memoize``
+    setting in the ``permission`` section. Only do this if permission
+    rules don't depend on state that changes during the request.
+
+    :param setting_registry: a :class:`morepath.settings.SettingRegistry`
+      instance.
+    """
+    factory_arguments = {
+        'setting_registry': SettingRegistry,
+    }
+
+    def __init__(self, setting_registry):
+        self.setting_registry = setting_registry
+        self.enabled = False
+
+    def install(self):
+        """Set up the memo with the settings.
+        """
+        self.enabled = get_setting(
+            self.setting_registry, 'permission', 'memoize', False)
+
+    def permits(self, app, request, identity, obj, permission):
+        """Check whether an identity has a permission for an object.
+
+        :param app: the :class:`morepath.App` instance to check the
+          permission with.
+        :param request: the :class:`morepath.Request` to remember the
+          result in.
+        :param identity: the :class:`Identity` or :data:`NO_IDENTITY`.
+        :param obj: the model object.
+        :param permission: the permission class.
+        :return: ``True`` if the identity has the permission.
+        """
+        if not self.enabled:
+            return app._permits(identity, obj, permission)
+        # the values keep the objects alive, so that their ids
+        # aren't reused during the request
+        key = (id(app), id(identity), id(obj), permission)
+        memo = request._permits_memo
+        entry = memo.get(key)
+        if entry is None:
+            entry = memo[key] = (
+                app, identity, obj, app._permits(identity, obj, permission))
+        return entry[3]
@@ -5,15 +5,33 @@ This module defines functionality to automatically configure Morepath.
 are part of the public API.
 """
 
+import json
+import os
+import re
 import sys
+from timeit import default_timer as timer
+import dectate
 import importscan
 import importlib
-import pkg_resources
 
+from .compat import string_types
 from .error import AutoImportError
 
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # pragma: no cover
+    try:
+        import importlib_metadata
+    except ImportError:
+        importlib_metadata = None
+
+try:
+    from packaging.markers import InvalidMarker, Marker
+except ImportError:  # pragma: no cover
+    Marker = None
 
-def scan(package=None, ignore=None, handle_error=None):
+
+def scan(package=None, ignore=None, handle_error=None, manifest=None):
     """Scan package for configuration actions (decorators).
 
     It scans by recursively importing the package and any modules
@@ -21,21 +39,30 @@ def scan(package=None, ignore=None, handle_error=None):
 
     Register any found directives with their app classes.
 
+    If you give the name of a manifest file, the modules of the
+    package that use directives are recorded in it. The next scan
+    with the same manifest only imports these modules, as long as
+    no file in the package has been changed since.
+
     :param package: The Python module or package to scan. Optional; if left
       empty case the calling package is scanned.
     :param ignore: A list of packages to ignore. Optional. Defaults to
       ``['.test', '.tests']``. See :func:`importscan.scan` for details.
     :param handle_error: Optional error handling function. See
       :func:`importscan.scan` for details.
+    :param manifest: the name of a manifest file. Optional.
+    :return: the scan profile, a list of ``(name, seconds)`` tuples
+      with the time it took to import each module, in the order they
+      were imported.
     """
     if package is None:
         package = caller_package()
     if ignore is None:
         ignore = ['.test', '.tests']
-    importscan.scan(package, ignore, handle_error)
+    return scan_package(package, ignore, handle_error, manifest)
 
 
-def autoscan(ignore=None):
+def autoscan(ignore=None, declared=False, cache=None, manifest=None):
     """Automatically load Morepath configuration from packages.
 
     Morepath configuration consists of decorator calls on :class:`App`
@@ -100,19 +127,65 @@ def autoscan(ignore=None):
     ``ignore`` argument that excludes the modules that generate import
     errors.
 
+    Packages can also declare the modules that contain Morepath
+    configuration, with an entry point in the group ``morepath`` for
+    each of them::
+
+          entry_points={
+              'morepath': [
+                  'scan = somepackage',
+                  'views = somepackage.views',
+                  'paths = somepackage.paths',
+              ]
+          })
+
+    If ``declared`` is true, ``autoscan`` only imports these modules
+    instead of recursively importing the whole package. Packages
+    without entry points are still scanned recursively.
+
+    Finding the packages to scan means looking at the requirements of
+    all installed distributions, which takes time if there are many.
+    Pass a file name as ``cache`` to store the packages found in it.
+    The next time ``autoscan`` uses the file instead, as long as the
+    directories on :data:`sys.path` haven't been changed, which
+    happens when distributions are installed or removed.
+
+    Packages that are scanned recursively can also be recorded in a
+    manifest file, see :func:`scan`.
+
     See also :func:`scan`.
 
     :param ignore: ignore to ignore some modules
       during scanning. Optional. If ommitted, ignore ``.test`` and
       ``.tests`` packages by default. See :func:`importscan.scan` for
       more details.
+    :param declared: only import the modules declared with entry
+      points, see above. Optional.
+    :param cache: the name of a file to cache the packages to scan
+      in. Optional.
+    :param manifest: the name of a manifest file, see :func:`scan`.
+      Optional.
+    :return: a list of ``(name, seconds)`` tuples with the time it
+      took to scan each package, or to import each declared module,
+      in the order they were scanned.
 
     """
     if ignore is None:
         ignore = []
         ignore.extend(['.test', '.tests'])
-    for package in morepath_packages():
-        importscan.scan(package, ignore)
+    report = []
+    for project_name, module_name, modules in morepath_distributions(cache):
+        if declared and modules:
+            for name in modules:
+                start = timer()
+                import_module(project_name, name)
+                report.append((name, timer() - start))
+        else:
+            start = timer()
+            scan_package(import_module(project_name, module_name),
+                         ignore, manifest=manifest)
+            report.append((module_name, timer() - start))
+    return report
 
 
 def morepath_packages():
@@ -128,11 +201,392 @@ def morepath_packages():
       by ``setup.py``.
 
     """
+    for project_name, module_name, modules in morepath_distributions():
+        yield import_module(project_name, module_name)
+
+
+def morepath_distributions(cache=None):
+    """Find the distributions that depend on Morepath.
+
+    Uses :func:`metadata_distributions` if :mod:`importlib.metadata`
+    (or its backport ``importlib_metadata``) is available, and
+    :func:`pkg_resources_distributions` otherwise.
+
+    :param cache: the name of a file to cache the result in, see
+      :func:`morepath.autoscan`. Optional.
+    :return: a list of ``(project_name, module_name, modules)`` tuples
+      for the distributions that depend on Morepath, directly or
+      indirectly. ``module_name`` is the module to scan and
+      ``modules`` the modules declared with entry points.
+    """
+    if cache is None:
+        return find_distributions()
+    key = path_key()
+    data = read_json(cache)
+    if data is not None and data.get('key') == key:
+        return [tuple(entry) for entry in data['distributions']]
+    result = find_distributions()
+    write_json(cache, {'key': key, 'distributions': result})
+    return result
+
+
+def read_json(filename):
+    """Read a JSON file.
+
+    :param filename: the name of the file.
+    :return: the data, or ``None`` if the file doesn't exist or
+      can't be read.
+    """
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def write_json(filename, data):
+    """Write a JSON file.
+
+    The data is written to a temporary file first, which then replaces
+    the file, so that other processes never read a partial file.
+
+    :param filename: the name of the file.
+    :param data: the data to write.
+    """
+    tmp = '%s.%s.tmp' % (filename, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    getattr(os, 'replace', os.rename)(tmp, filename)
+
+
+def find_distributions():
+    if importlib_metadata is not None:
+        return metadata_distributions('morepath')
+    return pkg_resources_distributions('morepath')  # pragma: no cover
+
+
+def path_key():
+    """The key for the cache of :func:`morepath_distributions`.
+
+    :return: a list of the directories on :data:`sys.path` and their
+      modification times.
+    """
+    result = []
+    for path in sys.path:
+        try:
+            result.append([path, os.stat(path or '.').st_mtime])
+        except OSError:
+            pass
+    return result
+
+
+REQUIREMENT_NAME = re.compile(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+"""regex for the project name at the start of a requirement.
+"""
+
+
+def canonical_name(project_name):
+    """Normalize a project name so that it can be compared.
+    """
+    return re.sub(r'[-_.]+', '-', project_name).lower()
+
+
+def safe_name(name):
+    """Turn a distribution name into a project name.
+
+    Like :func:`pkg_resources.safe_name`.
+    """
+    return re.sub('[^A-Za-z0-9.]+', '-', name)
+
+
+def metadata_distributions(on_project_name):
+    """Find distributions that depend on a project with importlib.metadata.
+
+    This reads only the metadata of the distributions, unlike
+    :class:`DependencyMap`, which uses :mod:`pkg_resources`, but finds
+    the same distributions, see :func:`read_metadata`. They can be in
+    a different order.
+
+    :param on_project_name: Python distribution name.
+    :return: a list of ``(project_name, module_name, modules)`` tuples,
+      see :func:`morepath_distributions`.
+    """
+    requires = {}
+    found = []
+    for dist in importlib_metadata.distributions():
+        name, required = read_metadata(dist)
+        if name is None:
+            continue
+        key = canonical_name(name)
+        if key in requires:
+            continue
+        requires[key] = {canonical_name(n) for n in required}
+        found.append((key, name, dist))
+
+    relevant = dependents(requires, canonical_name(on_project_name))
+    result = []
+    for key, name, dist in found:
+        if key not in relevant:
+            continue
+        project_name = safe_name(name)
+        modules = [entry_point.value.partition(':')[0].strip()
+                   for entry_point in dist.entry_points
+                   if entry_point.group == 'morepath']
+        scan = [entry_point.value.partition(':')[0].strip()
+                for entry_point in dist.entry_points
+                if entry_point.group == 'morepath' and
+                entry_point.name == 'scan']
+        if scan:
+            module_name = scan[0]
+        else:
+            module_name = project_name.replace('-', '_')
+        result.append((project_name, module_name, modules))
+    return result
+
+
+def read_metadata(dist):
+    """Read the name and the requirements of a distribution.
+
+    Only the headers of the metadata are read, which is a lot faster
+    than :attr:`importlib.metadata.Distribution.metadata` for
+    distributions with a long description.
+
+    Like :meth:`pkg_resources.Distribution.requires`, requirements for
+    extras are left out, and so are requirements with an environment
+    marker that doesn't match the current environment. Markers are
+    evaluated with :mod:`packaging`; if it isn't installed, or if a
+    marker is invalid, the requirement is kept.
+
+    :param dist: an :class:`importlib.metadata.Distribution`.
+    :return: a ``(name, requirements)`` tuple, where the requirements
+      are the names of the projects that are required.
+    """
+    text = dist.read_text('METADATA') or dist.read_text('PKG-INFO') or ''
+    name = None
+    requirements = []
+    for line in text.splitlines():
+        if not line:
+            # the end of the headers
+            break
+        header, sep, value = line.partition(':')
+        if header == 'Name':
+            name = value.strip()
+        elif header == 'Requires-Dist':
+            requirements.append(value)
+    if not requirements:
+        # an egg-info directory has the requirements in a separate
+        # file, with sections for extras and environment markers
+        section = ''
+        for line in (dist.read_text('requires.txt') or '').splitlines():
+            line = line.strip()
+            if line.startswith('['):
+                section = line[1:-1]
+            elif line and not section.partition(':')[0]:
+                marker = section.partition(':')[2]
+                if marker:
+                    line += ';' + marker
+                requirements.append(line)
+    names = []
+    for requirement in requirements:
+        marker = requirement.partition(';')[2].strip()
+        if 'extra' in marker or not marker_matches(marker):
+            continue
+        match = REQUIREMENT_NAME.match(requirement)
+        if match is not None:
+            names.append(match.group(1))
+    return name, names
+
+
+def marker_matches(marker):
+    """Check whether an environment marker matches this environment.
+
+    :param marker: the marker, such as ``python_version >= "3"``, or
+      an empty string.
+    :return: ``False`` if the marker doesn't match, ``True`` otherwise,
+      also if it can't be evaluated.
+    """
+    if not marker or Marker is None:
+        return True
+    try:
+        return Marker(marker).evaluate()
+    except InvalidMarker:
+        return True
+
+
+def pkg_resources_distributions(on_project_name):
+    """Find distributions that depend on a project with pkg_resources.
+
+    :param on_project_name: Python distribution name.
+    :return: a list of ``(project_name, module_name, modules)`` tuples,
+      see :func:`morepath_distributions`.
+    """
     m = DependencyMap()
     m.load()
+    result = []
+    for distribution in m.relevant_dists(on_project_name):
+        modules = [entry_point.module_name for entry_point in
+                   distribution.get_entry_map('morepath').values()]
+        result.append((distribution.project_name,
+                       get_module_name(distribution), modules))
+    return result
+
+
+def dependents(requires, on_project_name):
+    """Find the projects that depend on a project, transitively.
+
+    :param requires: a dict that maps project names to the set of
+      project names they require.
+    :param on_project_name: Python distribution name.
+    :return: the set of project names that depend on
+      ``on_project_name``, directly or indirectly.
+    """
+    required_by = {}
+    for project_name, required in requires.items():
+        for name in required:
+            required_by.setdefault(name, set()).add(project_name)
+    result = set()
+    todo = [on_project_name]
+    while todo:
+        for project_name in required_by.get(todo.pop(), ()):
+            if project_name not in result:
+                result.add(project_name)
+                todo.append(project_name)
+    return result
+
+
+def scan_package(package, ignore, handle_error=None, manifest=None):
+    """Scan a package, using a manifest.
+
+    See :func:`morepath.scan`.
+
+    :param package: the package to scan.
+    :param ignore: the modules to ignore.
+    :param handle_error: error handling function. Optional.
+    :param manifest: the name of a manifest file. Optional.
+    :return: the scan profile.
+    """
+    if manifest is None:
+        return import_modules(package, ignore, handle_error)
+    key = package_key(package)
+    data = read_json(manifest) or {}
+    entry = data.get(package.__name__)
+    if entry is not None and entry['key'] == key:
+        profile = []
+        for name in entry['modules']:
+            start = timer()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                if handle_error is None:
+                    raise
+                handle_error(name, e)
+            profile.append((name, timer() - start))
+        return profile
+    profile = import_modules(package, ignore, handle_error)
+    modules = [package.__name__] + [name for name, seconds in profile]
+    paths = directive_paths()
+    data = read_json(manifest) or {}
+    data[package.__name__] = {
+        'key': key,
+        'modules': [name for name in modules
+                    if module_path(sys.modules.get(name)) in paths],
+    }
+    write_json(manifest, data)
+    return profile
+
+
+def import_modules(package, ignore, handle_error=None):
+    """Recursively import the modules in a package.
+
+    Uses :func:`importscan.scan`, and times each import with a
+    callable added to the end of ``ignore``. ``importscan`` only calls
+    it for modules that aren't ignored by the others, right before it
+    imports them, so the time until the next call is the time it took
+    to import the module. It never ignores a module.
+
+    :param package: the package to scan.
+    :param ignore: the modules to ignore, see :func:`importscan.scan`.
+    :param handle_error: error handling function. Optional.
+    :return: the scan profile, a list of ``(name, seconds)`` tuples.
+    """
+    if ignore is None:
+        ignore = []
+    elif isinstance(ignore, string_types) or callable(ignore):
+        ignore = [ignore]
+    profile = []
+    current = []
+
+    def record(name):
+        now = timer()
+        if current:
+            profile.append((current[0], now - current[1]))
+        current[:] = [name, now]
+        return False
+
+    try:
+        importscan.scan(package, list(ignore) + [record], handle_error)
+    finally:
+        if current:
+            profile.append((current[0], timer() - current[1]))
+    return profile
+
+
+def package_key(package):
+    """The key for the manifest of a package.
+
+    :param package: the package.
+    :return: a list of the Python files in the package and their
+      modification times.
+    """
+    if not hasattr(package, '__path__'):
+        paths = [package.__file__]
+    else:
+        paths = []
+        for directory in package.__path__:
+            for dirpath, dirnames, filenames in os.walk(directory):
+                dirnames.sort()
+                paths.extend(os.path.join(dirpath, filename)
+                             for filename in sorted(filenames)
+                             if filename.endswith('.py'))
+    return [[path, os.stat(path).st_mtime] for path in paths]
 
-    for distribution in m.relevant_dists('morepath'):
-        yield import_package(distribution)
+
+def module_path(module):
+    """The normalized path of the file of a module.
+
+    :param module: the module, or ``None``.
+    :return: the path, or ``None``.
+    """
+    path = getattr(module, '__file__', None)
+    if path is None:
+        return None
+    return os.path.normcase(os.path.abspath(path))
+
+
+def directive_paths():
+    """The files in which directives have been used.
+
+    :return: the set of normalized paths of the files in which
+      directives were used on any app class.
+    """
+    result = set()
+    todo = [dectate.App]
+    seen = set(todo)
+    while todo:
+        app_class = todo.pop()
+        for subclass in app_class.__subclasses__():
+            if subclass not in seen:
+                seen.add(subclass)
+                todo.append(subclass)
+        # dectate has no public API for the directives used on an
+        # app class before it is committed, so this reads them from
+        # the configurable. setup.py pins dectate for this, and
+        # morepath/tests/test_scanning.py checks that it still works.
+        for directive, obj in app_class.dectate._directives:
+            code_info = directive.code_info
+            if code_info is not None:
+                result.add(os.path.normcase(os.path.abspath(code_info.path)))
+    return result
 
 
 def import_package(distribution):
@@ -140,10 +594,22 @@ def import_package(distribution):
     Takes a pkg_resources distribution and loads the module contained
     in it, if it matches the rules layed out in :func:`morepath.autoscan`.
     """
+    return import_module(distribution.project_name,
+                         get_module_name(distribution))
+
+
+def import_module(project_name, module_name):
+    """Import a module of a distribution.
+
+    :param project_name: the name of the distribution, used in the
+      error.
+    :param module_name: the name of the module.
+    :return: the module.
+    """
     try:
-        return importlib.import_module(get_module_name(distribution))
+        return importlib.import_module(module_name)
     except ImportError:
-        raise AutoImportError(distribution.project_name)
+        raise AutoImportError(project_name)
 
 
 class DependencyMap(object):
@@ -159,6 +625,8 @@ class DependencyMap(object):
     def load(self):
         """Fill the registry with dependency information.
         """
+        # importing pkg_resources is slow, so only do it when needed
+        import pkg_resources
         for dist in pkg_resources.working_set:
             self._dists[dist.project_name] = dist
             for r in dist.requires():
@@ -192,6 +660,7 @@ class DependencyMap(object):
         :return: iterable of Python distribution objects that depend on
           project
         """
+        import pkg_resources
         for dist in pkg_resources.working_set:
             if not self.depends(dist.project_name, on_project_name):
                 continue
@@ -0,0 +1,162 @@
+"""Caches used by Morepath to speed up repeated lookups.
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """A bounded cache that discards the least recently used entries.
+
+    Keeps track of the amount of hits and misses so that you can see
+    whether the cache is effective.
+
+    The cache can be used by multiple threads. It doesn't use a lock,
+    so under concurrent use the counters are approximate and an entry
+    can be discarded slightly earlier than it otherwise would be, or
+    be discarded right after it is stored.
+
+    :param maxsize: the maximum amount of entries to keep.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = data = OrderedDict()
+        try:
+            self._move_to_end = data.move_to_end
+        except AttributeError:  # pragma: no cover
+            # Python 2
+            def move_to_end(key):
+                data[key] = data.pop(key)
+            self._move_to_end = move_to_end
+
+    def get(self, key, default=None):
+        """Get a value from the cache.
+
+        A value that is found becomes the most recently used one.
+
+        :param key: the key to look up.
+        :param default: returned if the key is not in the cache.
+        :return: the cached value, or ``default``.
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        try:
+            self._move_to_end(key)
+        except KeyError:
+            # discarded by another thread in the mean time
+            pass
+        return value
+
+    def put(self, key, value):
+        """Store a value in the cache.
+
+        If the cache is full the least recently used entry is
+        discarded.
+
+        :param key: the key to store the value under.
+        :param value: the value to store.
+        """
+        data = self._data
+        data[key] = value
+        try:
+            self._move_to_end(key)
+        except KeyError:
+            # discarded by another thread in the mean time
+            pass
+        while len(data) > self.maxsize:
+            try:
+                data.popitem(last=False)
+            except KeyError:
+                # emptied by another thread in the mean time
+                break
+
+    def delete(self, key):
+        """Remove a value from the cache, if it is there.
+
+        :param key: the key of the value to remove.
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries from the cache and reset the counters.
+        """
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """The fraction of lookups that were hits.
+
+        This is ``0.0`` if there were no lookups yet.
+        """
+        total = self.hits + self.misses
+        if not total:
+            return 0.0
+        return float(self.hits) / total
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class MappingStore(object):
+    """A bounded cache that stores its entries in a mapping.
+
+    It has the same ``get``, ``put`` and ``delete`` methods as
+    :class:`LRUCache`, so it can be used instead of it. Give it a
+    mapping that is shared between processes, such as a dict created
+    by a :class:`multiprocessing.managers.SyncManager`, to share the
+    cache between them. Values are replaced as a whole and never
+    modified in place, so that this works for such mappings.
+
+    There is no order of use in the mapping: if the cache is full an
+    arbitrary entry is discarded.
+
+    :param mapping: the mapping to store the entries in.
+    :param maxsize: the maximum amount of entries to keep.
+    """
+    def __init__(self, mapping, maxsize):
+        self.mapping = mapping
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        """Get a value from the cache.
+
+        :param key: the key to look up.
+        :param default: returned if the key is not in the cache.
+        :return: the cached value, or ``default``.
+        """
+        return self.mapping.get(key, default)
+
+    def put(self, key, value):
+        """Store a value in the cache.
+
+        :param key: the key to store the value under.
+        :param value: the value to store.
+        """
+        mapping = self.mapping
+        while key not in mapping and len(mapping) >= self.maxsize:
+            try:
+                mapping.popitem()
+            except KeyError:
+                # emptied by another process in the mean time
+                break
+        mapping[key] = value
+
+    def delete(self, key):
+        """Remove a value from the cache, if it is there.
+
+        :param key: the key of the value to remove.
+        """
+        self.mapping.pop(key, None)
+
+    def __len__(self):
+        return len(self.mapping)
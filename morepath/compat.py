@@ -50,3 +50,52 @@ def with_metaclass(meta, *bases):
         def __new__(cls, name, this_bases, attrs):
             return meta(name, bases, attrs)
     return type.__new__(metaclass, 'temporary_class', (), {})
+
+
+# From Benjamin Peterson's six library
+if PY3:
+    def reraise(tp, value, tb=None):
+        """Reraise an exception with its original traceback."""
+        if value.__traceback__ is not tb:
+            raise value.with_traceback(tb)
+        raise value
+else:  # pragma: no cover
+    exec("""def reraise(tp, value, tb=None):
+    raise tp, value, tb
+""")
+
+
+try:
+    from types import MappingProxyType
+except ImportError:  # pragma: no cover
+    # Python 2
+    class MappingProxyType(object):
+        """A read-only view of a dict."""
+        __slots__ = ('_mapping',)
+
+        def __init__(self, mapping):
+            self._mapping = mapping
+
+        def __getitem__(self, key):
+            return self._mapping[key]
+
+        def __contains__(self, key):
+            return key in self._mapping
+
+        def __iter__(self):
+            return iter(self._mapping)
+
+        def __len__(self):
+            return len(self._mapping)
+
+        def get(self, key, default=None):
+            return self._mapping.get(key, default)
+
+        def keys(self):
+            return self._mapping.keys()
+
+        def values(self):
+            return self._mapping.values()
+
+        def items(self):
+            return self._mapping.items()
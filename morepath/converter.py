@@ -15,6 +15,8 @@ See also :class:`morepath.directive.ConverterRegistry`
 import reg
 from dectate import DirectiveError
 
+from .introspect import register
+
 try:
     from types import ClassType
 except ImportError:
@@ -171,7 +173,7 @@ class ConverterRegistry(object):
           the converter.
         :param converter: a :class:`morepath.Converter` instance.
         """
-        self.get_converter.register(type=type)(lambda type: converter)
+        register(self.get_converter, lambda type: converter, type=type)
 
     def actual_converter(self, spec):
         """Return an actual converter for a given spec.
@@ -31,6 +31,7 @@ from webob.exc import (
 
 from .app import App
 from .converter import Converter, IDENTITY_CONVERTER
+from .tween import TweenHooks
 
 
 @App.predicate(App.get_view, name='model', default=None, index=ClassIndex)
@@ -97,8 +98,10 @@ def body_model_predicate(self, obj, request):
     Predicate for :meth:`morepath.App.view`.
     """
     # optimization: if we have a GET request, a common case,
-    # then there is no point in accessing the body.
-    if request.method == 'GET':
+    # then there is no point in accessing the body. Neither is there
+    # if no view has a body_model.
+    if (request.method == 'GET' or
+            not self.config.view_lookup.uses_body_model):
         return None.__class__
     return request.body_obj.__class__
 
@@ -171,25 +174,29 @@ def excview_tween_factory(app, handler):
     If no view can be found, raise it all the way up -- this will be a
     500 internal server error and an exception logged.
     """
-    def excview_tween(request):
-        try:
-            response = handler(request)
-        except Exception as exc:
-            # we must use component_by_keys here because we
-            # do not want the request to feature in the lookup;
-            # we don't want its request method or name to influence
-            # exception lookup
-            view = request.app.get_view.component_by_keys(model=exc.__class__)
-            if view is None:
-                raise
-
-            # we don't want to run any after already set in the exception view
-            if not isinstance(exc, (HTTPOk, HTTPRedirection)):
-                request.clear_after()
-
-            return view(app, exc, request)
-        return response
-    return excview_tween
+    def excview_exception(request, exc):
+        # we must use component_by_keys here because we
+        # do not want the request to feature in the lookup;
+        # we don't want its request method or name to influence
+        # exception lookup
+        view = request.app.get_view.component_by_keys(model=exc.__class__)
+        if view is None:
+            return None
+
+        # we don't want to run any after already set in the exception view
+        if not isinstance(exc, (HTTPOk, HTTPRedirection)):
+            request.clear_after()
+
+        return view(app, exc, request)
+    return TweenHooks(exception=excview_exception)
+
+
+VALID_HOST = re.compile(
+    r"^([a-z0-9.-]+|\[[a-f0-9]*:[a-f0-9:]+\])(:\d+)?$")
+"""regex that matches valid values of the HOST header.
+
+Used by :func:`poisoned_host_header_protection_tween_factory`.
+"""
 
 
 @App.tween_factory(over=excview_tween_factory)
@@ -206,16 +213,11 @@ def poisoned_host_header_protection_tween_factory(app, handler):
     * https://github.com/django/django/commit/77b06e41516d8136b56c040cba7e235b
 
     """
-    valid_host_re = re.compile(
-        r"^([a-z0-9.-]+|\[[a-f0-9]*:[a-f0-9:]+\])(:\d+)?$")
-
-    def poisoned_host_header_protection_tween(request):
-        if not valid_host_re.match(request.host):
+    def poisoned_host_header_protection_before(request):
+        if not VALID_HOST.match(request.host):
             return HTTPBadRequest("Invalid HOST header")
 
-        return handler(request)
-
-    return poisoned_host_header_protection_tween
+    return TweenHooks(before=poisoned_host_header_protection_before)
 
 
 @App.view(model=HTTPException)
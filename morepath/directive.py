@@ -33,16 +33,20 @@ import os
 import dectate
 from reg import methodify
 
-from .authentication import Identity, NoIdentity
-from .view import render_view, render_json, render_html, View
+from .authentication import (Identity, IdentityCache, NoIdentity,
+                             NO_IDENTITY, PermissionMemo)
+from .view import (render_view, render_json, render_json_stream,
+                   render_html, JsonRegistry, View, ViewLookup)
 from .traject import Path
 from .converter import ConverterRegistry
 from .tween import TweenRegistry
+from .timing import TimingRegistry
 from .template import TemplateEngineRegistry
 from .predicate import PredicateRegistry
 from .path import PathRegistry
 from .settings import SettingRegistry
 from .mapply import mapply
+from .introspect import register
 
 
 def isbaseclass(a, b):
@@ -340,6 +344,10 @@ class PathAction(dectate.Action):
             self.get_converters, self.absorb,
             obj)
 
+    @staticmethod
+    def after(path_registry):
+        path_registry.install_routes()
+
 
 class PathCompositeAction(dectate.Composite):
     filter_convert = {
@@ -422,6 +430,7 @@ class PathCompositeAction(dectate.Composite):
 
 class PermissionRuleAction(dectate.Action):
     config = {
+        'permission_memo': PermissionMemo,
     }
 
     filter_convert = {
@@ -463,16 +472,20 @@ class PermissionRuleAction(dectate.Action):
             identity = NoIdentity
         self.identity = identity
 
-    def identifier(self, app_class):
+    def identifier(self, permission_memo, app_class):
         return (self.model, self.permission, self.identity)
 
-    def perform(self, obj, app_class):
+    def perform(self, obj, permission_memo, app_class):
         app_class._permits.register(
             methodify(obj, selfname='app'),
             identity=self.identity,
             obj=self.model,
             permission=self.permission)
 
+    @staticmethod
+    def after(permission_memo, app_class):
+        permission_memo.install()
+
 
 template_directory_id = 0
 
@@ -618,6 +631,7 @@ def isbaseclass_notfound(a, b):
 class ViewAction(dectate.Action):
     config = {
         'template_engine_registry': TemplateEngineRegistry,
+        'view_lookup': ViewLookup,
     }
 
     depends = [SettingAction, PredicateAction,
@@ -709,23 +723,30 @@ class ViewAction(dectate.Action):
         result['model'] = self.model
         return result
 
-    def identifier(self, template_engine_registry, app_class):
+    def identifier(self, template_engine_registry, view_lookup, app_class):
         return app_class.get_view.key_dict_to_predicate_key(self.key_dict())
 
-    def perform(self, obj, template_engine_registry, app_class):
+    def perform(self, obj, template_engine_registry, view_lookup,
+                app_class):
         render = self.render
         if self.template is not None:
             render = template_engine_registry.get_template_render(
                 self.template, render)
         v = View(obj, render, self.permission, self.internal)
-        app_class.get_view.register(v, **self.key_dict())
+        register(app_class.get_view, v, **self.key_dict())
+        if self.predicates.get('body_model', object) is not object:
+            view_lookup.uses_body_model = True
+
+    @staticmethod
+    def after(template_engine_registry, view_lookup, app_class):
+        view_lookup.install()
 
 
 class JsonAction(ViewAction):
     group_class = ViewAction
 
     def __init__(self, model, render=None, template=None, permission=None,
-                 internal=False, **predicates):
+                 internal=False, stream=False, **predicates):
         """Register JSON view.
 
         This is like :meth:`morepath.App.view`, but with
@@ -735,6 +756,12 @@ class JsonAction(ViewAction):
         Transforms the view output to JSON and sets the content type to
         ``application/json``.
 
+        If ``stream`` is true the view function should return an
+        iterable, such as a generator. Its items are serialized one by
+        one into a JSON array while the response is sent, using
+        :func:`morepath.render_json_stream`, so that a large response
+        doesn't have to be kept in memory.
+
         :param model: the class of the model for which this view is registered.
         :param name: the name of the view as it appears in the URL. If omitted,
           it is the empty string, meaning the default view for the model.
@@ -757,6 +784,8 @@ class JsonAction(ViewAction):
           :meth:`morepath.Request.view`, but will not be published on
           the web. It will be as if the view is not there.
           By default a view is ``False``, so not internal.
+        :param stream: if true, stream the items returned by the view
+          function as a JSON array. Ignored if ``render`` is given.
         :param name: the name of the view as it appears in the URL. If omitted,
           it is the empty string, meaning the default view for the model.
           This is a predicate.
@@ -766,7 +795,8 @@ class JsonAction(ViewAction):
         :param predicates: predicates to match this view on. See the
           documentation of :meth:`App.view` for more information.
         """
-        render = render or render_json
+        if render is None:
+            render = render_json_stream if stream else render_json
         super(JsonAction, self).__init__(model, render, template,
                                          permission, internal, **predicates)
 
@@ -1036,6 +1066,47 @@ class TweenFactoryAction(dectate.Action):
             obj, over=self.over, under=self.under)
 
 
+timing_callback_id = 0
+
+
+class TimingCallbackAction(dectate.Action):
+    config = {
+        'timing_registry': TimingRegistry
+    }
+
+    def __init__(self, name=None):
+        """Register timing callback.
+
+        Once a timing callback is registered, the duration of each
+        stage of publishing a request is measured, such as routing,
+        calling the model factory, checking the permission, calling the
+        view function and rendering it. See :mod:`morepath.timing` for
+        the stages. Without timing callbacks nothing is measured.
+
+        The decorated function is called for each stage with four
+        arguments: the request, the name of the stage, a label such as
+        the name of the app class or the view function, and the
+        duration in seconds. :class:`morepath.timing.Histogram` can be
+        used as a timing callback.
+
+        :param name: The name under which to register this timing
+          callback, so that it can be overridden by applications that
+          extend this one. If no name is supplied a default name is
+          generated.
+        """
+        global timing_callback_id
+        if name is None:
+            name = u'timing_callback_%s' % timing_callback_id
+            timing_callback_id += 1
+        self.name = name
+
+    def identifier(self, timing_registry):
+        return self.name
+
+    def perform(self, obj, timing_registry):
+        timing_registry.register_timing_callback(obj)
+
+
 class IdentityPolicyAction(dectate.Action):
     depends = [SettingAction]
 
@@ -1066,13 +1137,21 @@ class IdentityPolicyAction(dectate.Action):
             obj, settings=setting_registry)
         app_class._identify = identity_policy.identify
         app_class.remember_identity = identity_policy.remember
-        app_class.forget_identity = identity_policy.forget
+
+        def forget_identity(app, response, request):
+            identity = identity_policy.identify(request)
+            if identity is not None and identity is not NO_IDENTITY:
+                app.config.identity_cache.forget(identity.userid)
+            identity_policy.forget(response, request)
+
+        app_class.forget_identity = forget_identity
 
 
 class VerifyIdentityAction(dectate.Action):
     depends = [SettingAction]
 
     config = {
+        'identity_cache': IdentityCache,
     }
 
     app_class_arg = True
@@ -1105,17 +1184,22 @@ class VerifyIdentityAction(dectate.Action):
         '''
         self.identity = identity
 
-    def identifier(self, app_class):
+    def identifier(self, identity_cache, app_class):
         return self.identity
 
-    def perform(self, obj, app_class):
+    def perform(self, obj, identity_cache, app_class):
         app_class._verify_identity.register(
             methodify(obj, selfname='app'),
             identity=self.identity)
 
+    @staticmethod
+    def after(identity_cache, app_class):
+        identity_cache.install()
+
 
 class DumpJsonAction(dectate.Action):
     config = {
+        'json_registry': JsonRegistry,
     }
 
     filter_convert = {
@@ -1128,6 +1212,8 @@ class DumpJsonAction(dectate.Action):
 
     app_class_arg = True
 
+    depends = [SettingAction]
+
     def __init__(self, model=object):
         '''Register a function that converts model to JSON.
 
@@ -1144,14 +1230,18 @@ class DumpJsonAction(dectate.Action):
         '''
         self.model = model
 
-    def identifier(self, app_class):
+    def identifier(self, json_registry, app_class):
         return self.model
 
-    def perform(self, obj, app_class):
+    def perform(self, obj, json_registry, app_class):
         app_class._dump_json.register(
             methodify(obj, selfname='app'),
             obj=self.model)
 
+    @staticmethod
+    def after(json_registry, app_class):
+        json_registry.install()
+
 
 class LoadJsonAction(dectate.Action):
     config = {
@@ -0,0 +1,127 @@
+"""Introspection of the arguments of callables.
+
+When an app class is committed Morepath looks at the arguments of
+model factories, and Reg checks the signature of every function that
+is registered for a dispatch method. Apps that create many app classes,
+for instance a subclass for each tenant, do this again and again for
+the same code, and for new closures and instances that Reg can't find
+in its own cache.
+
+:func:`arginfo` caches the argument names by code object in a
+:class:`weakref.WeakKeyDictionary`, so that all closures of a function
+and all instances of a callable class share an entry, and generated
+classes and functions aren't kept alive by the cache.
+
+:func:`register` uses it to register implementations of a dispatch
+method. It adds the implementation to the predicate registry of the
+Reg dispatch directly, which is not part of the documented API of
+Reg. ``setup.py`` therefore pins Reg to the 0.10 series, and
+``morepath/tests/test_introspect.py`` checks that it behaves the same
+as registering with Reg.
+"""
+import inspect
+import weakref
+from collections import namedtuple
+from types import FunctionType, MethodType
+
+from reg import RegistrationError, arginfo as reg_arginfo
+
+try:
+    from inspect import getfullargspec as getargspec
+except ImportError:  # pragma: no cover
+    # Python 2
+    from inspect import getargspec
+
+
+ArgInfo = namedtuple('ArgInfo', ['args', 'varargs', 'keywords', 'defaults'])
+"""Information about the arguments of a callable.
+
+Has the same fields as the ``ArgSpec`` returned by :func:`reg.arginfo`.
+"""
+
+
+_code_arguments = weakref.WeakKeyDictionary()
+
+
+def arginfo(callable):
+    """Get information about the arguments of a callable.
+
+    Like :func:`reg.arginfo`, this works for functions, methods,
+    classes and instances with a ``__call__`` method, and doesn't
+    report the ``self`` argument of a method. Callables that aren't
+    implemented in Python, such as a class without ``__init__``, are
+    passed on to :func:`reg.arginfo`.
+
+    :param callable: the callable to introspect.
+    :return: an :class:`ArgInfo`, or ``None`` if ``callable`` isn't
+      callable.
+    """
+    if isinstance(callable, FunctionType):
+        func, remove_self = callable, False
+    elif isinstance(callable, MethodType):
+        func, remove_self = callable.__func__, True
+    elif inspect.isclass(callable):
+        func, remove_self = getattr(callable, '__init__', None), True
+        if func is object.__init__:
+            return ArgInfo([], None, None, None)
+    else:
+        func, remove_self = getattr(type(callable), '__call__', None), True
+    if not isinstance(func, FunctionType):
+        result = reg_arginfo(callable)
+        if result is None:
+            return None
+        # the fields of ArgSpec and FullArgSpec start in the same order
+        return ArgInfo(*result[:4])
+    code = func.__code__
+    try:
+        args, varargs, keywords = _code_arguments[code]
+    except KeyError:
+        spec = getargspec(func)
+        args, varargs, keywords = _code_arguments[code] = (
+            tuple(spec[0]), spec[1], spec[2])
+    if remove_self:
+        args = args[1:]
+    return ArgInfo(list(args), varargs, keywords, func.__defaults__)
+
+
+def same_signature(a, b):
+    """Check whether two callables can be called in the same way.
+
+    This is the check Reg does when an implementation is registered:
+    the names of the arguments and their defaults may differ.
+
+    :param a: :class:`ArgInfo` of a callable.
+    :param b: :class:`ArgInfo` of another callable.
+    :return: ``True`` if the signatures are the same.
+    """
+    return (len(a.args) == len(b.args) and
+            a.varargs == b.varargs and
+            a.keywords == b.keywords)
+
+
+def register(dispatch, func, **key_dict):
+    """Register an implementation for a dispatch function.
+
+    Like calling ``register`` on the dispatch function, but the
+    signature of ``func`` is checked using :func:`arginfo`.
+
+    :param dispatch: the dispatch function, such as a dispatch method
+      of an app class.
+    :param func: the implementation.
+    :param key_dict: the predicate values to register ``func`` for.
+    :return: ``func``.
+    """
+    f_arginfo = arginfo(func)
+    if f_arginfo is None:
+        raise RegistrationError(
+            "Cannot register non-callable for dispatch "
+            "%r: %r" % (dispatch, func))
+    if not same_signature(arginfo(dispatch.wrapped_func), f_arginfo):
+        raise RegistrationError(
+            "Signature of callable dispatched to (%r) "
+            "not that of dispatch (%r)" % (func, dispatch))
+    # the registry is replaced when predicates are added, so get the
+    # current one from the Reg dispatch the methods are bound to
+    registry = dispatch.register.__self__.registry
+    registry.register(dispatch.key_dict_to_predicate_key(key_dict), func)
+    return func
@@ -0,0 +1,169 @@
+"""Reading JSON incrementally.
+
+:class:`JsonReader` reads JSON values from a file, such as the body
+of a request, a chunk at a time. It is used by
+:meth:`morepath.Request.iter_body_objs` to read a large JSON array or
+newline delimited JSON (NDJSON) body without reading all of it into
+memory first.
+"""
+import codecs
+import json
+import re
+
+
+CHUNK_SIZE = 64 * 1024
+"""Amount of bytes a :class:`JsonReader` reads at a time.
+"""
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+NUMBER_START = '-0123456789'
+
+
+class JsonReader(object):
+    """Read JSON values from a file incrementally.
+
+    The file is read in chunks of ``chunk_size`` bytes as values are
+    needed. Only the values that are being decoded are kept in memory,
+    so memory use doesn't depend on the size of the whole input. The
+    input is decoded as UTF-8.
+
+    Invalid JSON raises a :exc:`ValueError`, but only once the reader
+    gets to it: values before it have already been produced.
+
+    :param fileobj: a file-like object with a ``read`` method that
+      returns ``bytes``.
+    :param chunk_size: the amount of bytes to read at a time.
+    """
+    def __init__(self, fileobj, chunk_size=CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._raw_decode = json.JSONDecoder().raw_decode
+        self._buffer = u''
+        self._pos = 0
+        self._eof = False
+
+    def _read(self, size):
+        """Read more text into the buffer.
+
+        :param size: the amount of bytes to read.
+        :return: ``False`` if the end of the input was reached before.
+        """
+        if self._eof:
+            return False
+        data = self.fileobj.read(size)
+        if not data:
+            self._eof = True
+        text = self._decoder.decode(data, self._eof)
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character.
+
+        :return: the next character that is not whitespace, or ``''``
+          at the end of the input.
+        """
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read(self.chunk_size):
+                return ''
+
+    def _value(self):
+        """Decode the next value.
+
+        :return: the value in Python form.
+        """
+        self.peek()
+        while True:
+            # read at least as much as is pending, so that a large value
+            # is decoded a limited amount of times
+            size = max(self.chunk_size, len(self._buffer) - self._pos)
+            try:
+                value, end = self._raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if not self._read(size):
+                    raise
+                continue
+            # a number near the end of the buffer may continue in the
+            # next chunk, like 1.5e10 that is cut off after the e
+            if (self._buffer[self._pos] not in NUMBER_START or
+                    end + 2 < len(self._buffer) or
+                    not self._read(size)):
+                self._pos = end
+                return value
+
+    def _expect(self, chars, message):
+        """Consume the next character, which must be one of ``chars``.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(message)
+        self._pos += 1
+        return char
+
+    def _end(self):
+        """Check that only whitespace is left.
+        """
+        if self.peek():
+            raise ValueError("Extra data after JSON value")
+
+    def value(self):
+        """Read a single JSON value that makes up the rest of the input.
+
+        This reads all of the value into memory.
+
+        :return: the value in Python form.
+        """
+        value = self._value()
+        self._end()
+        return value
+
+    def read_rest(self):
+        """Read the rest of the input, without decoding it as JSON.
+
+        This is what hasn't been read as a value yet. Whitespace
+        skipped by :meth:`peek` is not included.
+
+        :return: the rest of the input as ``bytes``.
+        """
+        pending = self._decoder.getstate()[0]
+        rest = self._buffer[self._pos:].encode('utf-8') + pending
+        self._decoder.reset()
+        self._buffer = u''
+        self._pos = 0
+        if not self._eof:
+            rest += self.fileobj.read()
+            self._eof = True
+        return rest
+
+    def array(self):
+        """Read the items of a JSON array one by one.
+
+        An empty input has no items.
+
+        :return: an iterator of the items in Python form.
+        """
+        if not self.peek():
+            return
+        self._expect('[', "Expected a JSON array")
+        if self.peek() == ']':
+            self._pos += 1
+        else:
+            while True:
+                yield self._value()
+                if self._expect(',]', "Expected ',' or ']'") == ']':
+                    break
+        self._end()
+
+    def sequence(self):
+        """Read JSON values separated by whitespace, such as NDJSON.
+
+        :return: an iterator of the values in Python form.
+        """
+        while self.peek():
+            yield self._value()
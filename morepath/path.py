@@ -7,17 +7,20 @@ See also :class:`morepath.directive.PathRegistry`
 
 
 from dectate import DirectiveError
-from reg import arginfo, methodify
+from reg import methodify
 try:
     # Python 2
-    from urllib import urlencode, quote
+    from urllib import urlencode
 except ImportError:
-    from urllib.parse import urlencode, quote
+    from urllib.parse import urlencode
 
 
 from .traject import Path as TrajectPath, TrajectRegistry
 from .converter import ConverterRegistry, IDENTITY_CONVERTER
+from .settings import SettingRegistry, get_setting
+from .url import PathTemplate, quote_path, encode_query
 from .error import LinkError
+from .introspect import arginfo, register
 
 
 SPECIAL_ARGUMENTS = ['request', 'app']
@@ -35,20 +38,42 @@ class PathRegistry(TrajectRegistry):
 
     :param converter_registry: a
       :class:`morepath.directive.ConverterRegistry` instance
+    :param setting_registry: a
+      :class:`morepath.directive.SettingRegistry` instance
 
     """
     factory_arguments = {
-        'converter_registry': ConverterRegistry
+        'converter_registry': ConverterRegistry,
+        'setting_registry': SettingRegistry,
     }
 
     app_class_arg = True
 
-    def __init__(self, app_class, converter_registry):
+    def __init__(self, app_class, converter_registry, setting_registry):
         super(PathRegistry, self).__init__()
         self.app_class = app_class
         self.converter_registry = converter_registry
+        self.setting_registry = setting_registry
         self.mounted = {}
         self.named_mounted = {}
+        self.class_paths = {}
+
+    def install_routes(self):
+        """Prepare the routes for use once they are all registered.
+
+        If the ``traject.compiled`` setting is true the tree is
+        compiled using :meth:`morepath.traject.TrajectRegistry.compile`.
+
+        If the ``traject.cache_size`` setting is larger than 0 the
+        results of matching paths are cached, see
+        :meth:`morepath.traject.TrajectRegistry.enable_cache`.
+        """
+        settings = self.setting_registry
+        if get_setting(settings, 'traject', 'compiled', False):
+            self.compile()
+        cache_size = get_setting(settings, 'traject', 'cache_size', 0)
+        if cache_size:
+            self.enable_cache(cache_size)
 
     def register_path(self, model, path,
                       variables, converters, required, get_converters,
@@ -141,8 +166,8 @@ class PathRegistry(TrajectRegistry):
         :param func: function that gets a model instance argument and
           returns a variables dict.
         """
-        self.app_class._path_variables.register(
-            methodify(func, selfname='app'), obj=model)
+        register(self.app_class._path_variables,
+                 methodify(func, selfname='app'), obj=model)
 
     def register_inverse_path(self, model, path, factory_args,
                               converters=None, absorb=False):
@@ -158,14 +183,35 @@ class PathRegistry(TrajectRegistry):
         converters = converters or {}
         get_path = Path(path, factory_args, converters, absorb)
 
-        self.app_class._class_path.register(get_path, model=model)
+        register(self.app_class._class_path, get_path, model=model)
+        self.class_paths[model] = get_path
 
         def default_path_variables(app, obj):
             return {name: getattr(obj, name) for name in factory_args}
 
-        self.app_class._default_path_variables.register(
-            default_path_variables,
-            obj=model)
+        register(self.app_class._default_path_variables,
+                 default_path_variables, obj=model)
+
+    def class_path(self, model):
+        """Get the path registered for a model class.
+
+        This is the :class:`Path` that :meth:`morepath.App._class_path`
+        dispatches to, but looked up in a dict. The paths registered
+        for the model classes themselves are in it after commit, and
+        the path found for a subclass is added when it is first looked
+        up.
+
+        :param model: model class.
+        :return: a :class:`Path`, or ``None`` if no path is registered
+          for the model class or its bases.
+        """
+        try:
+            return self.class_paths[model]
+        except KeyError:
+            pass
+        result = self.class_paths[model] = (
+            self.app_class._class_path.component_by_keys(model=model))
+        return result
 
     def register_defer_links(self, model, app_factory):
         """Register factory for app to defer links to.
@@ -203,10 +249,22 @@ class PathInfo(object):
 
     :param path: a str representing a path
     :param parameters: a dict representing URL parameters.
+    :param quoted_path: the path quoted for use in a URL. Optional;
+      if omitted it is computed from ``path`` when needed.
     """
-    def __init__(self, path, parameters):
+    def __init__(self, path, parameters, quoted_path=None):
         self.path = path
         self.parameters = parameters
+        self._quoted_path = quoted_path
+
+    @property
+    def quoted_path(self):
+        """The path quoted for use in a URL.
+        """
+        result = self._quoted_path
+        if result is None:
+            result = self._quoted_path = quote_path(self.path)
+        return result
 
     def url(self, prefix, name):
         """Turn a path into a URL.
@@ -219,20 +277,14 @@ class PathInfo(object):
         """
         parts = []
         if self.path:
-            # explicitly define safe with ~ for a workaround
-            # of this Python bug:
-            # https://bugs.python.org/issue16285
-            # tilde should not be encoded according to RFC3986
-            parts.append(quote(self.path.encode('utf-8'), '/~'))
+            parts.append(self.quoted_path)
         if name:
             parts.append(name)
         # add prefix in the end. Even if result is empty we always get
         # a / at least
         result = prefix + '/' + '/'.join(parts)
         if self.parameters:
-            parameters = dict((key, [v.encode('utf-8') for v in value])
-                              for (key, value) in self.parameters.items())
-            result += '?' + fixed_urlencode(parameters, True)
+            result += '?' + encode_query(self.parameters)
         return result
 
 
@@ -251,6 +303,7 @@ class Path(object):
         self.path = path
         traject_path = TrajectPath(path)
         self.interpolation_path = traject_path.interpolation_str()
+        self.template = PathTemplate(self.interpolation_path)
         path_variables = traject_path.variables()
         self.parameter_names = {name for name in factory_args if
                                 name not in path_variables}
@@ -301,6 +354,55 @@ class Path(object):
           argument to the factory function should be represented.
         :return: :class:`PathInfo` instance representing the path.
         """
+        path, url_parameters, quoted_path = self.resolve(variables)
+        return PathInfo(path, url_parameters, quoted_path)
+
+    def url(self, prefix, name, variables, mount_info=None):
+        """Get the URL given variables.
+
+        This gives the same URL as :meth:`PathInfo.url` for the path
+        info of the mounted path, as :meth:`morepath.Request.class_link`
+        creates, but without creating the path info objects.
+
+        :param prefix: the URL prefix, see :meth:`PathInfo.url`.
+        :param name: the name of the view, see :meth:`PathInfo.url`.
+        :param variables: dict with the variables used in the path, see
+          :meth:`Path.__call__`.
+        :param mount_info: a :class:`PathInfo` for the path to the app
+          this path is registered in, or ``None`` if the app is not
+          mounted.
+        :return: the URL.
+        """
+        path, parameters, quoted_path = self.resolve(variables)
+        if mount_info is not None:
+            if path:
+                quoted_path = mount_info.quoted_path + '/' + quoted_path
+            else:
+                path = mount_info.path
+                quoted_path = mount_info.quoted_path
+            parameters.update(mount_info.parameters)
+        if path:
+            result = prefix + '/' + quoted_path
+            if name:
+                result += '/' + name
+        else:
+            result = prefix + '/' + name
+        if parameters:
+            result += '?' + encode_query(parameters)
+        return result
+
+    def resolve(self, variables):
+        """Get the path and URL parameters given variables.
+
+        Pops ``extra_parameters`` and, for an absorbing path,
+        ``absorb`` from ``variables``.
+
+        :param variables: dict with the variables used in the path, see
+          :meth:`Path.__call__`.
+        :return: a ``path, parameters, quoted_path`` tuple, where
+          ``parameters`` is a new dict with the converted URL
+          parameters.
+        """
         if not isinstance(variables, dict):
             raise LinkError("Variables is not a dict: %r" % variables)
         extra_parameters = variables.pop('extra_parameters', None)
@@ -313,15 +415,18 @@ class Path(object):
             variables, extra_parameters)
 
         path = self.interpolation_path % path_variables
+        quoted_path = self.template.quote(path, path_variables)
 
         if absorbed_path is not None:
             if path:
                 path += '/' + absorbed_path
+                quoted_path += '/' + quote_path(absorbed_path)
             else:
                 # when there is no path yet we are absorbing from
                 # the root and we don't want an additional /
                 path = absorbed_path
-        return PathInfo(path, url_parameters)
+                quoted_path = quote_path(absorbed_path)
+        return path, url_parameters, quoted_path
 
 
 def get_arguments(callable, exclude):
@@ -93,6 +93,18 @@ class PredicateRegistry(object):
             result.append(predicate)
         return result
 
+    def predicate_functions(self, name):
+        """Get the functions registered as predicates for a dispatch.
+
+        :param name: the name of the dispatch method, such as
+          ``get_view``.
+        :return: a list of predicate functions.
+        """
+        return [info.func
+                for dispatch, infos in self._predicate_infos.items()
+                if dispatch.__name__ == name
+                for info in infos]
+
     def sorted_predicate_infos(self, dispatch):
         """Topologically sort predicate infos for a dispatch function.
 
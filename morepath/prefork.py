@@ -0,0 +1,46 @@
+"""Preparing an application for a server that forks workers.
+
+Servers such as gunicorn with ``preload_app`` import the application
+in a master process and then fork worker processes. Whatever the
+master does before it forks doesn't have to be done again by each
+worker, and the memory it uses is shared with the workers.
+:func:`prepare_for_fork` does the work of starting a Morepath
+application in the master.
+"""
+import gc
+
+from .app import commit_if_needed
+
+
+def prepare_for_fork(app, freeze_gc=True):
+    """Prepare an application before a server forks workers.
+
+    This commits the app class and the apps mounted in it if this
+    hasn't happened yet, and wraps publishing in the tweens. The
+    workers then start with the committed configuration and don't
+    commit again.
+
+    On Python 3.7 and later it then uses :func:`gc.freeze` to move
+    the objects that exist into the permanent generation of the
+    garbage collector. The garbage collector of a worker then
+    doesn't touch them, so that the memory pages with the
+    configuration stay shared instead of being copied to each worker.
+    Call this last, after everything else the master needs to set up.
+    Frozen objects are never collected, not even when they become
+    garbage later, so pass ``freeze_gc=False`` if the master
+    process keeps running code that creates and drops objects with
+    reference cycles, or if it calls :func:`gc.freeze` itself.
+
+    :param app: the :class:`morepath.App` instance that the server
+      serves.
+    :param freeze_gc: if false, don't call :func:`gc.freeze`.
+    :return: ``app``.
+    """
+    commit_if_needed(app)
+    # reify the tween wrapping, so the workers don't need to do it
+    app.publish
+    if freeze_gc:
+        freeze = getattr(gc, 'freeze', None)
+        if freeze is not None:
+            freeze()
+    return app
@@ -15,9 +15,13 @@ The publish module:
 It all starts at :func:`publish`.
 """
 
+from timeit import default_timer as timer
+
 from webob.exc import HTTPNotFound
 
-from .app import App
+from .app import App, enter_app
+from .view import View
+from . import timing
 
 
 DEFAULT_NAME = u''
@@ -49,27 +53,52 @@ def resolve_model(request):
     traverse through mounted applications as indicated by the
     :meth:`morepath.App.mount` directive.
 
+    The routing is done by :func:`route`.
+
     :param: :class:`morepath.Request` instance.
     :return: model object or ``None`` if not found.
     """
+    steps = route(request)
+    node, variables = next(steps)
+    while True:
+        obj = node.create(variables, request)
+        try:
+            node, variables = steps.send(obj)
+        except StopIteration:
+            return obj
+
+
+def route(request):
+    """Route a request through the app and the apps mounted in it.
+
+    This is a generator that does the routing for
+    :func:`resolve_model`, and for the other ways to publish a
+    request, such as :mod:`morepath.asgi`. It uses
+    :meth:`morepath.traject.TrajectRegistry.resolve` in
+    :attr:`morepath.Request.app` and yields the ``(node, variables)``
+    it returns. The caller creates the object for the node and sends
+    it back. If this is a :class:`morepath.App` instance, and there is
+    path left to consume, routing continues in this mounted app,
+    which becomes the current app. Otherwise the generator stops, and
+    the object is the model object for the request.
+
+    :param request: :class:`morepath.Request` instance.
+    :return: a generator.
+    """
     app = request.app
-    while request.unconsumed:
-        next = app.config.path_registry.consume(request)
-        if next is None:
-            # we cannot find the next object
-            # this may be cause there was no matching route
-            # or because the model factory returned None
-            return next
-        # we found a non-app instance, return it
-        if not isinstance(next, App):
-            return next
+    while True:
+        consume_more = bool(request.unconsumed)
+        obj = yield app.config.path_registry.resolve(request)
+        # no model was found, either because there was no matching
+        # route or because the model factory returned None; or we
+        # found a non-app instance, or consumed to the root of an app
+        if not consume_more or not isinstance(obj, App):
+            return
         # we found an app, make it the current app
-        next.parent = app
-        request.app = next
-        app = next
-    # we have an app and we don't have anything to consume,
-    # so consume to root
-    return app.config.path_registry.consume(request)
+        obj.parent = app
+        enter_app(obj)
+        request.app = obj
+        app = obj
 
 
 def resolve_response(obj, request):
@@ -80,18 +109,34 @@ def resolve_response(obj, request):
 
     If no view name exist it raises :exc:`webob.exc.HTTPNotFound`.
 
-    It then uses :meth:`morepath.App.get_view` to resolve the view for
-    the model object and the request by doing dynamic dispatch.
+    It then uses :class:`morepath.view.ViewLookup` to resolve the
+    view for the model object and the request. This does dynamic
+    dispatch as :meth:`morepath.App.get_view` does, but caches the
+    result.
 
     :param obj: model object to get response for.
     :param request: :class:`morepath.Request` instance.
     :return: :class:`morepath.Response` instance
 
+    """
+    return lookup_view(obj, request)(request.app, obj, request)
+
+
+def lookup_view(obj, request):
+    """Look up the view for a model object and request.
+
+    This is the view that :func:`resolve_response` calls.
+
+    :param obj: model object to look up the view for.
+    :param request: :class:`morepath.Request` instance.
+    :return: the view, as returned by
+      :meth:`morepath.view.ViewLookup.view`.
     """
     view_name = request.view_name = get_view_name(request.unconsumed)
     if view_name is None:
         raise HTTPNotFound()
-    return request.app.get_view(obj, request)
+    app = request.app
+    return app.config.view_lookup.view(app, obj, request)
 
 
 def get_view_name(stack):
@@ -111,3 +156,42 @@ def get_view_name(stack):
     else:
         # more than one segments means we have a path that doesn't exist
         return None
+
+
+def timed_publish(request):
+    """Handle request and return response, with timing.
+
+    Like :func:`publish`, but reports the duration of each stage to
+    the timing callbacks of the app that handles the request, also
+    for the stages in mounted apps. The routing is done by
+    :func:`route`, and the view is looked up with :func:`lookup_view`
+    and called as a :class:`morepath.timing.TimedView`. See
+    :mod:`morepath.timing`.
+
+    :param request: :class:`morepath.Request` instance.
+    :return: :class:`morepath.Response` instance.
+    """
+    record = request.app.config.timing_registry.record
+    steps = route(request)
+    obj = None
+    while True:
+        start = timer()
+        try:
+            node, variables = steps.send(obj)
+        except StopIteration:
+            break
+        routed = timer()
+        record(request, 'routing', request.app.__class__.__name__,
+               routed - start)
+        if node.model_factory is None:
+            obj = None
+            continue
+        try:
+            obj = node.create(variables, request)
+        finally:
+            record(request, 'model_factory',
+                   timing.name_of(node.model_factory), timer() - routed)
+    view = lookup_view(obj, request)
+    if isinstance(view, View):
+        view = timing.TimedView(view, request, record)
+    return view(request.app, obj, request)
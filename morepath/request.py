@@ -8,12 +8,21 @@ from webob import BaseRequest, Response as BaseResponse
 from dectate import Sentinel
 
 from .reify import reify
-from .traject import create_path, parse_path
+from .traject import (create_path, parse_path, is_normalized_path,
+                      split_normalized_path)
 from .error import LinkError
 from .authentication import NO_IDENTITY
+from .jsonstream import JsonReader
 
 SAME_APP = Sentinel('SAME_APP')
 
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson')
+"""Content types of newline delimited JSON bodies.
+"""
+
+_END = Sentinel('END')
+_NOT_STREAMED = Sentinel('NOT_STREAMED')
+
 
 class Request(BaseRequest):
     """Request.
@@ -25,13 +34,18 @@ class Request(BaseRequest):
         # parse path, normalizing dots away in
         # in case the client didn't do the normalization
         path_info = self.path_info
-        segments = parse_path(path_info)
-        # optimization: only if the normalized path is different from the
-        # original path do we set it to the webob request, as this is
-        # relatively expensive. Webob updates the environ as well
-        new_path_info = create_path(segments)
-        if new_path_info != path_info:
-            self.path_info = new_path_info
+        # optimization: most paths are already normalized, so we
+        # can split them directly
+        if is_normalized_path(path_info):
+            segments = split_normalized_path(path_info)
+        else:
+            segments = parse_path(path_info)
+            # optimization: only if the normalized path is different from
+            # the original path do we set it to the webob request, as this
+            # is relatively expensive. Webob updates the environ as well
+            new_path_info = create_path(segments)
+            if new_path_info != path_info:
+                self.path_info = new_path_info
         # reverse to get unconsumed
         segments.reverse()
         self.unconsumed = segments
@@ -47,6 +61,7 @@ class Request(BaseRequest):
         """
         self._after = []
         self._link_prefix_cache = {}
+        self._permits_memo = {}
 
     def reset(self):
         """Reset request.
@@ -61,6 +76,7 @@ class Request(BaseRequest):
         self.unconsumed = segments
         self.app = self._root_app
         self._after = []
+        self._permits_memo = {}
 
     @reify
     def body_obj(self):
@@ -70,13 +86,100 @@ class Request(BaseRequest):
         how to transform JSON to a Python object. By default, no
         conversion takes place, and ``body_obj`` is identical to
         the ``json`` attribute.
+
+        For a body that is streamed by :meth:`iter_body_objs` this is
+        the first object only, which is read without reading the rest
+        of the body. This way the ``body_model`` view predicate can
+        dispatch on it. These are newline delimited JSON (NDJSON)
+        bodies, and JSON arrays if the ``stream_arrays`` setting in
+        the ``json`` section is true. Another JSON body is read
+        completely, and can then also be accessed as :attr:`json` or
+        :attr:`body`.
         """
-        if not self.body:
+        content_type = self.content_type
+        if content_type in NDJSON_CONTENT_TYPES:
+            return self._first_body_obj()
+        if content_type != 'application/json':
             return None
-        if self.content_type != 'application/json':
+        if self.app.config.json_registry.stream_arrays:
+            char = self._body_reader.peek()
+            if char == '[':
+                return self._first_body_obj()
+            if not char:
+                self._body_first = _END
+                return None
+            # not an array, so put back what was read to peek, so
+            # that the body can still be read in the usual ways
+            self.body = self._body_reader.read_rest()
+            del self._body_reader
+        if not self.body:
             return None
         return self.app._load_json(self.json, self)
 
+    def iter_body_objs(self):
+        """Iterate over the objects in a JSON array or NDJSON body.
+
+        The body is read incrementally from the input, so memory use
+        is bounded by the size of the largest object rather than that
+        of the whole body. Each object is converted as with
+        :attr:`body_obj`.
+
+        For a newline delimited JSON (NDJSON) body these are the JSON
+        values on each line. A ``application/json`` body must be a JSON
+        array. Other bodies have no objects.
+
+        The body can only be iterated over once, and can't be read in
+        another way afterward. Invalid JSON raises :exc:`ValueError`
+        when the iteration gets to it.
+
+        :return: an iterator of objects.
+        """
+        content_type = self.content_type
+        if content_type in NDJSON_CONTENT_TYPES or (
+                content_type == 'application/json' and
+                self.app.config.json_registry.stream_arrays):
+            body_obj = self.body_obj
+            if self._body_first is _NOT_STREAMED:
+                raise ValueError("Expected a JSON array")
+            if self._body_first is _END:
+                return
+            yield body_obj
+            values = self._body_values
+        elif content_type == 'application/json':
+            values = self._body_reader.array()
+        else:
+            return
+        load_json = self.app._load_json
+        for value in values:
+            yield load_json(value, self)
+
+    @reify
+    def _body_reader(self):
+        """:class:`morepath.jsonstream.JsonReader` for the body.
+        """
+        if self.is_body_seekable:
+            self.body_file_raw.seek(0)
+        return JsonReader(self.body_file)
+
+    @reify
+    def _body_values(self):
+        """Iterator over the JSON values in a streamed body.
+        """
+        if self.content_type in NDJSON_CONTENT_TYPES:
+            return self._body_reader.sequence()
+        return self._body_reader.array()
+
+    # the first value of a streamed body, once read by body_obj
+    _body_first = _NOT_STREAMED
+
+    def _first_body_obj(self):
+        """Read the first value of a streamed body, as an object.
+        """
+        self._body_first = next(self._body_values, _END)
+        if self._body_first is _END:
+            return None
+        return self.app._load_json(self._body_first, self)
+
     @reify
     def identity(self):
         """Self-proclaimed identity of the user.
@@ -94,7 +197,7 @@ class Request(BaseRequest):
         result = self.app._identify(self)
         if result is None or result is NO_IDENTITY:
             return NO_IDENTITY
-        if not self.app._verify_identity(result):
+        if not self.app.config.identity_cache.verify(self.app, result):
             return NO_IDENTITY
         return result
 
@@ -150,6 +253,33 @@ class Request(BaseRequest):
         self.app = old_app
         return result
 
+    def permits(self, obj, permission, app=SAME_APP):
+        """Check whether the identity has a permission for an object.
+
+        This uses the permission rules registered with
+        :meth:`morepath.App.permission_rule` for :attr:`identity`. Use
+        it to check for instance whether to show a link to a view that
+        needs a permission.
+
+        When the ``memoize`` setting in the ``permission`` section is
+        true, the result is remembered for the rest of the request.
+
+        :param obj: the model instance.
+        :param permission: the permission class.
+        :param app: If set, change the application in which to check
+          the permission. By default the permission is checked in the
+          current application.
+        :return: ``True`` if the identity has the permission.
+        """
+        if app is None:
+            raise LinkError("Cannot check permission: app is None")
+
+        if app is SAME_APP:
+            app = self.app
+
+        return app.config.permission_memo.permits(
+            app, self, self.identity, obj, permission)
+
     def link(self, obj, name='', default=None, app=SAME_APP):
         """Create a link (URL) to a view on a model instance.
 
@@ -242,6 +372,12 @@ class Request(BaseRequest):
         if app is SAME_APP:
             app = self.app
 
+        # fast path if the path is registered in the app itself
+        class_path = self._get_class_path(app, model)
+        if class_path is not None:
+            path, mount_info = class_path
+            return path.url(self.link_prefix(), name, variables, mount_info)
+
         info = app._get_deferred_mounted_class_path(model, variables)
 
         if info is None:
@@ -249,6 +385,114 @@ class Request(BaseRequest):
 
         return info.url(self.link_prefix(), name)
 
+    def link_many(self, objs, name='', default=None, app=SAME_APP):
+        """Create links (URLs) to a view on many model instances.
+
+        This gives the same result as calling :meth:`Request.link`
+        for each object, but is faster for long lists of objects. The
+        path registered for a model class and the path to the app
+        are looked up only once per class. Objects for which this is
+        not possible, for instance because their links are deferred
+        to another app, are linked using :meth:`Request.link`.
+
+        :param objs: an iterable of model instances (or ``None``) to
+          link to.
+        :param name: the name of the view to link to. If omitted, the
+          the default view is looked up.
+        :param default: the link returned for ``None``. By default
+          this is ``None``.
+        :param app: If set, change the application to which the
+          links are made. By default the links are made to objects
+          in the current application.
+        :return: a list of links.
+        """
+        if app is None:
+            raise LinkError("Cannot link: app is None")
+
+        if app is SAME_APP:
+            app = self.app
+
+        prefix = self.link_prefix()
+        funcs = {}
+        result = []
+        for obj in objs:
+            if obj is None:
+                result.append(default)
+                continue
+            model = obj.__class__
+            try:
+                get_mounted_path = funcs[model]
+            except KeyError:
+                get_mounted_path = funcs[model] = \
+                    app._get_mounted_path_func(model)
+            if get_mounted_path is None:
+                result.append(self.link(obj, name, default, app))
+            else:
+                result.append(get_mounted_path(obj).url(prefix, name))
+        return result
+
+    def class_link_many(self, model, variables_iter, name='', app=SAME_APP):
+        """Create links (URLs) to a view on a class for many variables.
+
+        This gives the same result as calling
+        :meth:`Request.class_link` for each variables dictionary, but
+        is faster for long lists. The path registered for the model
+        class and the path to the app are looked up only once.
+
+        :param model: the model class to link to.
+        :param variables_iter: an iterable of variables dictionaries,
+          see :meth:`Request.class_link`. ``None`` is treated as an
+          empty dictionary.
+        :param name: the name of the view to link to. If omitted, the
+          the default view is looked up.
+        :param app: If set, change the application to which the
+          links are made. By default the links are made to objects
+          in the current application.
+        :return: a list of links.
+        """
+        if app is None:
+            raise LinkError("Cannot link: app is None")
+
+        if app is SAME_APP:
+            app = self.app
+
+        class_path = self._get_class_path(app, model)
+        if class_path is None:
+            return [self.class_link(model, variables, name, app)
+                    for variables in variables_iter]
+        path, mount_info = class_path
+        url = path.url
+        prefix = self.link_prefix()
+        return [url(prefix, name, {} if variables is None else variables,
+                    mount_info)
+                for variables in variables_iter]
+
+    def _get_class_path(self, app, model):
+        """The path registered for a model class and the path to its app.
+
+        This is what :meth:`Request.class_link` and
+        :meth:`Request.class_link_many` use to create links without
+        going through the ``defer_class_links`` machinery.
+
+        :param app: the app to link in.
+        :param model: the model class to link to.
+        :return: a ``path, mount_info`` tuple with the
+          :class:`morepath.path.Path` registered for ``model`` in
+          ``app`` and a :class:`morepath.path.PathInfo` for the path to
+          ``app``, or ``None`` for the root app. ``None`` if no path is
+          registered for ``model`` in ``app`` itself, or if the path to
+          ``app`` cannot be determined.
+        """
+        path = app.config.path_registry.class_path(model)
+        if path is None:
+            return None
+        if app.parent is None:
+            return path, None
+        mount_info = app._get_mount_info()
+        if mount_info is None:
+            return None
+        return path, mount_info[2]
+
     def resolve_path(self, path, app=SAME_APP):
         """Resolve a path to a model instance.
 
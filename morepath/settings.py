@@ -35,3 +35,18 @@ class SettingSection(object):
     """A setting section that contains setting.
     """
     pass
+
+
+def get_setting(setting_registry, section_name, setting_name, default=None):
+    """Get a setting, or a default if it was not configured.
+
+    Used by Morepath itself to look up its optional settings.
+
+    :param setting_registry: a :class:`SettingRegistry` instance.
+    :param section_name: name of the section.
+    :param setting_name: name of the setting in the section.
+    :param default: value to return if the setting does not exist.
+    :return: the setting value.
+    """
+    section = getattr(setting_registry, section_name, None)
+    return getattr(section, setting_name, default)
@@ -1,6 +1,14 @@
+import sys
+
 import pytest
 
 
+collect_ignore = []
+if sys.version_info < (3, 5):
+    # async def is a syntax error
+    collect_ignore.append('test_asgi.py')
+
+
 @pytest.fixture
 def mockserver(monkeypatch):
     """Make the server in wsgiref receive Ctrl-C as soon as it starts serving.
@@ -0,0 +1,11 @@
+import morepath
+from .model import Model
+
+
+class App(morepath.App):
+    pass
+
+
+@App.path(model=Model, path='{id}')
+def get_model(id):
+    return Model(id)
@@ -0,0 +1,2 @@
+def helper():
+    return "helper"
@@ -0,0 +1,3 @@
+class Model(object):
+    def __init__(self, id):
+        self.id = id
@@ -0,0 +1,7 @@
+from ..app import App
+from ..model import Model
+
+
+@App.view(model=Model, name='extra')
+def extra(self, request):
+    return "Extra: %s" % self.id
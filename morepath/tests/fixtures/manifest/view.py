@@ -0,0 +1,7 @@
+from .app import App
+from .model import Model
+
+
+@App.view(model=Model)
+def default(self, request):
+    return "Model: %s" % self.id
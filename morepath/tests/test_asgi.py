@@ -0,0 +1,730 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import morepath
+import pytest
+from reg import KeyIndex
+from webob.exc import HTTPForbidden
+from morepath.asgi import async_tween_factory, environ_from_scope, read_body
+from morepath.authentication import NoIdentity
+from morepath.tween import TweenHooks
+
+
+def call(app, method='GET', path='/', query_string=b'', body=b'',
+         headers=()):
+    """Call the ASGI application of app in a new event loop.
+
+    :return: ``(status, headers, body, messages)``.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(
+            request(app, method, path, query_string, body, headers))
+    finally:
+        loop.close()
+
+
+async def request(app, method='GET', path='/', query_string=b'', body=b'',
+                  headers=()):
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query_string,
+        'headers': list(headers) or [(b'host', b'localhost')],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 12345),
+    }
+    received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    messages = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        messages.append(message)
+
+    await app.asgi(scope, receive, send)
+    start = messages[0]
+    assert start['type'] == 'http.response.start'
+    assert messages[-1] == {'type': 'http.response.body', 'body': b''}
+    body = b''.join(m['body'] for m in messages[1:])
+    return start['status'], dict(start['headers']), body, messages
+
+
+class Model(object):
+    def __init__(self, id):
+        self.id = id
+
+
+def test_sync_view():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    @App.json(model=Model, name='json')
+    def json(self, request):
+        return {'id': self.id, 'link': request.link(self)}
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert status == 200
+    assert body == b'Model: 1'
+    assert headers[b'content-type'] == b'text/plain; charset=UTF-8'
+
+    status, headers, body, messages = call(App(), path='/models/1/json')
+    assert body == b'{"id": "1", "link": "http://localhost/models/1"}'
+
+
+def test_async_model_factory_and_view():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    async def get_model(id):
+        await asyncio.sleep(0)
+        return Model(id)
+
+    @App.view(model=Model)
+    async def default(self, request):
+        await asyncio.sleep(0)
+        return "Model: %s" % self.id
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert status == 200
+    assert body == b'Model: 1'
+
+
+def test_async_model_factory_returns_none():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    async def get_model(id):
+        return None
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert status == 404
+
+
+def test_sync_functions_run_in_executor():
+    threads = []
+
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        threads.append(threading.current_thread())
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        threads.append(threading.current_thread())
+        return "Model: %s" % self.id
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert body == b'Model: 1'
+    assert len(threads) == 2
+    assert threading.current_thread() not in threads
+
+
+def test_async_views_run_in_loop():
+    threads = []
+
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    async def get_model(id):
+        threads.append(threading.current_thread())
+        return Model(id)
+
+    @App.view(model=Model)
+    async def default(self, request):
+        threads.append(threading.current_thread())
+        return "Model: %s" % self.id
+
+    call(App(), path='/models/1')
+    assert threads == [threading.current_thread()] * 2
+
+
+def test_concurrent_slow_views():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    async def default(self, request):
+        await asyncio.sleep(0.2)
+        return "Model: %s" % self.id
+
+    app = App()
+
+    async def main():
+        return await asyncio.gather(*[
+            request(app, path='/models/%s' % i) for i in range(200)])
+
+    loop = asyncio.new_event_loop()
+    try:
+        start = time.time()
+        results = loop.run_until_complete(main())
+        duration = time.time() - start
+    finally:
+        loop.close()
+    assert [body for status, headers, body, messages in results] == [
+        ('Model: %s' % i).encode('ascii') for i in range(200)]
+    # sequentially this would take 40 seconds
+    assert duration < 10
+
+
+def test_not_found():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    assert call(App(), path='/foo')[0] == 404
+    assert call(App(), path='/models/1/foo')[0] == 404
+    assert call(App(), path='/models/1/foo/bar')[0] == 404
+    assert call(App(), path='/models/1', method='POST')[0] == 405
+
+
+def test_permission():
+    class App(morepath.App):
+        pass
+
+    class Permission(object):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.permission_rule(model=Model, permission=Permission,
+                         identity=NoIdentity)
+    def get_permission(identity, model, permission):
+        return model.id == 'public'
+
+    @App.view(model=Model, permission=Permission)
+    async def default(self, request):
+        return "Model: %s" % self.id
+
+    @App.view(model=Model, name='internal', internal=True)
+    async def internal(self, request):
+        return "Internal"
+
+    assert call(App(), path='/models/public')[0] == 200
+    assert call(App(), path='/models/secret')[0] == 403
+    assert call(App(), path='/models/public/internal')[0] == 404
+
+
+def test_permission_and_render_run_in_executor():
+    threads = []
+
+    class App(morepath.App):
+        pass
+
+    class Permission(object):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.permission_rule(model=Model, permission=Permission,
+                         identity=NoIdentity)
+    def get_permission(identity, model, permission):
+        threads.append(threading.current_thread())
+        return True
+
+    def render(content, request):
+        threads.append(threading.current_thread())
+        return morepath.Response(content)
+
+    @App.view(model=Model, permission=Permission, render=render)
+    async def default(self, request):
+        return "Model: %s" % self.id
+
+    @App.view(model=Model, name='sync', permission=Permission,
+              render=render)
+    def sync(self, request):
+        return "Sync: %s" % self.id
+
+    assert call(App(), path='/models/1')[2] == b'Model: 1'
+    assert call(App(), path='/models/1/sync')[2] == b'Sync: 1'
+    assert len(threads) == 4
+    assert threading.current_thread() not in threads
+
+
+def test_exception_view():
+    class App(morepath.App):
+        pass
+
+    class Error(Exception):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    async def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    async def default(self, request):
+        raise Error()
+
+    @App.view(model=Model, name='unhandled')
+    async def unhandled(self, request):
+        raise ValueError()
+
+    @App.view(model=Error)
+    async def error(self, request):
+        return "Error view"
+
+    @App.view(model=HTTPForbidden)
+    def forbidden(self, request):
+        return "Forbidden view"
+
+    @App.view(model=Model, name='forbidden')
+    def raise_forbidden(self, request):
+        raise HTTPForbidden()
+
+    assert call(App(), path='/models/1')[2] == b'Error view'
+    assert call(App(), path='/models/1/forbidden')[2] == b'Forbidden view'
+    with pytest.raises(ValueError):
+        call(App(), path='/models/1/unhandled')
+
+
+def test_after():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    async def default(self, request):
+        @request.after
+        def set_header(response):
+            response.headers['X-After'] = 'yes'
+        return "Model: %s" % self.id
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert headers[b'x-after'] == b'yes'
+
+
+def test_tweens():
+    threads = []
+
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    @App.tween_factory()
+    def sync_tween_factory(app, handler):
+        def sync_tween(request):
+            threads.append(threading.current_thread())
+            response = handler(request)
+            response.headers['X-Sync'] = 'yes'
+            return response
+        return sync_tween
+
+    @App.tween_factory(over=sync_tween_factory)
+    @async_tween_factory
+    def make_async_tween(app, handler):
+        async def async_tween(request):
+            threads.append(threading.current_thread())
+            response = await handler(request)
+            response.headers['X-Async'] = response.headers.get('X-Sync', 'no')
+            return response
+        return async_tween
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert body == b'Model: 1'
+    assert headers[b'x-sync'] == b'yes'
+    assert headers[b'x-async'] == b'yes'
+    assert threads[0] == threading.current_thread()
+    assert threads[1] != threading.current_thread()
+
+
+def test_sync_tween_concurrent_requests():
+    threads = set()
+
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        threads.add(threading.current_thread())
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        time.sleep(0.01)
+        return "Model: %s" % self.id
+
+    @App.tween_factory()
+    def outer_tween_factory(app, handler):
+        def outer_tween(request):
+            threads.add(threading.current_thread())
+            return handler(request)
+        return outer_tween
+
+    @App.tween_factory(under=outer_tween_factory)
+    def inner_tween_factory(app, handler):
+        def inner_tween(request):
+            threads.add(threading.current_thread())
+            return handler(request)
+        return inner_tween
+
+    app = App()
+
+    async def main():
+        # more requests than the executor has threads
+        return await asyncio.wait_for(asyncio.gather(*[
+            request(app, path='/models/%s' % i) for i in range(20)]), 10)
+
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(2)
+    loop.set_default_executor(executor)
+    try:
+        results = loop.run_until_complete(main())
+    finally:
+        loop.close()
+        executor.shutdown(wait=False)
+    assert [body for status, headers, body, messages in results] == [
+        ('Model: %s' % i).encode('ascii') for i in range(20)]
+    assert len(threads) <= 2
+
+
+def test_tween_factories_called_once():
+    calls = []
+
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    @App.tween_factory()
+    def sync_tween_factory(app, handler):
+        calls.append('sync')
+        return handler
+
+    @App.tween_factory(over=sync_tween_factory)
+    @async_tween_factory
+    def make_async_tween(app, handler):
+        calls.append('async')
+        return handler
+
+    @App.tween_factory(over=make_async_tween)
+    def hooks_tween_factory(app, handler):
+        calls.append('hooks')
+
+        def after(request, response):
+            response.headers['X-Hooks'] = threading.current_thread().name
+            return response
+        return TweenHooks(after=after)
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert body == b'Model: 1'
+    assert sorted(calls) == ['async', 'hooks', 'sync']
+    assert headers[b'x-hooks'] == threading.current_thread().name.encode()
+
+
+def test_poisoned_host_header():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    status, headers, body, messages = call(
+        App(), path='/models/1', headers=[(b'host', b'example.com:80')])
+    assert status == 200
+    status, headers, body, messages = call(
+        App(), path='/models/1', headers=[(b'host', b'foo@example.com')])
+    assert status == 400
+
+
+def test_mount():
+    class App(morepath.App):
+        pass
+
+    class Sub(morepath.App):
+        def __init__(self, id):
+            self.id = id
+
+    @App.mount(app=Sub, path='sub/{id}')
+    async def mount_sub(id):
+        return Sub(id)
+
+    @Sub.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @Sub.view(model=Model)
+    async def default(self, request):
+        return request.link(self)
+
+    @Sub.view(model=Sub)
+    def sub_default(self, request):
+        return "Sub %s" % self.id
+
+    # like with WSGI there is no model at the root of the mounted app
+    status, headers, body, messages = call(App(), path='/sub/foo/models/1')
+    assert body == b'http://localhost/sub/foo/models/1'
+    status, headers, body, messages = call(App(), path='/sub/foo')
+    assert status == 404
+
+
+def test_request_details():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id, page=0):
+        model = Model(id)
+        model.page = page
+        return model
+
+    @App.json(model=Model, request_method='POST')
+    async def post(self, request):
+        return {'page': self.page, 'body': request.json,
+                'header': request.headers['X-Foo']}
+
+    status, headers, body, messages = call(
+        App(), method='POST', path='/models/1', query_string=b'page=3',
+        body=b'{"a": 1}',
+        headers=[(b'content-type', b'application/json'),
+                 (b'x-foo', b'bar')])
+    assert status == 200
+    assert body == b'{"page": 3, "body": {"a": 1}, "header": "bar"}'
+
+
+def test_head():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model, request_method='HEAD')
+    def head(self, request):
+        return "Model: %s" % self.id
+
+    status, headers, body, messages = call(
+        App(), method='HEAD', path='/models/1')
+    assert status == 200
+    assert headers[b'content-length'] == b'8'
+    assert body == b''
+
+
+def test_streaming_response():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        def chunks():
+            yield b'a'
+            yield b'b'
+        return morepath.Response(app_iter=chunks())
+
+    status, headers, body, messages = call(App(), path='/models/1')
+    assert body == b'ab'
+    assert [m['body'] for m in messages[1:]] == [b'a', b'b', b'']
+
+
+def test_custom_predicate():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.predicate(morepath.App.get_view, name='id', default='',
+                   index=KeyIndex, after=morepath.request_method_predicate)
+    def id_predicate(self, obj, request):
+        return obj.id
+
+    @App.view(model=Model, id='a')
+    async def a(self, request):
+        return "A"
+
+    @App.view(model=Model, id='b')
+    def b(self, request):
+        return "B"
+
+    assert call(App(), path='/models/a')[2] == b'A'
+    assert call(App(), path='/models/b')[2] == b'B'
+    assert call(App(), path='/models/c')[0] == 404
+
+
+def test_custom_predicate_uses_app():
+    class App(morepath.App):
+        pass
+
+    @App.setting(section='model', name='special')
+    def get_special():
+        return 'a'
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.predicate(morepath.App.get_view, name='special', default=False,
+                   index=KeyIndex, after=morepath.request_method_predicate)
+    def special_predicate(self, obj, request):
+        return obj.id == self.settings.model.special
+
+    @App.view(model=Model, special=True)
+    def special(self, request):
+        return "special"
+
+    @App.view(model=Model, special=False)
+    def default(self, request):
+        return "default"
+
+    assert call(App(), path='/models/a')[2] == b'special'
+    assert call(App(), path='/models/b')[2] == b'default'
+
+
+def test_lifespan():
+    class App(morepath.App):
+        pass
+
+    app = App()
+    received = [{'type': 'lifespan.startup'},
+                {'type': 'lifespan.shutdown'}]
+    messages = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        messages.append(message)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(app.asgi({'type': 'lifespan'}, receive, send))
+    finally:
+        loop.close()
+    assert messages == [{'type': 'lifespan.startup.complete'},
+                        {'type': 'lifespan.shutdown.complete'}]
+    assert App.is_committed()
+
+
+def test_unsupported_scope():
+    class App(morepath.App):
+        pass
+
+    async def receive():
+        pass
+
+    async def send(message):
+        pass
+
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(ValueError):
+            loop.run_until_complete(
+                App().asgi({'type': 'websocket'}, receive, send))
+    finally:
+        loop.close()
+
+
+def test_environ_from_scope():
+    environ = environ_from_scope({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/root/caf\xe9',
+        'root_path': '/root',
+        'query_string': b'a=1',
+        'headers': [(b'content-type', b'text/plain'),
+                    (b'accept', b'text/html'),
+                    (b'accept', b'text/plain')],
+    }, b'body')
+    assert environ['SCRIPT_NAME'] == '/root'
+    assert environ['PATH_INFO'] == '/caf\xc3\xa9'
+    assert environ['QUERY_STRING'] == 'a=1'
+    assert environ['SERVER_NAME'] == 'localhost'
+    assert environ['SERVER_PORT'] == '80'
+    assert environ['SERVER_PROTOCOL'] == 'HTTP/1.1'
+    assert environ['CONTENT_TYPE'] == 'text/plain'
+    assert environ['HTTP_ACCEPT'] == 'text/html,text/plain'
+    assert environ['CONTENT_LENGTH'] == '4'
+    assert environ['wsgi.input'].read() == b'body'
+    assert 'REMOTE_ADDR' not in environ
+
+
+def test_environ_from_scope_content_length_header():
+    environ = environ_from_scope({
+        'type': 'http',
+        'method': 'POST',
+        'path': '/',
+        'headers': [(b'content-length', b'4')],
+    }, b'body')
+    assert environ['CONTENT_LENGTH'] == '4'
+
+
+def test_read_body():
+    received = [{'type': 'http.request', 'body': b'a', 'more_body': True},
+                {'type': 'http.request', 'body': b'b', 'more_body': True},
+                {'type': 'http.disconnect'}]
+
+    async def receive():
+        return received.pop(0)
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(read_body(receive)) == b'ab'
+    finally:
+        loop.close()
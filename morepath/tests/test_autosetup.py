@@ -1,7 +1,11 @@
 from collections import namedtuple
+import json
+from morepath import autosetup
 from morepath.autosetup import (
     caller_module, caller_package, autoscan,
-    morepath_packages, import_package)
+    morepath_packages, import_package, morepath_distributions,
+    metadata_distributions, pkg_resources_distributions, dependents,
+    read_metadata)
 from base.m import App
 import morepath
 import pytest
@@ -63,3 +67,147 @@ def test_autoscan(monkeypatch):
     assert 'base.m' in sys.modules
     assert 'entrypoint.app' in sys.modules
     assert 'under_score.m' in sys.modules
+
+
+def test_autoscan_report(monkeypatch):
+    import sys
+
+    monkeypatch.delitem(sys.modules, 'entrypoint.app', raising=False)
+
+    report = autoscan()
+
+    names = [name for name, duration in report]
+    assert names == [module_name for project_name, module_name, modules
+                     in morepath_distributions()]
+    assert 'entrypoint' in names
+    assert all(duration >= 0 for name, duration in report)
+    assert 'entrypoint.app' in sys.modules
+
+
+def test_autoscan_declared(monkeypatch):
+    import sys
+
+    for k in 'base.m', 'entrypoint', 'entrypoint.app':
+        monkeypatch.delitem(sys.modules, k, raising=False)
+
+    report = autoscan(declared=True)
+
+    assert 'entrypoint' in [name for name, duration in report]
+    # only the declared module is imported
+    assert 'entrypoint' in sys.modules
+    assert 'entrypoint.app' not in sys.modules
+    # packages without entry points are scanned
+    assert 'base.m' in sys.modules
+
+
+def test_metadata_distributions():
+    found = metadata_distributions('morepath')
+    # the order of the distributions can differ
+    assert sorted(found) == sorted(pkg_resources_distributions('morepath'))
+    assert ('entry-point', 'entrypoint', ['entrypoint']) in found
+    assert ('under-score', 'under_score', []) in found
+    # sub only depends on Morepath through base
+    assert ('sub', 'sub', []) in found
+    names = [project_name for project_name, module_name, modules in found]
+    assert 'no-mp' not in names
+    assert 'no-mp-sub' not in names
+
+
+def test_morepath_distributions_cache(tmpdir, monkeypatch):
+    cache = str(tmpdir.join('autoscan.json'))
+    found = morepath_distributions(cache)
+    assert found == morepath_distributions()
+    with open(cache) as f:
+        assert json.load(f)['key'] == autosetup.path_key()
+
+    def find_distributions():
+        return [('cached', 'cached', [])]
+
+    monkeypatch.setattr(autosetup, 'find_distributions', find_distributions)
+    # the cache is used
+    assert morepath_distributions(cache) == found
+
+    # the cache is outdated when sys.path changes
+    monkeypatch.setattr(autosetup, 'path_key', lambda: [['other', 1.0]])
+    assert morepath_distributions(cache) == [('cached', 'cached', [])]
+    assert morepath_distributions(cache) == [('cached', 'cached', [])]
+
+
+def test_morepath_distributions_broken_cache(tmpdir):
+    cache = tmpdir.join('autoscan.json')
+    cache.write('broken')
+    assert morepath_distributions(str(cache)) == morepath_distributions()
+
+
+def test_dependents():
+    requires = {
+        'a': {'b', 'x'},
+        'b': {'a', 'c'},
+        'x': {'y'},
+        'y': {'x', 'target'},
+        'target': set(),
+        'other': {'c'},
+    }
+    assert dependents(requires, 'target') == {'a', 'b', 'x', 'y'}
+    assert dependents(requires, 'c') == {'a', 'b', 'other'}
+    assert dependents(requires, 'unknown') == set()
+
+
+class FakeDistribution(object):
+    def __init__(self, **files):
+        self.files = files
+
+    def read_text(self, filename):
+        return self.files.get(filename.replace('-', '_').replace('.', '_'))
+
+
+def test_read_metadata():
+    dist = FakeDistribution(METADATA="""\
+Metadata-Version: 2.1
+Name: some_project
+Requires-Dist: morepath (>=0.16)
+Requires-Dist: reg>=0.10; python_version >= "3"
+Requires-Dist: pytest; extra == "test"
+Requires-Dist: futures; python_version < "3"
+Requires-Dist: webob; invalid marker
+
+Name: not a header
+Requires-Dist: not a header
+""")
+    assert read_metadata(dist) == (
+        'some_project', ['morepath', 'reg', 'webob'])
+
+
+def test_read_metadata_egg_info():
+    dist = FakeDistribution(PKG_INFO="""\
+Metadata-Version: 1.0
+Name: some-project
+""", requires_txt="""\
+morepath>=0.16
+
+[:python_version >= "3"]
+reg
+
+[:python_version < "3"]
+futures
+
+[test]
+pytest
+
+[test:python_version >= "3"]
+webtest
+""")
+    assert read_metadata(dist) == ('some-project', ['morepath', 'reg'])
+
+
+def test_read_metadata_missing():
+    assert read_metadata(FakeDistribution()) == (None, [])
+
+
+def test_autoscan_manifest(tmpdir):
+    filename = str(tmpdir.join('manifest.json'))
+    autoscan(manifest=filename)
+    with open(filename) as f:
+        data = json.load(f)
+    assert data['base']['modules'] == ['base.m']
+    assert data['entrypoint']['modules'] == ['entrypoint.app']
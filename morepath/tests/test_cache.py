@@ -0,0 +1,113 @@
+import sys
+import threading
+
+from morepath.cache import LRUCache, MappingStore
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+    assert cache.misses == 2
+
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    assert cache.hits == 1
+
+    # 'b' is now the least recently used entry
+    cache.put('c', 3)
+    assert len(cache) == 2
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+
+def test_lru_cache_put_existing():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('a', 3)
+    cache.put('c', 4)
+    assert cache.get('a') == 3
+    assert 'b' not in cache
+
+
+def test_lru_cache_put_discarded_concurrently():
+    cache = LRUCache(2)
+
+    def move_to_end(key):
+        # another thread discards the entry before it is moved
+        cache.delete(key)
+        raise KeyError(key)
+
+    cache._move_to_end = move_to_end
+    cache.put('a', 1)
+    assert 'a' not in cache
+    assert cache.get('a') is None
+
+
+def test_lru_cache_threads():
+    cache = LRUCache(10)
+    errors = []
+
+    def use():
+        try:
+            for i in range(10000):
+                key = i % 20
+                if cache.get(key) is None:
+                    cache.put(key, i)
+                if i % 100 == 0:
+                    cache.clear()
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=use) for i in range(4)]
+    # switch threads as often as possible
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(cache) <= 10
+
+
+def test_lru_cache_clear():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('b')
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.hits == 0
+    assert cache.misses == 0
+
+
+def test_lru_cache_delete():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.delete('a')
+    cache.delete('b')
+    assert 'a' not in cache
+
+
+def test_mapping_store():
+    mapping = {}
+    store = MappingStore(mapping, 2)
+    assert store.get('a') is None
+    assert store.get('a', 'default') == 'default'
+    store.put('a', 1)
+    store.put('b', 2)
+    store.put('a', 3)
+    assert mapping == {'a': 3, 'b': 2}
+    store.put('c', 4)
+    assert len(store) == 2
+    assert store.get('c') == 4
+    store.delete('c')
+    store.delete('d')
+    assert 'c' not in mapping
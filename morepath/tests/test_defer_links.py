@@ -973,3 +973,36 @@ def test_defer_links_and_defer_links_conflict():
 
     with pytest.raises(ConflictError):
         Root.commit()
+
+
+def test_link_many_deferred():
+    class root(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        pass
+
+    @root.path(path='')
+    class Model(object):
+        pass
+
+    @root.json(model=Model)
+    def root_model_default(self, request):
+        return request.link_many([SubModel(), Model()])
+
+    @sub.path(path='')
+    class SubModel(object):
+        pass
+
+    @root.mount(app=sub, path='sub')
+    def mount_sub():
+        return sub()
+
+    @root.defer_links(model=SubModel)
+    def defer_links_sub_model(app, obj):
+        return app.child(sub())
+
+    c = Client(root())
+
+    response = c.get('/')
+    assert response.json == ['http://localhost/sub', 'http://localhost/']
@@ -0,0 +1,197 @@
+import gc
+import weakref
+
+import pytest
+import reg
+from reg import RegistrationError
+
+from morepath.introspect import (arginfo, register, same_signature,
+                                 _code_arguments)
+
+
+def test_arginfo_function():
+    def foo(a, b=1, *args, **kw):
+        pass
+
+    info = arginfo(foo)
+    assert info.args == ['a', 'b']
+    assert info.varargs == 'args'
+    assert info.keywords == 'kw'
+    assert info.defaults == (1,)
+
+
+def test_arginfo_closures_share_code():
+    def make(default):
+        def foo(a, b=default):
+            pass
+        return foo
+
+    first = make(1)
+    second = make(2)
+    assert arginfo(first).defaults == (1,)
+    assert first.__code__ in _code_arguments
+    assert arginfo(second).defaults == (2,)
+    assert arginfo(second).args == ['a', 'b']
+
+
+def test_arginfo_method():
+    class Foo(object):
+        def method(self, a):
+            pass
+
+    assert arginfo(Foo().method).args == ['a']
+    assert arginfo(Foo.method).args == ['self', 'a']
+
+
+def test_arginfo_class():
+    class Foo(object):
+        def __init__(self, a, b=2):
+            pass
+
+    class Bar(object):
+        pass
+
+    assert arginfo(Foo).args == ['a', 'b']
+    assert arginfo(Foo).defaults == (2,)
+    assert arginfo(Bar).args == []
+
+
+def test_arginfo_callable_instance():
+    class Foo(object):
+        def __call__(self, a):
+            pass
+
+    assert arginfo(Foo()).args == ['a']
+
+
+def test_arginfo_not_callable():
+    assert arginfo(object()) is None
+
+
+def test_arginfo_builtin():
+    assert arginfo(dict.get) == reg.arginfo(dict.get)
+
+
+def test_arginfo_weak():
+    namespace = {}
+    exec('def foo(a):\n    pass\n', namespace)
+    code = weakref.ref(namespace['foo'].__code__)
+    assert arginfo(namespace['foo']).args == ['a']
+    assert code() in _code_arguments
+    del namespace
+    gc.collect()
+    assert code() is None
+
+
+def test_register():
+    @reg.dispatch('obj')
+    def target(obj):
+        return 'fallback'
+
+    class Foo(object):
+        pass
+
+    register(target, lambda obj: 'foo', obj=Foo)
+    assert target(Foo()) == 'foo'
+    assert target(object()) == 'fallback'
+
+
+def test_register_wrong_signature():
+    @reg.dispatch('obj')
+    def target(obj):
+        pass
+
+    with pytest.raises(RegistrationError):
+        register(target, lambda obj, extra: None, obj=object)
+
+
+def test_register_not_callable():
+    @reg.dispatch('obj')
+    def target(obj):
+        pass
+
+    with pytest.raises(RegistrationError):
+        register(target, object(), obj=object)
+
+
+def test_arginfo_same_as_reg():
+    class Init(object):
+        def __init__(self, a, b=1):
+            pass
+
+    class NoInit(object):
+        pass
+
+    class Call(object):
+        def __call__(self, a, *args, **kw):
+            pass
+
+    def func(a, b=None, *args):
+        pass
+
+    for callable in (Init, NoInit, Call(), Init(1).__init__, func, dict.get):
+        info = reg.arginfo(callable)
+        assert tuple(arginfo(callable)) == (
+            info.args, info.varargs, info[2], info.defaults)
+
+
+def test_register_same_as_reg():
+    # morepath.introspect.register relies on these parts of Reg that
+    # are not in its documented API
+    def make_target():
+        @reg.dispatch('obj', get_key_lookup=reg.DictCachingKeyLookup)
+        def target(obj):
+            return 'fallback'
+        return target
+
+    class Foo(object):
+        pass
+
+    class Bar(Foo):
+        pass
+
+    def foo(obj):
+        return 'foo'
+
+    with_reg = make_target()
+    with_register = make_target()
+    with_reg.register(foo, obj=Foo)
+    register(with_register, foo, obj=Foo)
+    registry = with_register.register.__self__.registry
+    assert isinstance(registry, reg.PredicateRegistry)
+    for target in (with_reg, with_register):
+        assert target(Bar()) == 'foo'
+        assert target(object()) == 'fallback'
+        assert target.component_by_keys(obj=Foo) is foo
+
+    # the registry is replaced when predicates are added
+    with_register.add_predicates([reg.match_key('name', lambda obj: 'a')])
+    assert with_register.register.__self__.registry is not registry
+    register(with_register, foo, obj=Foo, name='a')
+    assert with_register(Bar()) == 'foo'
+
+
+def test_same_signature_as_reg():
+    def one(a):
+        pass
+
+    def two(a, b):
+        pass
+
+    def varargs(a, *args):
+        pass
+
+    def keywords(a, **kw):
+        pass
+
+    funcs = (one, two, varargs, keywords)
+    for target in funcs:
+        dispatch = reg.dispatch()(target)
+        for func in funcs:
+            try:
+                dispatch.register(func)
+            except RegistrationError:
+                expected = False
+            else:
+                expected = True
+            assert same_signature(arginfo(target), arginfo(func)) == expected
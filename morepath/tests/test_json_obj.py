@@ -1,4 +1,10 @@
+import json
+from io import BytesIO
+
 import morepath
+import pytest
+from morepath.jsonstream import CHUNK_SIZE
+from webob import BaseRequest
 from webtest import TestApp as Client
 
 
@@ -218,3 +224,380 @@ def test_json_obj_load_no_json_post():
 
     response = c.post('/', {'x': 'foo'})
     assert response.json == 'done'
+
+
+def test_json_stream():
+    class app(morepath.App):
+        pass
+
+    class Item(object):
+        def __init__(self, x):
+            self.x = x
+
+    class Root(object):
+        pass
+
+    @app.path(path='/', model=Root)
+    def get_root():
+        return Root()
+
+    @app.json(model=Root, stream=True)
+    def default(self, request):
+        for i in range(3):
+            yield Item(i)
+
+    @app.json(model=Root, name='empty', stream=True)
+    def empty(self, request):
+        return []
+
+    @app.dump_json(model=Item)
+    def dump_item_json(self, request):
+        return {'x': self.x}
+
+    c = Client(app())
+
+    response = c.get('/')
+    assert response.content_type == 'application/json'
+    assert response.json == [{'x': 0}, {'x': 1}, {'x': 2}]
+
+    response = c.get('/empty')
+    assert response.body == b'[]'
+
+
+def test_json_stream_chunks():
+    from morepath.view import iter_json_array
+
+    class app(morepath.App):
+        pass
+
+    request = app().request(BaseRequest.blank('/').environ)
+    for amount in range(7):
+        items = [{'x': i, 'y': u'\xe9'} for i in range(amount)]
+        chunks = list(iter_json_array(items, request, chunk_size=3))
+        assert len(chunks) == amount // 3 + 1
+        assert all(isinstance(chunk, bytes) for chunk in chunks)
+        assert b''.join(chunks) == json.dumps(items).encode('ascii')
+
+
+def test_json_stream_chunks_encoder():
+    from morepath.view import iter_json_array
+
+    def compact(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+    def indent(obj):
+        return json.dumps(obj, indent=2) + '\n'
+
+    def not_array(obj):
+        return '{}'
+
+    def make_request(encoder):
+        class app(morepath.App):
+            pass
+
+        @app.setting_section(section='json')
+        def get_json_settings():
+            return {'encoder': encoder}
+
+        app.commit()
+        return app().request(BaseRequest.blank('/').environ)
+
+    compact_request = make_request(compact)
+    indent_request = make_request(indent)
+    for amount in range(7):
+        items = [{'x': i} for i in range(amount)]
+        body = b''.join(
+            iter_json_array(items, compact_request, chunk_size=3))
+        assert body == compact(items).encode('ascii')
+        body = b''.join(
+            iter_json_array(items, indent_request, chunk_size=3))
+        assert json.loads(body.decode('ascii')) == items
+
+    with pytest.raises(ValueError):
+        list(iter_json_array([1], make_request(not_array)))
+
+
+def test_json_stream_render():
+    class app(morepath.App):
+        pass
+
+    class Root(object):
+        pass
+
+    @app.path(path='/', model=Root)
+    def get_root():
+        return Root()
+
+    def render(content, request):
+        return morepath.Response(u'custom')
+
+    @app.json(model=Root, render=render, stream=True)
+    def default(self, request):
+        return 'x'
+
+    c = Client(app())
+
+    response = c.get('/')
+    assert response.body == b'custom'
+
+
+class Author(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class Book(object):
+    def __init__(self, title, author):
+        self.title = title
+        self.author = author
+
+
+def json_encoder_app(settings):
+    class App(morepath.App):
+        pass
+
+    @App.setting_section(section='json')
+    def get_json_settings():
+        return settings
+
+    @App.path(path='/books/{title}', model=Book)
+    def get_book(title):
+        return Book(title, Author('Ann'))
+
+    @App.json(model=Book)
+    def default(self, request):
+        return self
+
+    @App.json(model=Book, name='list', stream=True)
+    def book_list(self, request):
+        return [self, self]
+
+    @App.dump_json(model=Book)
+    def dump_book(self, request):
+        return {'title': self.title, 'author': self.author}
+
+    @App.dump_json(model=Author)
+    def dump_author(self, request):
+        return {'name': self.name}
+
+    return App
+
+
+def test_json_encoder():
+    encoded = []
+
+    def encoder(obj):
+        encoded.append(obj)
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    class App(json_encoder_app({'encoder': encoder})):
+        pass
+
+    @App.dump_json(model=Book)
+    def dump_book(self, request):
+        return {'title': self.title}
+
+    c = Client(App())
+    response = c.get('/books/foo')
+    assert response.body == b'{"title":"foo"}'
+    assert response.content_type == 'application/json'
+    assert encoded == [{'title': 'foo'}]
+
+    response = c.get('/books/foo/list')
+    assert response.body == b'[{"title":"foo"},{"title":"foo"}]'
+
+
+def test_json_not_recursive():
+    c = Client(json_encoder_app({})())
+    with pytest.raises(TypeError):
+        c.get('/books/foo')
+
+
+def test_json_recursive():
+    c = Client(json_encoder_app({'recursive': True})())
+    expected = {'title': 'foo', 'author': {'name': 'Ann'}}
+    assert c.get('/books/foo').json == expected
+    assert c.get('/books/foo/list').json == [expected, expected]
+
+
+def test_json_recursive_not_serializable():
+    class App(json_encoder_app({'recursive': True})):
+        pass
+
+    @App.dump_json(model=Author)
+    def dump_author(self, request):
+        return self
+
+    c = Client(App())
+    with pytest.raises(TypeError) as e:
+        c.get('/books/foo')
+    assert 'Author' in str(e.value)
+
+
+class Entry(object):
+    def __init__(self, title):
+        self.title = title
+
+
+class NonSeekable(object):
+    """A request body that can only be read once, like a socket."""
+    def __init__(self, data):
+        self._file = BytesIO(data)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+
+def body_objs_app(stream_arrays=False):
+    class App(morepath.App):
+        pass
+
+    class Root(object):
+        pass
+
+    @App.setting(section='json', name='stream_arrays')
+    def get_stream_arrays():
+        return stream_arrays
+
+    @App.path(path='/', model=Root)
+    def get_root():
+        return Root()
+
+    @App.load_json()
+    def load_json(json, request):
+        if isinstance(json, dict) and json.get('@type') == 'Entry':
+            return Entry(json['title'])
+        return json
+
+    def describe(request):
+        return [obj.title if isinstance(obj, Entry) else obj
+                for obj in request.iter_body_objs()]
+
+    @App.json(model=Root, request_method='POST', body_model=Entry)
+    def post_entries(self, request):
+        return {'entries': describe(request)}
+
+    @App.json(model=Root, request_method='POST')
+    def post_other(self, request):
+        return {'other': describe(request)}
+
+    return App
+
+
+def entry(title):
+    return {'@type': 'Entry', 'title': title}
+
+
+def ndjson(values):
+    return ''.join(json.dumps(value) + '\n' for value in values).encode()
+
+
+def test_iter_body_objs_ndjson():
+    c = Client(body_objs_app()())
+    response = c.post('/', ndjson([entry('a'), entry('b'), 3]),
+                      content_type='application/x-ndjson')
+    assert response.json == {'entries': ['a', 'b', 3]}
+
+    response = c.post('/', ndjson([3, entry('b')]),
+                      content_type='application/x-ndjson')
+    assert response.json == {'other': [3, 'b']}
+
+    response = c.post('/', ndjson([None, entry('b')]),
+                      content_type='application/x-ndjson')
+    assert response.json == {'other': [None, 'b']}
+
+    response = c.post('/', b'', content_type='application/x-ndjson')
+    assert response.json == {'other': []}
+
+
+def test_iter_body_objs_json_array():
+    c = Client(body_objs_app()())
+    # the body_obj is the whole list, but the items can still be
+    # iterated over
+    response = c.post_json('/', [entry('a'), entry('b')])
+    assert response.json == {'other': ['a', 'b']}
+
+    with pytest.raises(ValueError):
+        c.post_json('/', entry('a'))
+
+
+def test_iter_body_objs_stream_arrays():
+    c = Client(body_objs_app(stream_arrays=True)())
+    response = c.post_json('/', [entry('a'), entry('b'), 3])
+    assert response.json == {'entries': ['a', 'b', 3]}
+
+    response = c.post_json('/', [3, entry('b')])
+    assert response.json == {'other': [3, 'b']}
+
+    response = c.post_json('/', [])
+    assert response.json == {'other': []}
+
+    response = c.post('/', b'', content_type='application/json')
+    assert response.json == {'other': []}
+
+    # a body that isn't an array is still the body_obj
+    with pytest.raises(ValueError):
+        c.post_json('/', entry('a'))
+
+
+def test_body_obj_stream_arrays_object():
+    App = body_objs_app(stream_arrays=True)
+    App.commit()
+    body = json.dumps(entry('a')).encode()
+    for wsgi_input in [BytesIO(body), NonSeekable(body)]:
+        environ = BaseRequest.blank(
+            '/', method='POST', content_type='application/json').environ
+        environ['wsgi.input'] = wsgi_input
+        environ['CONTENT_LENGTH'] = str(len(body))
+        request = App().request(environ)
+        assert request.body_obj.title == 'a'
+        assert request.json == entry('a')
+        assert request.body == body
+        with pytest.raises(ValueError):
+            list(request.iter_body_objs())
+
+    value = {'x': u'\xe9' * CHUNK_SIZE}
+    body = json.dumps(value, ensure_ascii=False).encode('utf-8')
+    environ = BaseRequest.blank(
+        '/', method='POST', content_type='application/json').environ
+    # a multibyte character is cut off at the end of the first chunk
+    environ['wsgi.input'] = NonSeekable(b' \n' + body)
+    environ['CONTENT_LENGTH'] = str(len(body) + 2)
+    request = App().request(environ)
+    assert request.body_obj == value
+    assert request.json == value
+
+
+def test_iter_body_objs_other_content_type():
+    c = Client(body_objs_app()())
+    response = c.post('/', b'[1, 2]', content_type='text/plain')
+    assert response.json == {'other': []}
+
+
+def test_iter_body_objs_incremental():
+    App = body_objs_app(stream_arrays=True)
+    App.commit()
+    body = json.dumps([entry(str(i)) for i in range(10000)]).encode()
+    environ = BaseRequest.blank(
+        '/', method='POST', body=body,
+        content_type='application/json').environ
+    request = App().request(environ)
+    assert isinstance(request.body_obj, Entry)
+    assert request.body_obj.title == '0'
+    assert environ['wsgi.input'].tell() == CHUNK_SIZE < len(body)
+    objs = request.iter_body_objs()
+    assert next(objs) is request.body_obj
+    assert [obj.title for obj in objs] == [str(i) for i in range(1, 10000)]
+
+
+def test_iter_body_objs_invalid():
+    App = body_objs_app()
+    App.commit()
+    environ = BaseRequest.blank(
+        '/', method='POST', body=b'{"a": 1}\n{"b"\n',
+        content_type='application/x-ndjson').environ
+    request = App().request(environ)
+    objs = request.iter_body_objs()
+    assert next(objs) == {'a': 1}
+    with pytest.raises(ValueError):
+        next(objs)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import pytest
+from morepath.jsonstream import JsonReader
+
+
+def reader(text, chunk_size=3):
+    return JsonReader(io.BytesIO(text.encode('utf-8')), chunk_size)
+
+
+ITEMS = [
+    1234567,
+    -1.5e10,
+    u'caf\xe9 ☃',
+    {'a': [1, 2, {'b': None}], 'c': 'x' * 50},
+    [],
+    {},
+    True,
+    False,
+    None,
+]
+
+
+def test_array():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    for chunk_size in range(1, 20):
+        assert list(reader(text, chunk_size).array()) == ITEMS
+
+
+def test_array_whitespace():
+    text = u' \n[ 1 ,\t2\r\n, "three" ]\n '
+    assert list(reader(text).array()) == [1, 2, 'three']
+
+
+def test_array_empty():
+    assert list(reader(u'[]').array()) == []
+    assert list(reader(u' [ ] ').array()) == []
+    assert list(reader(u'').array()) == []
+    assert list(reader(u'  ').array()) == []
+
+
+def test_array_reads_incrementally():
+    text = json.dumps(list(range(10000)))
+    f = io.BytesIO(text.encode('utf-8'))
+    items = JsonReader(f, 100).array()
+    assert next(items) == 0
+    assert f.tell() == 100
+    assert list(items) == list(range(1, 10000))
+
+
+def test_array_not_array():
+    with pytest.raises(ValueError):
+        list(reader(u'{"a": 1}').array())
+
+
+def test_array_invalid():
+    items = reader(u'[1, 2, foo]').array()
+    assert next(items) == 1
+    assert next(items) == 2
+    with pytest.raises(ValueError):
+        next(items)
+    with pytest.raises(ValueError):
+        list(reader(u'[1 2]').array())
+    with pytest.raises(ValueError):
+        list(reader(u'[1, 2').array())
+    with pytest.raises(ValueError):
+        list(reader(u'[1, 2,').array())
+    with pytest.raises(ValueError):
+        list(reader(u'[1, 2] 3').array())
+
+
+def test_sequence():
+    text = u'\n'.join(json.dumps(item, ensure_ascii=False)
+                      for item in ITEMS) + u'\n'
+    for chunk_size in range(1, 20):
+        assert list(reader(text, chunk_size).sequence()) == ITEMS
+
+
+def test_sequence_empty():
+    assert list(reader(u'').sequence()) == []
+    assert list(reader(u'\n\n').sequence()) == []
+
+
+def test_sequence_invalid():
+    items = reader(u'1\n{"a"\n').sequence()
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+def test_value():
+    assert reader(u' {"a": [1, 2]} ').value() == {'a': [1, 2]}
+    assert reader(u'12345', 2).value() == 12345
+    with pytest.raises(ValueError):
+        reader(u'{"a": 1} 2').value()
+    with pytest.raises(ValueError):
+        reader(u'').value()
+
+
+def test_peek():
+    r = reader(u'   \n  [1]')
+    assert r.peek() == '['
+    assert r.peek() == '['
+    assert reader(u'  ').peek() == ''
+
+
+def test_read_rest():
+    text = u'  {"a": "caf\xe9 \u2603"} '
+    for chunk_size in range(1, 8):
+        r = reader(text, chunk_size)
+        assert r.peek() == '{'
+        assert r.read_rest() == text.lstrip().encode('utf-8')
+        assert r.read_rest() == b''
+        assert r.peek() == ''
+
+
+def test_invalid_utf8():
+    r = JsonReader(io.BytesIO(b'["\xff"]'))
+    with pytest.raises(ValueError):
+        list(r.array())
@@ -1,5 +1,10 @@
+import threading
+import time
+
+import dectate
 import morepath
 from morepath.error import LinkError, ConflictError
+from webob import BaseRequest
 from webtest import TestApp as Client
 import pytest
 
@@ -1185,3 +1190,257 @@ def test_breadthfist_vs_inheritance_on_commit():
 
     response = c.get('/x/y')
     assert response.body == b'ExtendedApp1'
+
+
+def test_mounted_path_cached():
+    calls = []
+
+    class root(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        def __init__(self, name):
+            self.name = name
+
+    @sub.path(path='models/{id}')
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    def get_variables(a):
+        calls.append(a.name)
+        return {'name': a.name}
+
+    @root.mount(app=sub, path='sub/{name}', variables=get_variables)
+    def mount_sub(name):
+        return sub(name=name)
+
+    root.commit()
+
+    app = root().child(sub, name='foo')
+    assert app._get_mounted_path(Model('a')).path == 'sub/foo/models/a'
+    assert app._get_mounted_path(Model('b')).path == 'sub/foo/models/b'
+    assert app._get_mounted_class_path(Model, {'id': 'c'}).path == \
+        'sub/foo/models/c'
+    assert calls == ['foo']
+
+    # the cache is not used when the parent changes
+    app.parent = root()
+    assert app._get_mounted_path(Model('a')).path == 'sub/foo/models/a'
+    assert calls == ['foo', 'foo']
+
+    # explicit invalidation
+    app.name = 'bar'
+    assert app._get_mounted_path(Model('a')).path == 'sub/foo/models/a'
+    app.reset_mounted_path()
+    assert app._get_mounted_path(Model('a')).path == 'sub/bar/models/a'
+    assert calls == ['foo', 'foo', 'bar']
+
+
+def test_reset_mounted_path_children():
+    class root(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        def __init__(self, name):
+            self.name = name
+
+    class subsub(morepath.App):
+        pass
+
+    @subsub.path(path='models/{id}')
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    @root.mount(app=sub, path='sub/{name}',
+                variables=lambda a: {'name': a.name})
+    def mount_sub(name):
+        return sub(name=name)
+
+    @sub.mount(app=subsub, path='subsub')
+    def mount_subsub():
+        return subsub()
+
+    root.commit()
+
+    parent = root().child(sub, name='foo')
+    app = parent.child(subsub)
+    other = parent.child(subsub)
+    assert app._get_mounted_path(Model('a')).path == \
+        'sub/foo/subsub/models/a'
+    assert other._get_mounted_path(Model('a')).path == \
+        'sub/foo/subsub/models/a'
+
+    # resetting the parent also resets the apps mounted in it
+    parent.name = 'bar'
+    parent.reset_mounted_path()
+    assert app._get_mounted_path(Model('a')).path == \
+        'sub/bar/subsub/models/a'
+    assert app._get_mounted_class_path(Model, {'id': 'b'}).path == \
+        'sub/bar/subsub/models/b'
+    request = app.request(BaseRequest.blank('/').environ)
+    assert request.link(Model('c')) == \
+        'http://localhost/sub/bar/subsub/models/c'
+    assert request.class_link(Model, {'id': 'd'}) == \
+        'http://localhost/sub/bar/subsub/models/d'
+
+    # resetting a child also resets its parents
+    parent.name = 'baz'
+    other.reset_mounted_path()
+    assert other._get_mounted_path(Model('a')).path == \
+        'sub/baz/subsub/models/a'
+    assert app._get_mounted_path(Model('a')).path == \
+        'sub/baz/subsub/models/a'
+
+
+def test_mounted_path_parameters_cached():
+    class root(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        def __init__(self, id, page):
+            self.id = id
+            self.page = page
+
+    @sub.path(path='models/{id}')
+    class Model(object):
+        def __init__(self, id, extra=None):
+            self.id = id
+            self.extra = extra
+
+    @root.mount(app=sub, path='sub/{id}')
+    def mount_sub(id, page=0):
+        return sub(id=id, page=page)
+
+    root.commit()
+
+    app = root().child(sub, id='foo', page=1)
+    info = app._get_mounted_path(Model('a', 'x'))
+    assert info.path == 'sub/foo/models/a'
+    assert info.parameters == {'page': ['1'], 'extra': ['x']}
+    info = app._get_mounted_path(Model('b'))
+    assert info.parameters == {'page': ['1']}
+
+
+def test_lazy_commit():
+    class app(morepath.App):
+        pass
+
+    class used(morepath.App):
+        pass
+
+    class unused(morepath.App):
+        pass
+
+    @app.path(path='')
+    class Root(object):
+        pass
+
+    @app.view(model=Root)
+    def root_default(self, request):
+        return "Root"
+
+    @used.path(path='')
+    class UsedRoot(object):
+        pass
+
+    @used.view(model=UsedRoot)
+    def used_default(self, request):
+        return "Used"
+
+    @app.mount(path='used', app=used)
+    def mount_used():
+        return used()
+
+    @app.mount(path='unused', app=unused)
+    def mount_unused():
+        return unused()
+
+    app.lazy_commit()
+    assert app.is_committed()
+    assert not used.is_committed()
+    assert not unused.is_committed()
+
+    c = Client(app())
+    assert c.get('/').body == b'Root'
+    assert not used.is_committed()
+
+    assert c.get('/used').body == b'Used'
+    assert used.is_committed()
+    assert not unused.is_committed()
+
+
+def test_lazy_commit_link():
+    class app(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        pass
+
+    @app.path(path='')
+    class Root(object):
+        pass
+
+    @app.view(model=Root)
+    def root_default(self, request):
+        return request.link(SubRoot(), app=request.app.child(sub))
+
+    @sub.path(path='')
+    class SubRoot(object):
+        pass
+
+    @app.mount(path='sub', app=sub)
+    def mount_sub():
+        return sub()
+
+    app.lazy_commit()
+    c = Client(app())
+    assert c.get('/').body == b'http://localhost/sub'
+    assert sub.is_committed()
+
+
+def test_lazy_commit_threads(monkeypatch):
+    class app(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        pass
+
+    @sub.path(path='')
+    class SubRoot(object):
+        pass
+
+    @sub.view(model=SubRoot)
+    def sub_default(self, request):
+        return "Sub"
+
+    @app.mount(path='sub', app=sub)
+    def mount_sub():
+        return sub()
+
+    app.lazy_commit()
+
+    committed = []
+    commit = dectate.commit
+
+    def counting_commit(*apps):
+        committed.extend(apps)
+        time.sleep(0.01)
+        commit(*apps)
+
+    monkeypatch.setattr(dectate, 'commit', counting_commit)
+
+    application = app()
+    results = []
+
+    def request():
+        results.append(Client(application).get('/sub').body)
+
+    threads = [threading.Thread(target=request) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b'Sub'] * 10
+    assert committed == [sub]
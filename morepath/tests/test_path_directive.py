@@ -2210,3 +2210,328 @@ def test_named_view_on_root():
 
     response = c.get('/')
     assert response.body == b'Default view on root'
+
+
+def test_link_many():
+    class App(morepath.App):
+        pass
+
+    @App.path(path='')
+    class Root(object):
+        pass
+
+    class Model(object):
+        def __init__(self, id, page=0):
+            self.id = id
+            self.page = page
+
+    class SubModel(Model):
+        pass
+
+    class Other(object):
+        def __init__(self, name):
+            self.name = name
+
+    @App.path(model=Model, path='models/{id}',
+              converters={'page': int})
+    def get_model(id, page=0):
+        return Model(id, page)
+
+    @App.path(model=Other, path='others/{name}',
+              variables=lambda obj: {'name': obj.name.upper()})
+    def get_other(name):
+        return Other(name)
+
+    objs = [Model('a'), Model('b c', 2), None, SubModel('d'), Other('e')]
+
+    @App.json(model=Root)
+    def default(self, request):
+        return {
+            'many': request.link_many(objs),
+            'single': [request.link(obj) for obj in objs],
+            'edit': request.link_many(objs, 'edit', default='none'),
+        }
+
+    c = Client(App())
+
+    response = c.get('/')
+    assert response.json['many'] == [
+        'http://localhost/models/a?page=0',
+        'http://localhost/models/b%20c?page=2',
+        None,
+        'http://localhost/models/d?page=0',
+        'http://localhost/others/E',
+    ]
+    assert response.json['many'] == response.json['single']
+    assert response.json['edit'] == [
+        'http://localhost/models/a/edit?page=0',
+        'http://localhost/models/b%20c/edit?page=2',
+        'none',
+        'http://localhost/models/d/edit?page=0',
+        'http://localhost/others/E/edit',
+    ]
+
+
+def test_link_many_mounted():
+    class root(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        def __init__(self, name):
+            self.name = name
+
+    @root.path(path='')
+    class Root(object):
+        pass
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    @sub.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @root.mount(app=sub, path='sub/{mount_name}',
+                variables=lambda a: {'mount_name': a.name})
+    def mount_sub(mount_name):
+        return sub(name=mount_name)
+
+    @root.json(model=Root)
+    def default(self, request):
+        app = request.app.child(sub, mount_name='foo')
+        return request.link_many([Model('a'), Model('b')], app=app)
+
+    c = Client(root())
+
+    assert c.get('/').json == [
+        'http://localhost/sub/foo/models/a',
+        'http://localhost/sub/foo/models/b',
+    ]
+
+
+def test_link_many_not_found():
+    class App(morepath.App):
+        pass
+
+    @App.path(path='')
+    class Root(object):
+        pass
+
+    class Unknown(object):
+        pass
+
+    @App.json(model=Root)
+    def default(self, request):
+        return request.link_many([Unknown()])
+
+    c = Client(App())
+
+    with pytest.raises(LinkError):
+        c.get('/')
+
+
+def test_link_many_no_app():
+    class App(morepath.App):
+        pass
+
+    @App.path(path='')
+    class Root(object):
+        pass
+
+    @App.json(model=Root)
+    def default(self, request):
+        return request.link_many([Root()], app=None)
+
+    c = Client(App())
+
+    with pytest.raises(LinkError):
+        c.get('/')
+
+
+def test_class_link_many():
+    class App(morepath.App):
+        pass
+
+    @App.path(path='')
+    class Root(object):
+        pass
+
+    class Model(object):
+        pass
+
+    @App.path(model=Model, path='/foo/{x}')
+    def get_model(x, page=0):
+        return Model()
+
+    @App.json(model=Root)
+    def default(self, request):
+        return request.class_link_many(
+            Model, [{'x': 'a'}, {'x': 'b', 'page': 3}], name='edit')
+
+    c = Client(App())
+
+    assert c.get('/').json == [
+        'http://localhost/foo/a/edit',
+        'http://localhost/foo/b/edit?page=3',
+    ]
+
+
+def test_class_link_many_mounted():
+    class root(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        def __init__(self, name):
+            self.name = name
+
+    @root.path(path='')
+    class Root(object):
+        pass
+
+    class Model(object):
+        pass
+
+    @sub.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model()
+
+    @root.mount(app=sub, path='sub/{mount_name}',
+                variables=lambda a: {'mount_name': a.name})
+    def mount_sub(mount_name):
+        return sub(name=mount_name)
+
+    @root.json(model=Root)
+    def default(self, request):
+        app = request.app.child(sub, mount_name='foo')
+        return request.class_link_many(Model, [{'id': 'a'}], app=app)
+
+    c = Client(root())
+
+    assert c.get('/').json == ['http://localhost/sub/foo/models/a']
+
+
+def test_class_link_many_not_found():
+    class App(morepath.App):
+        pass
+
+    @App.path(path='')
+    class Root(object):
+        pass
+
+    class Unknown(object):
+        pass
+
+    @App.json(model=Root)
+    def default(self, request):
+        return request.class_link_many(Unknown, [None])
+
+    c = Client(App())
+
+    with pytest.raises(LinkError):
+        c.get('/')
+
+
+def test_class_link_same_as_path_info():
+    class root(morepath.App):
+        pass
+
+    class sub(morepath.App):
+        def __init__(self, name, version):
+            self.name = name
+            self.version = version
+
+    class Model(object):
+        pass
+
+    class SubModel(Model):
+        pass
+
+    class Files(object):
+        pass
+
+    class Home(object):
+        pass
+
+    for app_class in (root, sub):
+        @app_class.path(model=Model, path='models/{id}',
+                        converters={'id': int, 'tags': [int]})
+        def get_model(id, page=0, tags=None):
+            return Model()
+
+        @app_class.path(model=Files, path='files', absorb=True)
+        def get_files(absorb):
+            return Files()
+
+        @app_class.path(model=Home, path='')
+        def get_home():
+            return Home()
+
+    @root.mount(app=sub, path='sub/{name}',
+                variables=lambda a: {'name': a.name, 'version': a.version})
+    def mount_sub(name, version=1):
+        return sub(name, version)
+
+    links = [
+        (Model, {'id': 1}),
+        (SubModel, {'id': 2, 'page': 3}),
+        (Model, {'id': 3, 'tags': [1, 2]}),
+        (Model, {'id': 4, 'extra_parameters': {'x': u'y z'}}),
+        (Files, {'absorb': u'a/b \xe9'}),
+        (Files, {'absorb': ''}),
+        (Home, {}),
+    ]
+
+    @root.json(model=Home)
+    def default(self, request):
+        result = []
+        for app in (request.app,
+                    request.app.child(sub, name=u'f\xf6\xf6', version=2)):
+            for model, variables in links:
+                for name in ('', 'edit'):
+                    info = app._get_deferred_mounted_class_path(
+                        model, dict(variables))
+                    expected = info.url(request.link_prefix(), name)
+                    assert request.class_link(
+                        model, dict(variables), name, app=app) == expected
+                    assert request.class_link_many(
+                        model, [dict(variables)], name, app=app) == [
+                            expected]
+                    result.append(expected)
+        return result
+
+    c = Client(root())
+    result = c.get('/').json
+    assert 'http://localhost/models/3?tags=1&tags=2' in result
+    assert 'http://localhost/files/a/b%20%C3%A9/edit' in result
+    assert 'http://localhost/sub/f%C3%B6%C3%B6/models/4?x=y+z&version=2' in (
+        result)
+    assert 'http://localhost/sub/f%C3%B6%C3%B6/edit?version=2' in result
+
+
+def test_class_path_index():
+    class App(morepath.App):
+        pass
+
+    class Model(object):
+        pass
+
+    class SubModel(Model):
+        pass
+
+    class Unknown(object):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model()
+
+    App.commit()
+
+    path_registry = App.config.path_registry
+    path = path_registry.class_paths[Model]
+    assert path.path == 'models/{id}'
+    assert SubModel not in path_registry.class_paths
+    assert path_registry.class_path(SubModel) is path
+    assert path_registry.class_paths[SubModel] is path
+    assert path_registry.class_path(Unknown) is None
@@ -1,5 +1,6 @@
 from morepath.app import App
 
+from webob import BaseRequest
 from webtest import TestApp as Client
 import morepath
 from reg import KeyIndex
@@ -57,3 +58,186 @@ def test_extra_predicates():
     assert response.body == b'a'
     response = c.get('/b/foo')
     assert response.body == b'b'
+
+
+def test_view_lookup_cache():
+    class app(App):
+        pass
+
+    @app.path(path='{id}')
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    @app.view(model=Model)
+    def default(self, request):
+        return 'default %s' % self.id
+
+    @app.view(model=Model, request_method='POST')
+    def post(self, request):
+        return 'post %s' % self.id
+
+    c = Client(app())
+
+    assert c.get('/a').body == b'default a'
+    assert c.get('/b').body == b'default b'
+    assert c.post('/a').body == b'post a'
+    c.get('/a/unknown', status=404)
+    c.put('/a', status=405)
+    c.get('/a/unknown', status=404)
+
+    view_lookup = app.config.view_lookup
+    assert view_lookup.core_predicates
+    assert len(view_lookup.cache) == 4
+    assert view_lookup.cache.hits == 2
+    assert view_lookup.cache.misses == 4
+    assert view_lookup.cache.hit_rate == 2.0 / 6
+
+
+def test_view_lookup_cache_size_setting():
+    class app(App):
+        pass
+
+    @app.setting(section='view', name='cache_size')
+    def get_cache_size():
+        return 0
+
+    @app.path(path='')
+    class Root(object):
+        pass
+
+    @app.view(model=Root)
+    def default(self, request):
+        return 'default'
+
+    c = Client(app())
+
+    assert c.get('/').body == b'default'
+    assert app.config.view_lookup.cache is None
+
+
+def body_model_app(extra_predicate):
+    class app(App):
+        pass
+
+    @app.path(path='{id}')
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    @app.view(model=Model, request_method='POST')
+    def post(self, request):
+        return 'read' if 'body_obj' in request.__dict__ else 'not read'
+
+    if extra_predicate:
+        @app.predicate(morepath.App.get_view, name='extra', default='',
+                       index=KeyIndex, after=morepath.body_model_predicate)
+        def extra_predicate(self, obj, request):
+            return ''
+
+    return app, Model
+
+
+def test_view_lookup_no_body_model():
+    for extra_predicate in (False, True):
+        app, Model = body_model_app(extra_predicate)
+        c = Client(app())
+        # not even invalid JSON is read
+        assert c.post('/a', b'{', content_type='application/json').body == (
+            b'not read')
+        view_lookup = app.config.view_lookup
+        assert view_lookup.core_predicates is not extra_predicate
+        assert not view_lookup.uses_body_model
+        # looking up the view without calling it doesn't read it either
+        request = app().request(BaseRequest.blank(
+            '/a', method='POST', body=b'{',
+            content_type='application/json').environ)
+        request.view_name = ''
+        assert view_lookup.view(request.app, Model('a'), request) is not None
+        assert 'body_obj' not in request.__dict__
+
+
+def test_view_lookup_body_model():
+    for extra_predicate in (False, True):
+        app, Model = body_model_app(extra_predicate)
+
+        class Item(object):
+            pass
+
+        @app.json(model=Model, request_method='POST', body_model=Item)
+        def post_item(self, request):
+            return 'item'
+
+        @app.load_json()
+        def load_json(json, request):
+            return Item() if json == 'item' else json
+
+        c = Client(app())
+        assert c.post_json('/a', 'item').json == 'item'
+        assert c.post_json('/a', 'other').body == b'read'
+        assert app.config.view_lookup.uses_body_model
+
+
+def test_view_lookup_extra_predicates():
+    class app(App):
+        pass
+
+    @app.path(path='{id}')
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    @app.view(model=Model, id='a')
+    def get_a(self, request):
+        return 'a'
+
+    @app.predicate(morepath.App.get_view, name='id', default='',
+                   index=KeyIndex, after=morepath.request_method_predicate)
+    def id_predicate(self, obj, request):
+        return obj.id
+
+    c = Client(app())
+
+    assert c.get('/a').body == b'a'
+    c.get('/b', status=404)
+
+    view_lookup = app.config.view_lookup
+    assert not view_lookup.core_predicates
+    assert len(view_lookup.cache) == 0
+
+
+def test_extra_predicate_uses_app():
+    class app(App):
+        pass
+
+    @app.setting(section='model', name='special')
+    def get_special():
+        return 'a'
+
+    @app.path(path='{id}')
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    @app.view(model=Model, special=True)
+    def special(self, request):
+        return 'special'
+
+    @app.view(model=Model, special=False)
+    def default(self, request):
+        return 'default'
+
+    @app.view(model=Model, special=True, request_method='POST')
+    def post_special(self, request):
+        return 'post special'
+
+    @app.predicate(morepath.App.get_view, name='special', default=False,
+                   index=KeyIndex, after=morepath.request_method_predicate)
+    def special_predicate(self, obj, request):
+        return obj.id == self.settings.model.special
+
+    c = Client(app())
+
+    assert c.get('/a').body == b'special'
+    assert c.get('/b').body == b'default'
+    assert c.post('/a').body == b'post special'
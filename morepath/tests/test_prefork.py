@@ -0,0 +1,64 @@
+import gc
+
+import morepath
+from morepath.prefork import prepare_for_fork
+from webtest import TestApp as Client
+
+
+def test_prepare_for_fork(monkeypatch):
+    class App(morepath.App):
+        pass
+
+    class Sub(morepath.App):
+        pass
+
+    @App.mount(path='sub', app=Sub)
+    def mount_sub():
+        return Sub()
+
+    @Sub.path(path='')
+    class Root(object):
+        pass
+
+    @Sub.view(model=Root)
+    def default(self, request):
+        return "Sub"
+
+    frozen = []
+    monkeypatch.setattr(gc, 'freeze', lambda: frozen.append(True),
+                        raising=False)
+
+    app = App()
+    assert prepare_for_fork(app) is app
+    assert App.is_committed()
+    assert Sub.is_committed()
+    assert 'publish' in app.__dict__
+    assert frozen == [True]
+
+    assert Client(app).get('/sub').body == b'Sub'
+
+
+def test_prepare_for_fork_without_gc_freeze(monkeypatch):
+    class App(morepath.App):
+        pass
+
+    monkeypatch.delattr(gc, 'freeze', raising=False)
+
+    app = App()
+    assert prepare_for_fork(app) is app
+    assert App.is_committed()
+
+
+def test_prepare_for_fork_no_freeze_gc(monkeypatch):
+    class App(morepath.App):
+        pass
+
+    frozen = []
+    monkeypatch.setattr(gc, 'freeze', lambda: frozen.append(True),
+                        raising=False)
+
+    app = App()
+    assert prepare_for_fork(app, freeze_gc=False) is app
+    assert App.is_committed()
+    assert 'publish' in app.__dict__
+    assert frozen == []
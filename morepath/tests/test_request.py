@@ -74,3 +74,23 @@ def test_request_reset():
     assert response.json == {
         'app': repr(RootApp),
         'unconsumed': ['text', 'catalog', 'mount']}
+
+
+def test_request_normalizes_path():
+    class RootApp(App):
+        pass
+
+    @RootApp.path(path='a/b')
+    class Model(object):
+        pass
+
+    @RootApp.view(model=Model)
+    def view_model(self, request):
+        return request.path_info
+
+    c = Client(RootApp())
+
+    assert c.get('/a/b').text == '/a/b'
+    assert c.get('/a/./b').text == '/a/b'
+    assert c.get('/a/c/../b').text == '/a/b'
+    assert c.get('/a//b/').text == '/a/b'
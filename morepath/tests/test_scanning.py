@@ -1,4 +1,9 @@
+import json
+import os
+import sys
+
 import morepath
+from morepath import autosetup
 from .fixtures import basic, pkg, self_scan
 
 import pytest
@@ -59,3 +64,143 @@ def test_self_scanning_package():
     c = Client(App())
     response = c.get('/')
     assert response.body == b'The root: ROOT'
+
+
+def forget_manifest_fixture(monkeypatch):
+    for name in list(sys.modules):
+        if name.startswith('morepath.tests.fixtures.manifest.'):
+            monkeypatch.delitem(sys.modules, name)
+
+
+def test_scan_profile(monkeypatch):
+    forget_manifest_fixture(monkeypatch)
+    from .fixtures import manifest
+
+    profile = morepath.scan(manifest)
+
+    prefix = 'morepath.tests.fixtures.manifest.'
+    assert sorted(name for name, seconds in profile) == [
+        prefix + 'app', prefix + 'helpers', prefix + 'model',
+        prefix + 'sub', prefix + 'sub.extra', prefix + 'view']
+    assert all(seconds >= 0 for name, seconds in profile)
+
+
+def test_scan_manifest(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('manifest.json'))
+    prefix = 'morepath.tests.fixtures.manifest.'
+
+    forget_manifest_fixture(monkeypatch)
+    from .fixtures import manifest
+
+    morepath.scan(manifest, manifest=filename)
+    with open(filename) as f:
+        data = json.load(f)
+    assert data['morepath.tests.fixtures.manifest']['modules'] == [
+        prefix + 'app', prefix + 'sub.extra', prefix + 'view']
+
+    # the next scan only imports the modules with directives
+    forget_manifest_fixture(monkeypatch)
+    profile = morepath.scan(manifest, manifest=filename)
+    assert [name for name, seconds in profile] == [
+        prefix + 'app', prefix + 'sub.extra', prefix + 'view']
+    assert prefix + 'helpers' not in sys.modules
+
+    App = sys.modules[prefix + 'app'].App
+    App.commit()
+    c = Client(App())
+    assert c.get('/1').body == b'Model: 1'
+    assert c.get('/1/extra').body == b'Extra: 1'
+
+
+def test_scan_manifest_outdated(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('manifest.json'))
+    prefix = 'morepath.tests.fixtures.manifest.'
+
+    forget_manifest_fixture(monkeypatch)
+    from .fixtures import manifest
+
+    morepath.scan(manifest, manifest=filename)
+
+    def package_key(package):
+        return [['changed', 1.0]]
+
+    monkeypatch.setattr(autosetup, 'package_key', package_key)
+    forget_manifest_fixture(monkeypatch)
+    profile = morepath.scan(manifest, manifest=filename)
+    assert prefix + 'helpers' in [name for name, seconds in profile]
+    with open(filename) as f:
+        data = json.load(f)
+    assert data['morepath.tests.fixtures.manifest']['key'] == [
+        ['changed', 1.0]]
+
+
+def test_scan_manifest_handle_error(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('manifest.json'))
+    prefix = 'morepath.tests.fixtures.manifest.'
+
+    forget_manifest_fixture(monkeypatch)
+    from .fixtures import manifest
+
+    morepath.scan(manifest, manifest=filename)
+    with open(filename) as f:
+        data = json.load(f)
+    data['morepath.tests.fixtures.manifest']['modules'].append(
+        prefix + 'missing')
+    with open(filename, 'w') as f:
+        json.dump(data, f)
+
+    forget_manifest_fixture(monkeypatch)
+    with pytest.raises(ImportError):
+        morepath.scan(manifest, manifest=filename)
+
+    errors = []
+    forget_manifest_fixture(monkeypatch)
+    morepath.scan(manifest, manifest=filename,
+                  handle_error=lambda name, e: errors.append(name))
+    assert errors == [prefix + 'missing']
+
+
+def test_package_key():
+    from .fixtures import manifest
+
+    key = autosetup.package_key(manifest)
+    assert [os.path.basename(path) for path, mtime in key] == [
+        '__init__.py', 'app.py', 'helpers.py', 'model.py', 'view.py',
+        '__init__.py', 'extra.py']
+    assert autosetup.package_key(basic) == [
+        [basic.__file__, os.stat(basic.__file__).st_mtime]]
+
+
+def test_scan_module_profile():
+    assert morepath.scan(basic) == []
+
+
+def test_scan_profile_ignore(monkeypatch):
+    forget_manifest_fixture(monkeypatch)
+    from .fixtures import manifest
+
+    profile = morepath.scan(manifest, ignore=['.helpers', '.sub'])
+
+    prefix = 'morepath.tests.fixtures.manifest.'
+    assert sorted(name for name, seconds in profile) == [
+        prefix + 'app', prefix + 'model', prefix + 'view']
+    assert prefix + 'helpers' not in sys.modules
+
+
+def test_directive_paths():
+    # autosetup.directive_paths relies on this part of dectate that is
+    # not in its documented API
+    class App(morepath.App):
+        pass
+
+    @App.path(path='')
+    class Root(object):
+        pass
+
+    directives = App.dectate._directives
+    assert [obj for directive, obj in directives] == [Root]
+    directive, obj = directives[0]
+    assert os.path.normcase(os.path.abspath(directive.code_info.path)) == (
+        autosetup.module_path(sys.modules[__name__]))
+    assert autosetup.module_path(sys.modules[__name__]) in (
+        autosetup.directive_paths())
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 import morepath
 from morepath.request import Response
-from morepath.authentication import Identity, NO_IDENTITY
+from morepath.authentication import (Identity, NO_IDENTITY, NoIdentity,
+                                     identity_key)
+from morepath.cache import MappingStore
+from morepath.error import LinkError
 from .fixtures import identity_policy
 import base64
+import pytest
 import json
 from webtest import TestApp as Client
 try:
@@ -628,3 +632,218 @@ def test_settings_in_permission_rule():
     response = c.get('/foo')
     assert response.body == b'Model: foo'
     response = c.get('/bar', status=403)
+
+
+def identity_cache_app(settings):
+    class App(morepath.App):
+        pass
+
+    class Model(object):
+        pass
+
+    verified = []
+
+    @App.setting_section(section='identity')
+    def get_identity_settings():
+        return settings
+
+    @App.identity_policy()
+    class IdentityPolicy(object):
+        def identify(self, request):
+            userid = request.headers.get('User')
+            if userid is None:
+                return NO_IDENTITY
+            return Identity(userid,
+                            password=request.headers.get('Password'))
+
+        def remember(self, response, request, identity):
+            pass
+
+        def forget(self, response, request):
+            pass
+
+    @App.verify_identity()
+    def verify_identity(identity):
+        verified.append(identity.userid)
+        return identity.password == 'secret'
+
+    @App.path(model=Model, path='test')
+    def get_model():
+        return Model()
+
+    @App.view(model=Model)
+    def default(self, request):
+        return str(request.identity is not NO_IDENTITY)
+
+    @App.view(model=Model, name='logout')
+    def logout(self, request):
+        @request.after
+        def forget(response):
+            request.app.forget_identity(response, request)
+        return "Logged out"
+
+    return App, verified
+
+
+def test_identity_cache_disabled():
+    App, verified = identity_cache_app({})
+    c = Client(App())
+    headers = {'User': 'alice', 'Password': 'secret'}
+    c.get('/test', headers=headers)
+    c.get('/test', headers=headers)
+    assert verified == ['alice', 'alice']
+    assert App.config.identity_cache.store is None
+
+
+def test_identity_cache():
+    App, verified = identity_cache_app({'cache_size': 10})
+    c = Client(App())
+    headers = {'User': 'alice', 'Password': 'secret'}
+    assert c.get('/test', headers=headers).body == b'True'
+    assert c.get('/test', headers=headers).body == b'True'
+    assert verified == ['alice']
+
+    # other identity information is verified again
+    wrong = {'User': 'alice', 'Password': 'wrong'}
+    assert c.get('/test', headers=wrong).body == b'False'
+    assert c.get('/test', headers=wrong).body == b'False'
+    assert verified == ['alice'] * 3
+    assert c.get('/test', headers=headers).body == b'True'
+    assert verified == ['alice'] * 3
+
+
+def test_identity_cache_ttl(monkeypatch):
+    App, verified = identity_cache_app({'cache_size': 10, 'cache_ttl': 5})
+    now = [1000.0]
+    monkeypatch.setattr(
+        'morepath.authentication.time.time', lambda: now[0])
+    c = Client(App())
+    headers = {'User': 'alice', 'Password': 'secret'}
+    c.get('/test', headers=headers)
+    now[0] += 4
+    c.get('/test', headers=headers)
+    assert verified == ['alice']
+    now[0] += 2
+    c.get('/test', headers=headers)
+    assert verified == ['alice', 'alice']
+
+
+def test_identity_cache_forget():
+    App, verified = identity_cache_app({'cache_size': 10})
+    c = Client(App())
+    headers = {'User': 'alice', 'Password': 'secret'}
+    c.get('/test', headers=headers)
+    c.get('/test', headers={'User': 'bob', 'Password': 'secret'})
+    assert 'alice' in App.config.identity_cache.store
+    c.get('/test/logout', headers=headers)
+    assert 'alice' not in App.config.identity_cache.store
+    assert 'bob' in App.config.identity_cache.store
+    c.get('/test', headers=headers)
+    assert verified == ['alice', 'bob', 'alice']
+
+
+def test_identity_cache_store():
+    mapping = {}
+    App, verified = identity_cache_app(
+        {'cache_store': MappingStore(mapping, 10)})
+    c = Client(App())
+    headers = {'User': 'alice', 'Password': 'secret'}
+    c.get('/test', headers=headers)
+    c.get('/test', headers=headers)
+    assert verified == ['alice']
+    assert list(mapping) == ['alice']
+    assert identity_key(Identity('alice', password='secret')) in (
+        mapping['alice'])
+
+
+def permission_memo_app(memoize):
+    class App(morepath.App):
+        pass
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    class Permission(object):
+        pass
+
+    checked = []
+
+    @App.setting(section='permission', name='memoize')
+    def get_memoize():
+        return memoize
+
+    @App.path(model=Model, path='{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.permission_rule(model=Model, permission=Permission,
+                         identity=NoIdentity)
+    def get_permission(identity, model, permission):
+        checked.append(model.id)
+        return model.id != 'secret'
+
+    @App.view(model=Model, permission=Permission)
+    def default(self, request):
+        models = [self, self, Model('other'), Model('secret'),
+                  Model('secret')]
+        return ' '.join(str(request.permits(model, Permission))
+                        for model in models)
+
+    return App, checked
+
+
+def test_permission_memo_disabled():
+    App, checked = permission_memo_app(False)
+    c = Client(App())
+    assert c.get('/foo').body == b'True True True False False'
+    assert checked == ['foo'] * 3 + ['other', 'secret', 'secret']
+
+
+def test_permission_memo():
+    App, checked = permission_memo_app(True)
+    c = Client(App())
+    assert c.get('/foo').body == b'True True True False False'
+    # each secret model is a different object
+    assert checked == ['foo', 'other', 'secret', 'secret']
+    c.get('/foo')
+    assert checked == ['foo', 'other', 'secret', 'secret'] * 2
+    c.get('/secret', status=403)
+
+
+def test_request_permits_app():
+    class App(morepath.App):
+        pass
+
+    class Sub(morepath.App):
+        pass
+
+    class Model(object):
+        pass
+
+    class Permission(object):
+        pass
+
+    @App.path(model=Model, path='')
+    def get_model():
+        return Model()
+
+    @App.mount(app=Sub, path='sub')
+    def mount_sub():
+        return Sub()
+
+    @Sub.permission_rule(model=Model, permission=Permission,
+                         identity=NoIdentity)
+    def get_permission(identity, model, permission):
+        return True
+
+    @App.view(model=Model)
+    def default(self, request):
+        with pytest.raises(LinkError):
+            request.permits(self, Permission, app=None)
+        return '%s %s' % (
+            request.permits(self, Permission),
+            request.permits(self, Permission, app=request.app.child(Sub())))
+
+    c = Client(App())
+    assert c.get('/').body == b'False True'
@@ -0,0 +1,287 @@
+import morepath
+from morepath.authentication import NoIdentity
+from morepath.timing import Histogram, escape
+from webtest import TestApp as Client
+
+
+class Model(object):
+    def __init__(self, id):
+        self.id = id
+
+
+def recorder(app_class):
+    recorded = []
+
+    @app_class.timing_callback()
+    def record(request, stage, label, duration):
+        assert isinstance(request, morepath.Request)
+        assert duration >= 0
+        recorded.append((stage, label))
+
+    return recorded
+
+
+def test_no_timing_callbacks():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    c = Client(App())
+    assert c.get('/models/1').body == b'Model: 1'
+    assert App.config.timing_registry.callbacks == []
+
+
+def test_timing():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    recorded = recorder(App)
+
+    c = Client(App())
+    assert c.get('/models/1').body == b'Model: 1'
+    assert recorded == [
+        ('routing', 'App'),
+        ('model_factory', 'get_model'),
+        ('view', 'default'),
+        ('render', 'render_view'),
+        ('tween', 'excview_tween_factory'),
+        ('tween', 'poisoned_host_header_protection_tween_factory'),
+    ]
+
+
+def test_timing_mount():
+    class App(morepath.App):
+        pass
+
+    class Sub(morepath.App):
+        pass
+
+    @App.mount(app=Sub, path='sub')
+    def mount_sub():
+        return Sub()
+
+    @Sub.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @Sub.json(model=Model)
+    def default(self, request):
+        return {'id': self.id}
+
+    recorded = recorder(App)
+
+    c = Client(App())
+    assert c.get('/sub/models/1').json == {'id': '1'}
+    assert recorded[:5] == [
+        ('routing', 'App'),
+        ('model_factory', 'mount_sub'),
+        ('routing', 'Sub'),
+        ('model_factory', 'get_model'),
+        ('view', 'default'),
+    ]
+
+
+def test_timing_not_found():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        if id == 'missing':
+            return None
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    @App.view(model=Model, name='internal', internal=True)
+    def internal(self, request):
+        return "Internal"
+
+    recorded = recorder(App)
+
+    c = Client(App())
+    c.get('/foo', status=404)
+    assert recorded[0] == ('routing', 'App')
+    assert recorded[1][0] == 'tween'
+    del recorded[:]
+
+    c.get('/models/missing', status=404)
+    assert recorded[:2] == [('routing', 'App'),
+                            ('model_factory', 'get_model')]
+    del recorded[:]
+
+    c.get('/models/1/foo/bar', status=404)
+    c.get('/models/1/foo', status=404)
+    c.get('/models/1/internal', status=404)
+    assert 'view' not in [stage for stage, label in recorded]
+
+
+def test_timing_permission():
+    class App(morepath.App):
+        pass
+
+    class Permission(object):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.permission_rule(model=Model, permission=Permission,
+                         identity=NoIdentity)
+    def get_permission(identity, model, permission):
+        return model.id == 'public'
+
+    @App.view(model=Model, permission=Permission)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    recorded = recorder(App)
+
+    c = Client(App())
+    assert c.get('/models/public').body == b'Model: public'
+    assert recorded[2:6] == [
+        ('identity', 'App'),
+        ('permits', 'Permission'),
+        ('view', 'default'),
+        ('render', 'render_view'),
+    ]
+    del recorded[:]
+
+    c.get('/models/secret', status=403)
+    assert recorded[2:4] == [
+        ('identity', 'App'),
+        ('permits', 'Permission'),
+    ]
+    assert recorded[4][0] == 'tween'
+
+
+def test_timing_exception():
+    class App(morepath.App):
+        pass
+
+    class Error(Exception):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        raise Error()
+
+    @App.view(model=Error)
+    def error(self, request):
+        return "Error"
+
+    recorded = recorder(App)
+
+    c = Client(App())
+    assert c.get('/models/1').body == b'Error'
+    assert recorded[2:4] == [
+        ('view', 'default'),
+        ('tween', 'excview_tween_factory'),
+    ]
+
+
+def test_timing_render_without_after():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        @request.after
+        def after(response):
+            recorded.append(('after', 'after'))
+        return "Model: %s" % self.id
+
+    @App.view(model=Model, name='response')
+    def response(self, request):
+        return morepath.Response("Response")
+
+    recorded = recorder(App)
+
+    c = Client(App())
+    c.get('/models/1')
+    assert recorded[2:5] == [
+        ('view', 'default'),
+        ('render', 'render_view'),
+        ('after', 'after'),
+    ]
+    del recorded[:]
+
+    assert c.get('/models/1/response').body == b'Response'
+    assert recorded[2] == ('view', 'response')
+    assert 'render' not in [stage for stage, label in recorded]
+
+
+def test_histogram():
+    histogram = Histogram(name='t', buckets=[0.1, 1.0])
+    histogram.observe('routing', 'App', 0.05)
+    histogram.observe('routing', 'App', 0.5)
+    histogram.observe('routing', 'App', 5.0)
+    histogram(None, 'view', 'default', 0.5)
+    assert histogram.render().split('\n') == [
+        '# HELP t Duration of the stages of publishing requests.',
+        '# TYPE t histogram',
+        't_bucket{stage="routing",label="App",le="0.1"} 1',
+        't_bucket{stage="routing",label="App",le="1.0"} 2',
+        't_bucket{stage="routing",label="App",le="+Inf"} 3',
+        't_sum{stage="routing",label="App"} 5.55',
+        't_count{stage="routing",label="App"} 3',
+        't_bucket{stage="view",label="default",le="0.1"} 0',
+        't_bucket{stage="view",label="default",le="1.0"} 1',
+        't_bucket{stage="view",label="default",le="+Inf"} 1',
+        't_sum{stage="view",label="default"} 0.5',
+        't_count{stage="view",label="default"} 1',
+        '',
+    ]
+
+
+def test_histogram_timing_callback():
+    class App(morepath.App):
+        pass
+
+    @App.path(model=Model, path='models/{id}')
+    def get_model(id):
+        return Model(id)
+
+    @App.view(model=Model)
+    def default(self, request):
+        return "Model: %s" % self.id
+
+    histogram = Histogram()
+    App.timing_callback()(histogram)
+
+    c = Client(App())
+    c.get('/models/1')
+    c.get('/models/2')
+    assert histogram.histograms[('view', 'default')][1] == 2
+    assert ('morepath_stage_duration_seconds_count'
+            '{stage="routing",label="App"} 2') in histogram.render()
+
+
+def test_escape():
+    assert escape('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
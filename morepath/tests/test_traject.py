@@ -1,11 +1,14 @@
 import morepath
+from morepath.cache import LRUCache
 from morepath.traject import (TrajectRegistry,
                               Node, Step, TrajectError,
                               is_identifier, parse_variables,
                               Path, create_path, parse_path,
-                              normalize_path,
-                              ParameterFactory)
-from morepath.converter import Converter, IDENTITY_CONVERTER
+                              normalize_path, is_normalized_path,
+                              split_normalized_path,
+                              ParameterFactory, CompiledTraject,
+                              EMPTY_CONVERTERS)
+from morepath.converter import Converter, ListConverter, IDENTITY_CONVERTER
 import pytest
 from webob.exc import HTTPBadRequest
 
@@ -229,6 +232,72 @@ def test_unknown_converter():
         Step('{foo:blurb}')
 
 
+def test_steps_share_pattern():
+    converters = {'foo': Converter(int)}
+    a = Step('x{foo}', converters)
+    b = Step('x{foo}')
+    assert a._variables_re is b._variables_re
+    assert a.names is b.names
+    assert a.cmp_converters == (converters['foo'],)
+    assert b.cmp_converters == (IDENTITY_CONVERTER,)
+    assert a != b
+    variables = {}
+    assert a.match('x1', variables)
+    assert variables == {'foo': 1}
+    assert b.match('x1', variables)
+    assert variables == {'foo': '1'}
+    assert not a.match('xfoo', {})
+    with pytest.raises(AttributeError):
+        a.extra = 1
+
+
+def test_step_invalid_not_shared():
+    with pytest.raises(TrajectError):
+        Step('{foo}{bar}')
+    with pytest.raises(TrajectError):
+        Step('{foo}{bar}')
+
+
+def test_step_patterns_bounded(monkeypatch):
+    patterns = LRUCache(2)
+    monkeypatch.setattr('morepath.traject._step_patterns', patterns)
+    a = Step('a{foo}')
+    Step('b{foo}')
+    Step('c{foo}')
+    assert len(patterns) == 2
+    assert 'a{foo}' not in patterns
+    # the step keeps working after its pattern is discarded
+    variables = {}
+    assert a.match('a1', variables)
+    assert variables == {'foo': '1'}
+    assert Step('a{foo}') == a
+
+
+def test_empty_converters_read_only():
+    step = Step('{foo}')
+    assert step.converters is EMPTY_CONVERTERS
+    with pytest.raises(TypeError):
+        step.converters['foo'] = Converter(int)
+    assert len(EMPTY_CONVERTERS) == 0
+
+
+def test_leaf_nodes_share_containers():
+    node = Node()
+    a = node.add(Step('a'))
+    b = node.add(Step('b'))
+    assert a._name_nodes is b._name_nodes
+    assert a._variable_nodes is b._variable_nodes
+    a_child = a.add(Step('c'))
+    a_variable_child = a.add(Step('{x}'))
+    assert b._name_nodes == {}
+    assert b._variable_nodes == ()
+    assert b.resolve('c', {}) is None
+    assert b.resolve('d', {}) is None
+    assert a.resolve('c', {}) is a_child
+    assert a.resolve('d', {}) is a_variable_child
+    assert b.create({}, None) is None
+
+
 def test_name_node():
     node = Node()
     step_node = node.add(Step('foo'))
@@ -623,6 +692,35 @@ def test_normalize_path():
     assert normalize_path('/a/b/c/../../d') == '/a/d'
 
 
+@pytest.mark.parametrize('path', [
+    '/', '/a', '/a/b/c', '/a/b.txt', '/.hidden', '/a/.', '/a/..',
+    '', 'a', '/a/', '//a', '/a//b', '/a/./b', '/a/../b', '../a',
+])
+def test_is_normalized_path(path):
+    if is_normalized_path(path):
+        assert split_normalized_path(path) == parse_path(path)
+        assert create_path(split_normalized_path(path)) == path
+    else:
+        assert normalize_path(path) == create_path(parse_path(path))
+
+
+def test_is_normalized_path_values():
+    assert is_normalized_path('/')
+    assert is_normalized_path('/a/b')
+    assert not is_normalized_path('')
+    assert not is_normalized_path('a/b')
+    assert not is_normalized_path('/a/b/')
+    assert not is_normalized_path('/a//b')
+    assert not is_normalized_path('/a/../b')
+    assert not is_normalized_path('/a/./b')
+
+
+def test_split_normalized_path():
+    assert split_normalized_path('/') == []
+    assert split_normalized_path('/a') == ['a']
+    assert split_normalized_path('/a/b') == ['a', 'b']
+
+
 def test_identifier():
     assert is_identifier('a')
     not is_identifier('')
@@ -1056,3 +1154,270 @@ def test_extra_parameters():
     assert get_parameters(req('?a=foo&b=bar')) == {
         'a': 'foo',
         'extra_parameters': {'b': 'bar'}}
+
+
+def test_list_parameter():
+    get_parameters = ParameterFactory(
+        {'a': []}, {'a': ListConverter(Converter(int))}, [])
+    assert get_parameters(req('?a=1&b=2&a=3')) == {'a': [1, 3]}
+    assert get_parameters(req('')) == {'a': []}
+
+
+def test_extra_parameters_multiple_values():
+    get_parameters = ParameterFactory(
+        {'a': None}, {'b': ListConverter(Converter(int))}, [], True)
+    assert get_parameters(req('?b=1&a=foo&b=2&c=x')) == {
+        'a': 'foo',
+        'extra_parameters': {'b': [1, 2], 'c': 'x'}}
+    with pytest.raises(HTTPBadRequest):
+        get_parameters(req('?b=x'))
+
+
+def test_parameter_factory_none_arguments():
+    get_parameters = ParameterFactory(None, None, None, True)
+    assert get_parameters(req('?a=foo')) == {}
+
+
+def compiled_patterns_traject():
+    traject = TrajectRegistry()
+    traject.add_pattern('a/b/c', Model)
+    traject.add_pattern('a/{x}', Model)
+    traject.add_pattern('a/{x}/d', Model)
+    traject.add_pattern('a/prefix{x}', Model)
+    traject.add_pattern('a/prefix{x}/y', Model)
+    traject.add_pattern('x{x}y', Model)
+    traject.add_pattern('xa{x}y', Model)
+    traject.add_pattern('{x}:{y}', Model)
+    traject.add_pattern('i/{i}', Model, converters={'i': Converter(int)})
+    traject.add_pattern('i/{i}/s', Model, converters={'i': Converter(int)})
+    traject.add_pattern('i/{i}/n{x}', Model, converters={'i': Converter(int)})
+    traject.add_pattern('files', Model, absorb=True)
+    traject.add_pattern('n/{x}/files', Model, absorb=True)
+    return traject
+
+
+@pytest.mark.parametrize('path', [
+    '', 'a', 'a/b', 'a/b/c', 'a/b/c/d', 'a/foo', 'a/foo/d', 'a/foo/e',
+    'a/prefixfoo', 'a/prefixfoo/y', 'a/prefix', 'xfooy', 'xafooy', 'xy',
+    'a:b', 'a::b', 'i/1', 'i/one', 'i/one/s', 'i/1/s', 'i/1/nfoo', 'files',
+    'files/x/y', 'n/1/files', 'n/1/files/z', 'a/+view', '+view',
+    'a/foo/+edit', 'a/b/c/+edit', 'a/foo\nbar', 'a/foo\n', 'unknown/a',
+])
+def test_compiled_traject_matches_tree(path):
+    traject = compiled_patterns_traject()
+    stack = parse_path(path)
+    stack.reverse()
+
+    tree_node, tree_variables, tree_consumed = traject.match(stack)
+
+    traject.compile()
+    assert traject.match(stack) == (tree_node, tree_variables, tree_consumed)
+    assert CompiledTraject(traject._root).match(stack) == (
+        tree_node, tree_variables, tree_consumed)
+
+
+def test_compiled_traject_match_does_not_modify_stack():
+    traject = compiled_patterns_traject()
+    traject.compile()
+    stack = ['c', 'b', 'a']
+    node, variables, consumed = traject.match(stack)
+    assert stack == ['c', 'b', 'a']
+    assert consumed == 3
+    assert variables == {}
+
+
+def test_compiled_traject_converter_failure_falls_through():
+    class Item(object):
+        def __init__(self, i):
+            self.i = i
+
+    traject = TrajectRegistry()
+    traject.add_pattern('{i}', Model, converters={'i': Converter(int)})
+    traject.add_pattern('{i}/s', Item, converters={'i': Converter(int)})
+    traject.compile()
+
+    r = req('1/s')
+    obj = traject.consume(r)
+    assert isinstance(obj, Item)
+    assert obj.i == 1
+    assert r.unconsumed == []
+
+    r = req('one/s')
+    assert traject.consume(r) is None
+    assert r.unconsumed == ['s', 'one']
+
+
+def test_compiled_traject_absorb():
+    traject = TrajectRegistry()
+
+    class Absorb(object):
+        def __init__(self, absorb):
+            self.absorb = absorb
+
+    traject.add_pattern('foo', Absorb, absorb=True)
+    traject.compile()
+
+    r = req('foo/a/b')
+    obj = traject.consume(r)
+    assert obj.absorb == 'a/b'
+    assert r.unconsumed == []
+
+    r = req('foo')
+    assert traject.consume(r).absorb == ''
+
+
+def test_add_pattern_discards_compiled():
+    traject = TrajectRegistry()
+    traject.add_pattern('a', Model)
+    traject.compile()
+    traject.add_pattern('b', Special)
+    assert isinstance(traject.consume(req('b')), Special)
+
+
+def test_compiled_setting():
+    class App(morepath.App):
+        pass
+
+    @App.setting(section='traject', name='compiled')
+    def get_compiled():
+        return True
+
+    @App.path(path='models/{id}')
+    class Item(object):
+        def __init__(self, id):
+            self.id = id
+
+    App.commit()
+
+    traject = App.config.path_registry
+    assert isinstance(traject._compiled, CompiledTraject)
+
+    obj = traject.consume(req('models/3'))
+    assert isinstance(obj, Item)
+    assert obj.id == '3'
+
+
+def test_compiled_setting_default_off():
+    class App(morepath.App):
+        pass
+
+    App.commit()
+
+    assert App.config.path_registry._compiled is None
+
+
+def test_traject_cache():
+    created = []
+
+    class Item(object):
+        def __init__(self, id):
+            created.append(id)
+            self.id = id
+
+    traject = TrajectRegistry()
+    traject.add_pattern('items/{id}', Item,
+                        converters={'id': Converter(int)})
+    traject.enable_cache(10)
+
+    r = req('items/1/edit')
+    obj = traject.consume(r)
+    assert obj.id == 1
+    assert r.unconsumed == ['edit']
+    assert traject.cache.misses == 1
+    assert traject.cache.hits == 0
+
+    r = req('items/1/edit')
+    obj = traject.consume(r)
+    assert obj.id == 1
+    assert r.unconsumed == ['edit']
+    assert traject.cache.misses == 1
+    assert traject.cache.hits == 1
+
+    # the model is still constructed for each request
+    assert created == [1, 1]
+
+
+def test_traject_cache_copies_variables():
+    class Items(object):
+        def __init__(self, ids):
+            self.ids = ids
+
+    traject = TrajectRegistry()
+    traject.add_pattern('items/{ids}', Items,
+                        converters={'ids': Converter(
+                            lambda s: s.split(','), ','.join)})
+    traject.enable_cache(10)
+
+    node, variables = traject.resolve(req('items/1,2'))
+    assert variables == {'ids': ['1', '2']}
+    variables['ids'].append('3')
+    variables['extra'] = 'extra'
+
+    node, variables = traject.resolve(req('items/1,2'))
+    assert traject.cache.hits == 1
+    assert variables == {'ids': ['1', '2']}
+    other_node, other = traject.resolve(req('items/1,2'))
+    assert other == variables
+    assert other['ids'] is not variables['ids']
+
+
+def test_traject_cache_maxsize():
+    class Item(object):
+        def __init__(self, id):
+            self.id = id
+
+    traject = TrajectRegistry()
+    traject.add_pattern('items/{id}', Item)
+    traject.enable_cache(2)
+
+    traject.consume(req('items/1'))
+    traject.consume(req('items/2'))
+    traject.consume(req('items/3'))
+    assert len(traject.cache) == 2
+    assert ('1', 'items') not in traject.cache
+    assert ('3', 'items') in traject.cache
+
+
+def test_add_pattern_clears_cache():
+    traject = TrajectRegistry()
+    traject.add_pattern('a', Model)
+    traject.enable_cache(10)
+
+    assert traject.consume(req('b')) is None
+    traject.add_pattern('b', Model)
+    assert isinstance(traject.consume(req('b')), Model)
+
+
+def test_cache_size_setting():
+    class App(morepath.App):
+        pass
+
+    @App.setting(section='traject', name='cache_size')
+    def get_cache_size():
+        return 100
+
+    @App.path(path='models/{id}')
+    class Item(object):
+        def __init__(self, id):
+            self.id = id
+
+    App.commit()
+
+    traject = App.config.path_registry
+    assert traject.cache.maxsize == 100
+    traject.consume(req('models/3'))
+    assert len(traject.cache) == 1
+
+    App.commit()
+
+    assert App.config.path_registry.cache is not traject.cache
+    assert len(App.config.path_registry.cache) == 0
+
+
+def test_cache_size_setting_default_off():
+    class App(morepath.App):
+        pass
+
+    App.commit()
+
+    assert App.config.path_registry.cache is None
@@ -1,6 +1,7 @@
 import morepath
-from morepath.tween import TweenRegistry
+from morepath.tween import TweenRegistry, TweenHooks, hooks_handler
 from morepath.error import TopologicalSortError
+from morepath.publish import publish
 import pytest
 from webtest import TestApp as Client
 
@@ -179,3 +180,198 @@ def test_tween_directive():
     response = c.get('/')
     assert response.body == b'View'
     assert response.headers['Tween-Header'] == 'FOO'
+
+
+def test_tween_hooks_directive():
+    class app(morepath.App):
+        pass
+
+    @app.path(path='')
+    class Root(object):
+        pass
+
+    @app.view(model=Root)
+    def default(self, request):
+        return "View"
+
+    @app.view(model=Root, name='error')
+    def error(self, request):
+        raise ValueError()
+
+    events = []
+
+    @app.tween_factory()
+    def hooks_a(app, handler):
+        def before(request):
+            events.append('before a')
+
+        def after(request, response):
+            events.append('after a')
+            response.headers['A'] = 'a'
+            return response
+
+        def exception(request, exc):
+            events.append('exception a')
+            return morepath.Response('Handled by a')
+        return morepath.TweenHooks(before, after, exception)
+
+    @app.tween_factory(under=hooks_a)
+    def tween_b(app, handler):
+        def tween(request):
+            events.append('enter b')
+            response = handler(request)
+            events.append('exit b')
+            return response
+        return tween
+
+    @app.tween_factory(under=tween_b)
+    def hooks_c(app, handler):
+        def before(request):
+            events.append('before c')
+            if request.GET.get('stop'):
+                return morepath.Response('Stopped by c')
+        return morepath.TweenHooks(before=before)
+
+    c = Client(app())
+
+    response = c.get('/')
+    assert response.body == b'View'
+    assert response.headers['A'] == 'a'
+    assert events == ['before a', 'enter b', 'before c', 'exit b', 'after a']
+    del events[:]
+
+    response = c.get('/?stop=1')
+    assert response.body == b'Stopped by c'
+    assert response.headers['A'] == 'a'
+    assert events == ['before a', 'enter b', 'before c', 'exit b', 'after a']
+    del events[:]
+
+    response = c.get('/error')
+    assert response.body == b'Handled by a'
+    assert events == ['before a', 'enter b', 'before c', 'exception a']
+
+
+def test_tween_registry_wrap_combines_hooks():
+    class app(morepath.App):
+        pass
+
+    calls = []
+
+    @app.tween_factory()
+    def a(app, handler):
+        calls.append(('a', handler))
+        return morepath.TweenHooks()
+
+    @app.tween_factory(under=a)
+    def b(app, handler):
+        calls.append(('b', handler))
+        return morepath.TweenHooks()
+
+    app.commit()
+    handler = app.config.tween_registry.wrap(app())
+    # all factories use hooks, so the core tweens and these are combined
+    assert handler.__name__ == 'handle'
+    assert [name for name, h in calls] == ['b', 'a']
+    assert calls[0][1] is publish
+    assert calls[1][1].__name__ == 'handle'
+
+
+def hooks_behavior(flat, levels, handler_raises):
+    """Run hooks with a flat handler or with nested tweens.
+
+    Returns the events and the outcome.
+    """
+    events = []
+
+    def handler(request):
+        events.append('handler')
+        if handler_raises:
+            raise ValueError('handler')
+        return 'response'
+
+    hooks = []
+    for i, (before, after, exception) in enumerate(levels):
+        def make(i, before, after, exception):
+            def before_hook(request):
+                events.append('before %s' % i)
+                if before == 'respond':
+                    return 'before %s' % i
+                if before == 'raise':
+                    raise ValueError('before %s' % i)
+
+            def after_hook(request, response):
+                events.append('after %s' % i)
+                if after == 'raise':
+                    raise ValueError('after %s' % i)
+                return response + ' after %s' % i
+
+            def exception_hook(request, exc):
+                events.append('exception %s %s' % (i, exc))
+                if exception == 'handle':
+                    return 'handled %s' % i
+                if exception == 'raise':
+                    raise ValueError('exception %s' % i)
+
+            return morepath.TweenHooks(
+                before_hook if before else None,
+                after_hook if after else None,
+                exception_hook if exception else None)
+        hooks.append(make(i, before, after, exception))
+
+    if flat:
+        tween = hooks_handler(hooks, handler)
+    else:
+        tween = handler
+        for h in reversed(hooks):
+            tween = h.tween(tween)
+    try:
+        outcome = tween(None)
+    except ValueError as e:
+        outcome = ('raised', str(e))
+    return events, outcome
+
+
+def test_hooks_handler_same_as_nested_tweens():
+    befores = [None, 'pass', 'respond', 'raise']
+    afters = [None, 'modify', 'raise']
+    exceptions = [None, 'handle', 'decline', 'raise']
+    level_options = [(b, a, e) for b in befores for a in afters
+                     for e in exceptions]
+    for first in level_options:
+        for second in level_options:
+            for handler_raises in (False, True):
+                levels = [first, second]
+                assert (hooks_behavior(True, levels, handler_raises) ==
+                        hooks_behavior(False, levels, handler_raises))
+
+
+def test_hooks_handler_tween():
+    def handler(request):
+        return 'response'
+
+    def before(request):
+        if request == 'stop':
+            return 'stopped'
+
+    def after(request, response):
+        return response + '!'
+
+    tween = TweenHooks(before, after).tween(handler)
+    assert tween('go') == 'response!'
+    assert tween('stop') == 'stopped'
+
+
+def test_hooks_handler_reraises_original():
+    error = ValueError()
+
+    def handler(request):
+        raise error
+
+    def exception(request, exc):
+        return None
+
+    handle = hooks_handler([TweenHooks(exception=exception)], handler)
+    with pytest.raises(ValueError) as e:
+        handle(None)
+    assert e.value is error
+    assert e.traceback[-1].name == 'handler'
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from morepath.path import PathInfo, fixed_urlencode
+from morepath.traject import Path
+from morepath.url import (PathTemplate, quote_path, quote_query_value,
+                          encode_query)
+
+try:
+    # Python 2
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+
+SAMPLES = [
+    u'',
+    u'foo',
+    u'foo/bar',
+    u'/foo/bar/',
+    u'a-b_c.d~e',
+    u'foo bar',
+    u'foo+bar',
+    u'foo&bar=baz',
+    u'100%',
+    u'%7E',
+    u'?#[]@!$\'()*,;:',
+    u'élève',
+    u'日本語/☃',
+    u'\U0001F600',
+    u'tab\there\nnewline',
+]
+
+
+def test_quote_path():
+    for sample in SAMPLES:
+        assert quote_path(sample) == quote(sample.encode('utf-8'), '/~')
+
+
+def test_quote_path_safe_returns_same():
+    path = u'foo/bar-baz_1.2~3'
+    assert quote_path(path) is path
+
+
+def test_quote_query_value():
+    for sample in SAMPLES:
+        expected = fixed_urlencode({'x': sample.encode('utf-8')})[2:]
+        assert quote_query_value(sample) == expected
+
+
+def test_encode_query():
+    parameters = {
+        'a': [u'1'],
+        'b b': [u'x y', u'é'],
+        u'é': [u'~'],
+        'empty': [],
+        'c': [u'1', u'2', u'3'],
+    }
+    expected = fixed_urlencode(
+        dict((key, [v.encode('utf-8') for v in value])
+             for (key, value) in parameters.items()), True)
+    assert encode_query(parameters) == expected
+
+
+def test_encode_query_samples():
+    for sample in SAMPLES:
+        parameters = {'x': [sample], 'y': [sample, sample]}
+        expected = fixed_urlencode(
+            dict((key, [v.encode('utf-8') for v in value])
+                 for (key, value) in parameters.items()), True)
+        assert encode_query(parameters) == expected
+
+
+def test_path_template():
+    for pattern in ['foo/{x}', '{x}', '{x}/{y}', 'föö/{x}+{y}',
+                    'a b/{x}/c d', 'static']:
+        interpolation_path = Path(pattern).interpolation_str()
+        template = PathTemplate(interpolation_path)
+        for sample in SAMPLES:
+            variables = {'x': sample, 'y': u'y' + sample}
+            path = interpolation_path % variables
+            assert template.quote(path, variables) == quote_path(path)
+
+
+def test_path_template_percent():
+    template = PathTemplate('100%%/%(x)s')
+    assert template.quote(u'100%/a b', {'x': u'a b'}) == '100%25/a%20b'
+
+
+def test_path_info_url():
+    info = PathInfo(u'föö bar/~x', {'q': [u'a b', u'~']})
+    assert info.url('http://localhost', 'edit') == (
+        'http://localhost/f%C3%B6%C3%B6%20bar/~x/edit?q=a+b&q=~')
+
+
+def test_path_info_quoted_path_given():
+    info = PathInfo(u'a b', {}, 'a%20b')
+    assert info.quoted_path == 'a%20b'
+    assert info.url('', '') == '/a%20b'
@@ -0,0 +1,265 @@
+"""Timing of the stages of publishing a request.
+
+Functions registered with :meth:`morepath.App.timing_callback` are
+called with the duration of each stage of publishing a request. The
+callbacks of the app that handles the request are used for all the
+stages, including those in mounted apps. If no timing callbacks are
+registered the request is published as usual, without any timing.
+This is done by :func:`morepath.publish.timed_publish`.
+
+The stages are:
+
+``tween``
+  a tween, labeled with the name of its tween factory. This includes
+  the time spent in the tweens and the publishing it wraps.
+
+``routing``
+  routing the path in an app, labeled with the name of the app class.
+  There is one for each app in the mount chain.
+
+``model_factory``
+  calling the model factory (or the app factory of a mount), labeled
+  with the name of the factory.
+
+``identity``
+  identifying the user with the identity policy, labeled with the name
+  of the app class. Only for views that have a permission.
+
+``permits``
+  checking the permission, labeled with the name of the permission
+  class.
+
+``view``
+  calling the view function, labeled with its name.
+
+``render``
+  rendering the return value of the view function to a response,
+  labeled with the name of the render function. This doesn't include
+  the functions registered with :meth:`morepath.Request.after`, and
+  there is no render stage if the view function returns a response.
+
+:class:`Histogram` is a timing callback that collects the durations in
+a histogram for each stage and label, which can be exported in the
+Prometheus_ text format.
+
+.. _Prometheus: https://prometheus.io
+"""
+import threading
+from timeit import default_timer as timer
+
+from .tween import TweenHooks
+from .view import View
+
+
+class TimingRegistry(object):
+    """Registry for timing callbacks.
+    """
+    def __init__(self):
+        self.callbacks = []
+
+    def register_timing_callback(self, callback):
+        """Register a timing callback.
+
+        :param callback: a function that takes the request, the stage,
+          its label and its duration in seconds.
+        """
+        self.callbacks.append(callback)
+
+    def record(self, request, stage, label, duration):
+        """Pass the duration of a stage to all timing callbacks.
+
+        :param request: the :class:`morepath.Request`.
+        :param stage: the name of the stage, such as ``'routing'``.
+        :param label: the label of the stage, such as the name of the
+          app class.
+        :param duration: the duration in seconds.
+        """
+        for callback in self.callbacks:
+            callback(request, stage, label, duration)
+
+    def wrap(self, app):
+        """Wrap publishing in tweens, with timing.
+
+        Like :meth:`morepath.tween.TweenRegistry.wrap`, but wraps
+        :func:`morepath.publish.timed_publish` and each tween is timed
+        as well. Tweens that use :class:`morepath.tween.TweenHooks`
+        are not combined, so that they can be timed separately.
+
+        :param app: an instance of :class:`morepath.App`.
+        :return: a function that takes a request and returns a
+          response.
+        """
+        # to avoid circular import import publish here
+        from .publish import timed_publish as result
+        tween_registry = app.config.tween_registry
+        for tween_factory in reversed(tween_registry.sorted_tween_factories()):
+            tween = tween_factory(app, result)
+            if isinstance(tween, TweenHooks):
+                tween = tween.tween(result)
+            result = self.timed_tween(tween, name_of(tween_factory))
+        return result
+
+    def timed_tween(self, tween, label):
+        """Wrap a tween so that it is timed.
+
+        :param tween: the tween to time.
+        :param label: the label to report its duration with.
+        :return: a tween.
+        """
+        def timed(request):
+            start = timer()
+            try:
+                return tween(request)
+            finally:
+                self.record(request, 'tween', label, timer() - start)
+        return timed
+
+
+class TimedView(View):
+    """A view that reports the duration of its stages.
+
+    Wraps a :class:`morepath.view.View` for a single request. Calling
+    it does the same as calling the view, but the view function, the
+    render function, :meth:`morepath.view.View.identify` and
+    :meth:`morepath.view.View.permits` are timed.
+
+    :param view: the :class:`morepath.view.View` to time.
+    :param request: the :class:`morepath.Request` it is used for.
+    :param record: function to report durations to, see
+      :meth:`TimingRegistry.record`.
+    """
+    def __init__(self, view, request, record):
+        super(TimedView, self).__init__(
+            timed(view.func, request, record, 'view', name_of(view.func)),
+            timed(view.render, request, record, 'render',
+                  name_of(view.render)),
+            view.permission, view.internal)
+        self.record = record
+
+    def identify(self, request):
+        start = timer()
+        try:
+            return super(TimedView, self).identify(request)
+        finally:
+            self.record(request, 'identity', request.app.__class__.__name__,
+                        timer() - start)
+
+    def permits(self, obj, request, identity):
+        start = timer()
+        try:
+            return super(TimedView, self).permits(obj, request, identity)
+        finally:
+            self.record(request, 'permits', name_of(self.permission),
+                        timer() - start)
+
+
+def timed(func, request, record, stage, label):
+    """Wrap a function so that it is timed.
+
+    :param func: the function to time.
+    :param request: the :class:`morepath.Request` to report for.
+    :param record: function to report durations to.
+    :param stage: the name of the stage.
+    :param label: the label of the stage.
+    :return: a function that takes the same arguments as ``func``.
+    """
+    def timed_func(*args):
+        start = timer()
+        try:
+            return func(*args)
+        finally:
+            record(request, stage, label, timer() - start)
+    return timed_func
+
+
+def name_of(obj):
+    """The name of a function or class to use as a label.
+    """
+    return getattr(obj, '__name__', None) or obj.__class__.__name__
+
+
+DEFAULT_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05,
+                   .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+"""Default upper bounds of the buckets of a :class:`Histogram`, in seconds.
+"""
+
+
+class Histogram(object):
+    """Timing callback that collects durations in histograms.
+
+    There is a histogram for each combination of stage and label. Use
+    it as a timing callback::
+
+      histogram = Histogram()
+      App.timing_callback()(histogram)
+
+    and use :meth:`render` to export the histograms in the Prometheus
+    text format.
+
+    :param name: the name of the metric.
+    :param buckets: the upper bounds of the buckets in seconds, in
+      increasing order.
+    """
+    def __init__(self, name='morepath_stage_duration_seconds',
+                 buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request, stage, label, duration):
+        self.observe(stage, label, duration)
+
+    def observe(self, stage, label, duration):
+        """Add a duration to the histogram of a stage and label.
+
+        :param stage: the name of the stage.
+        :param label: the label of the stage.
+        :param duration: the duration in seconds.
+        """
+        key = (stage, label)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [
+                    [0] * len(self.buckets), 0, 0.0]
+            counts = histogram[0]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    counts[i] += 1
+                    break
+            histogram[1] += 1
+            histogram[2] += duration
+
+    def render(self):
+        """Export the histograms in the Prometheus text format.
+
+        :return: the histograms as text.
+        """
+        name = self.name
+        lines = [
+            '# HELP %s Duration of the stages of publishing requests.' % name,
+            '# TYPE %s histogram' % name,
+        ]
+        with self._lock:
+            histograms = sorted(
+                (key, (list(counts), count, total))
+                for key, (counts, count, total) in self.histograms.items())
+        for (stage, label), (counts, count, total) in histograms:
+            labels = 'stage="%s",label="%s"' % (escape(stage), escape(label))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append('%s_bucket{%s,le="%r"} %d' % (
+                    name, labels, bound, cumulative))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' % (name, labels, count))
+            lines.append('%s_sum{%s} %r' % (name, labels, total))
+            lines.append('%s_count{%s} %d' % (name, labels, count))
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    """Escape a label value for the Prometheus text format.
+    """
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
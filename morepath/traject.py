@@ -27,13 +27,16 @@ For a description of a similar algorithm also read: http://littledev.nl/?p=99
 
 """
 
+import copy
 import re
 from functools import total_ordering
-from reg import arginfo
 from webob.exc import HTTPBadRequest
 
+from .cache import LRUCache
+from .compat import MappingProxyType
 from .converter import IDENTITY_CONVERTER
 from .error import TrajectError
+from .introspect import arginfo
 
 
 IDENTIFIER = re.compile(r'^[^\d\W]\w*$')
@@ -47,29 +50,66 @@ PATH_VARIABLE = re.compile(r'\{([^}]*)\}')
 """
 
 
+EMPTY_CONVERTERS = MappingProxyType({})
+"""Shared read-only converters of steps that have no converters.
+"""
+
+STEP_PATTERNS_SIZE = 4096
+"""The amount of segments for which :class:`Step` keeps the
+information derived from them.
+"""
+
+_step_patterns = LRUCache(STEP_PATTERNS_SIZE)
+"""Information shared by all steps with the same segment.
+
+This is bounded, so that processes that keep creating new routes don't
+keep the information for old ones. Steps that are still in use keep
+their own references to it.
+"""
+
+
 @total_ordering
 class Step(object):
     """A single step in the tree.
 
+    Steps with the same segment share the information derived from it,
+    such as the regular expression that matches it, to keep the tree
+    small for applications with many routes.
+
     :param s: the path segment, such as ``'foo'`` or ``'{variable}'`` or
       ``'foo{variable}bar'``.
     :param converters: dict of converters for variables.
     """
+    __slots__ = ('s', 'converters', 'generalized', 'parts', 'names',
+                 '_variables_re', 'cmp_converters',
+                 'named_interpolation_str')
+
     def __init__(self, s, converters=None):
         self.s = s
-        self.converters = converters or {}
-        self.generalized = generalize_variables(s)
-        self.parts = tuple(self.generalized.split('{}'))
-        self.names = parse_variables(s)
-        if len(set(self.names)) != len(self.names):
-            raise TrajectError("Duplicate variable")
-        self._variables_re = create_variables_re(s)
-        self.cmp_converters = [
-            self.converters.get(name, IDENTITY_CONVERTER)
-            for name in self.names]
-        self.validate()
-        self.named_interpolation_str = interpolation_str(s) % tuple(
-            [('%(' + name + ')s') for name in self.names])
+        self.converters = converters or EMPTY_CONVERTERS
+        pattern = _step_patterns.get(s)
+        if pattern is None:
+            self.generalized = generalize_variables(s)
+            self.parts = tuple(self.generalized.split('{}'))
+            self.names = parse_variables(s)
+            if len(set(self.names)) != len(self.names):
+                raise TrajectError("Duplicate variable")
+            self._variables_re = create_variables_re(s)
+            self.validate()
+            self.named_interpolation_str = interpolation_str(s) % tuple(
+                [('%(' + name + ')s') for name in self.names])
+            _step_patterns.put(s, (
+                self.generalized, self.parts, self.names,
+                self._variables_re, self.named_interpolation_str))
+        else:
+            (self.generalized, self.parts, self.names,
+             self._variables_re, self.named_interpolation_str) = pattern
+        if self.names:
+            self.cmp_converters = tuple(
+                self.converters.get(name, IDENTITY_CONVERTER)
+                for name in self.names)
+        else:
+            self.cmp_converters = ()
 
     def validate(self):
         """Validate whether step makes sense.
@@ -179,14 +219,30 @@ class Step(object):
         return self.parts > other.parts
 
 
+_NO_NAME_NODES = {}
+_NO_VARIABLE_NODES = ()
+
+
+def _no_model(variables, request):
+    return None
+
+
 class Node(object):
     """A node in the traject tree.
+
+    Most nodes in a large tree are leaves, so a node without children
+    shares empty containers with the other nodes, and gets its own
+    when the first child is added.
     """
+    __slots__ = ('_name_nodes', '_variable_nodes', 'absorb',
+                 'model_factory', 'create')
+
     def __init__(self):
-        self._name_nodes = {}
-        self._variable_nodes = []
+        self._name_nodes = _NO_NAME_NODES
+        self._variable_nodes = _NO_VARIABLE_NODES
         self.absorb = False
-        self.create = lambda variables, request: None
+        self.model_factory = None
+        self.create = _no_model
 
     def add(self, step):
         """Add a step into the tree as a child node of this node.
@@ -202,12 +258,16 @@ class Node(object):
         if node is not None:
             return node
         node = StepNode(step)
+        if self._name_nodes is _NO_NAME_NODES:
+            self._name_nodes = {}
         self._name_nodes[step.s] = node
         return node
 
     def add_variable_node(self, step):
         """Add a step into the tree as a node that matches variables.
         """
+        if self._variable_nodes is _NO_VARIABLE_NODES:
+            self._variable_nodes = []
         for i, node in enumerate(self._variable_nodes):
             if node.step == step:
                 return node
@@ -249,6 +309,8 @@ class StepNode(Node):
 
     :param step: the step
     """
+    __slots__ = ('step',)
+
     def __init__(self, step):
         super(StepNode, self).__init__()
         self.step = step
@@ -300,6 +362,8 @@ class TrajectRegistry(object):
     """
     def __init__(self):
         self._root = Node()
+        self._compiled = None
+        self.cache = None
 
     def add_pattern(self, path, model_factory, defaults=None,
                     converters=None, absorb=False, required=None,
@@ -342,8 +406,72 @@ class TrajectRegistry(object):
             variables.update(path_variables)
             return model_factory(**variables)
 
+        node.model_factory = model_factory
         node.create = create
         node.absorb = absorb
+        self._compiled = None
+        if self.cache is not None:
+            self.cache.clear()
+
+    def compile(self):
+        """Compile the tree into a flat state table.
+
+        After compilation :meth:`TrajectRegistry.match` uses a
+        :class:`CompiledTraject` instead of walking the tree. Matching
+        behavior is exactly the same. Adding a pattern afterwards
+        discards the compiled table again.
+        """
+        self._compiled = CompiledTraject(self._root)
+
+    def enable_cache(self, maxsize):
+        """Cache the results of matching paths.
+
+        :meth:`TrajectRegistry.consume` then looks up the unconsumed
+        segments in a :class:`morepath.cache.LRUCache` before it
+        matches them against the tree. Model instances are still
+        created for each request, and each request gets its own copy
+        of the path variables. The cache is available as the
+        ``cache`` attribute.
+
+        :param maxsize: the maximum amount of paths to cache.
+        """
+        self.cache = LRUCache(maxsize)
+
+    def match(self, stack):
+        """Match a stack of path segments against the tree.
+
+        The stack is not modified.
+
+        :param stack: a list of path segments in reverse order, like
+          :attr:`morepath.Request.unconsumed`.
+        :return: a ``node, variables, consumed`` tuple: the node that
+          matched, a dict with the path variables found, and the number
+          of segments consumed from the top of the stack.
+        """
+        if self._compiled is not None:
+            return self._compiled.match(stack)
+        node = self._root
+        variables = {}
+        i = len(stack)
+        while i:
+            if node.absorb:
+                variables['absorb'] = '/'.join(reversed(stack[:i]))
+                return node, variables, len(stack)
+            segment = stack[i - 1]
+            # special view prefix
+            if segment.startswith('+'):
+                break
+            new_node = node.resolve(segment, variables)
+            # could still be a view without prefix,
+            # or going into a mounted app
+            if new_node is None:
+                break
+            node = new_node
+            i -= 1
+        else:
+            if node.absorb:
+                variables['absorb'] = ''
+        return node, variables, len(stack) - i
 
     def consume(self, request):
         """Consume a stack given route, returning object.
@@ -361,30 +489,165 @@ class TrajectRegistry(object):
         :return: the model instance that can be found, or ``None`` if
           no model instance exists for this sequence of segments.
         """
+        node, variables = self.resolve(request)
+        return node.create(variables, request)
+
+    def resolve(self, request):
+        """Consume a stack given route, without creating the model.
+
+        Like :meth:`consume`, but returns the matched node instead of
+        calling its ``create``. This lets the caller decide how to
+        call the model factory, available as ``node.model_factory``.
+
+        :param request: the request to consume segments from.
+        :return: a ``(node, variables)`` tuple. Call
+          ``node.create(variables, request)`` to construct the model
+          instance. ``node.model_factory`` is ``None`` if no path was
+          registered for the node.
+        """
         stack = request.unconsumed
-        node = self._root
+        cache = self.cache
+        if cache is None:
+            node, variables, consumed = self.match(stack)
+        else:
+            key = tuple(stack)
+            result = cache.get(key)
+            if result is None:
+                node, variables, consumed = self.match(stack)
+                cache.put(key, (node, freeze_variables(variables), consumed))
+            else:
+                node, frozen, consumed = result
+                variables = thaw_variables(frozen)
+        if consumed:
+            del stack[-consumed:]
+        return node, variables
+
+
+IMMUTABLE_TYPES = frozenset([
+    type(None), bool, int, float, complex, str, bytes, type(u'')])
+"""Types of path variables that can be shared between requests."""
+
+
+def freeze_variables(variables):
+    """Store path variables so that they can be shared between requests.
+
+    :param variables: a dict of path variables.
+    :return: a ``(items, mutable)`` tuple: a tuple of the items in
+      ``variables``, and whether any of the values could be modified
+      in place, such as a list decoded by a converter.
+    """
+    items = tuple(variables.items())
+    mutable = any(type(value) not in IMMUTABLE_TYPES
+                  for name, value in items)
+    if mutable:
+        items = copy.deepcopy(items)
+    return items, mutable
+
+
+def thaw_variables(frozen):
+    """Get a new dict of path variables from stored ones.
+
+    :param frozen: the result of :func:`freeze_variables`.
+    :return: a dict of path variables that the caller can modify.
+    """
+    items, mutable = frozen
+    if mutable:
+        items = copy.deepcopy(items)
+    return dict(items)
+
+
+class CompiledTraject(object):
+    """The traject tree compiled into a flat state table.
+
+    Each node of the tree becomes a state tuple ``(names, steps, node,
+    absorb)``: a dict mapping literal segments to the next state, a
+    tuple of ``(match, state)`` pairs for the variable steps in
+    priority order, the original node and its absorb flag. Matching a
+    path is then a single loop over this table.
+
+    Steps that consist of a single variable, such as ``{id}``, get a
+    specialized match function that does not use a regular
+    expression.
+
+    :param root: the root :class:`Node` of the tree to compile.
+    """
+    def __init__(self, root):
+        self._root = compile_node(root)
+
+    def match(self, stack):
+        """Match a stack of path segments.
+
+        See :meth:`TrajectRegistry.match`.
+        """
+        state = self._root
         variables = {}
-        segment = None
-        while stack:
-            if node.absorb:
-                variables['absorb'] = '/'.join(reversed(stack))
-                request.unconsumed = []
-                return node.create(variables, request)
-            segment = stack.pop()
-            # special view prefix
+        i = len(stack)
+        while i:
+            names, steps, node, absorb = state
+            if absorb:
+                variables['absorb'] = '/'.join(reversed(stack[:i]))
+                return node, variables, len(stack)
+            segment = stack[i - 1]
             if segment.startswith('+'):
-                stack.append(segment)
-                return node.create(variables, request)
-            new_node = node.resolve(segment, variables)
-            # could still be a view without prefix,
-            # or going into a mounted app
-            if new_node is None:
-                stack.append(segment)
-                return node.create(variables, request)
-            node = new_node
-        if node.absorb:
-            variables['absorb'] = ''
-        return node.create(variables, request)
+                break
+            next_state = names.get(segment)
+            if next_state is None:
+                for step_match, candidate in steps:
+                    if step_match(segment, variables):
+                        next_state = candidate
+                        break
+                else:
+                    break
+            state = next_state
+            i -= 1
+        else:
+            if state[3]:
+                variables['absorb'] = ''
+        return state[2], variables, len(stack) - i
+
+
+def compile_node(node):
+    """Compile a node and its children into a state tuple.
+
+    See :class:`CompiledTraject`.
+
+    :param node: a :class:`Node`.
+    :return: a ``(names, steps, node, absorb)`` tuple.
+    """
+    names = {segment: compile_node(child)
+             for segment, child in node._name_nodes.items()}
+    steps = tuple((compile_step(child.step), compile_node(child))
+                  for child in node._variable_nodes)
+    return names, steps, node, node.absorb
+
+
+def compile_step(step):
+    """Create a match function for a step.
+
+    For a step that is a single variable, like ``{id}``, the segment
+    is taken as the value without using a regular expression. Segments
+    that the regular expression treats specially (empty ones, or ones
+    with a newline) are still matched by :meth:`Step.match`.
+
+    :param step: a :class:`Step`.
+    :return: a function that takes a segment and a variables dict and
+      returns a bool, like :meth:`Step.match`.
+    """
+    if step.parts != ('', ''):
+        return step.match
+    name = step.names[0]
+    decode = step.converters.get(name, IDENTITY_CONVERTER).decode
+    fallback = step.match
+
+    def match(segment, variables):
+        if not segment or '\n' in segment:
+            return fallback(segment, variables)
+        try:
+            variables[name] = decode([segment])
+        except ValueError:
+            return False
+        return True
+    return match
 
 
 class ParameterFactory(object):
@@ -404,6 +667,17 @@ class ParameterFactory(object):
         self.converters = converters
         self.required = required
         self.extra = extra
+        # resolve everything we can in advance, so that we only need
+        # to go through this plan for each request
+        parameters = parameters or {}
+        converters = converters or {}
+        required = required or ()
+        self._plan = tuple(
+            (name, default, converters.get(name, IDENTITY_CONVERTER),
+             name in required)
+            for name, default in parameters.items())
+        self._names = frozenset(parameters)
+        self._get_converter = converters.get
 
     def __call__(self, request):
         """Convert URL parameters to Python dictionary with values.
@@ -411,14 +685,24 @@ class ParameterFactory(object):
         result = {}
         # it's possible we are not actually interested in parameters
         # but this parameter factory is used as we defined converters
-        if not self.parameters:
+        if not self._plan:
             return result
-        url_parameters = request.GET
-        for name, default in self.parameters.items():
-            value = url_parameters.getall(name)
-            converter = self.converters.get(name, IDENTITY_CONVERTER)
+        # group the values by name in a single pass, instead of
+        # scanning the multidict for each parameter
+        url_parameters = {}
+        for name, value in request.GET.items():
+            values = url_parameters.get(name)
+            if values is None:
+                url_parameters[name] = [value]
+            else:
+                values.append(value)
+
+        for name, default, converter, required in self._plan:
+            value = url_parameters.get(name)
+            if value is None:
+                value = []
             if converter.is_missing(value):
-                if name in self.required:
+                if required:
                     raise HTTPBadRequest(
                         "Required URL parameter missing: %s" %
                         name)
@@ -434,12 +718,13 @@ class ParameterFactory(object):
         if not self.extra:
             return result
 
-        remaining = set(url_parameters.keys()).difference(
-            set(result.keys()))
+        names = self._names
+        get_converter = self._get_converter
         extra = {}
-        for name in remaining:
-            value = url_parameters.getall(name)
-            converter = self.converters.get(name, IDENTITY_CONVERTER)
+        for name, value in url_parameters.items():
+            if name in names:
+                continue
+            converter = get_converter(name, IDENTITY_CONVERTER)
             try:
                 extra[name] = converter.decode(value)
             except ValueError:
@@ -474,6 +759,8 @@ def parse_path(path):
     :param path: path string to parse
     :return: normalized list of path segments.
     """
+    if is_normalized_path(path):
+        return split_normalized_path(path)
     segments = path.split('/')
     result = []
     for segment in segments:
@@ -517,9 +804,48 @@ def normalize_path(path):
     :param path: path string to parse
     :return: normalized path.
     """
+    if is_normalized_path(path):
+        return path
     return create_path(parse_path(path))
 
 
+def is_normalized_path(path):
+    """Check cheaply whether a path is already normalized.
+
+    A path is normalized if it is what :func:`create_path` would
+    create for it: it is absolute, has no empty segments and no
+    trailing slash. To keep the check cheap, paths with a segment that
+    starts with a dot are never considered normalized, even though
+    ``/.hidden`` is:
+
+        >>> is_normalized_path('/a/b')
+        True
+        >>> is_normalized_path('/a/../b')
+        False
+
+    :param path: path string to check.
+    :return: True if the path is known to be normalized.
+    """
+    return (path[:1] == '/' and
+            '//' not in path and
+            '/.' not in path and
+            (path[-1] != '/' or len(path) == 1))
+
+
+def split_normalized_path(path):
+    """Split a normalized path into segments.
+
+    This is the same as :func:`parse_path`, but only works for paths
+    for which :func:`is_normalized_path` is true.
+
+    :param path: a normalized path.
+    :return: list of path segments.
+    """
+    if path == '/':
+        return []
+    return path[1:].split('/')
+
+
 def is_identifier(s):
     """Check whether a variable name is a proper identifier.
 
@@ -5,13 +5,111 @@ A tween is a function that takes a :class:`morepath.Request` and returns
 a :class:`morepath.Response`. A tween factory is a function that given
 an application instance and tween constructs another tween that wraps it.
 
+A tween factory can also return a :class:`TweenHooks` instance with
+functions to call before and after the tweens and publishing it wraps,
+and when they raise an exception. Consecutive tweens that use hooks
+are combined into a single handler that calls all hooks in a loop,
+which is faster than calling nested tweens.
+
 Used by :meth:`morepath.App.tween_factory`.
 
 See also :class:`morepath.directive.TweenRegistry`
 """
+import sys
+
+from .compat import reraise
 from .toposort import toposorted, Info
 
 
+class TweenHooks(object):
+    """Hooks that a tween factory can return instead of a tween.
+
+    All hooks are optional.
+
+    :param before: function that is called with the request before
+      the wrapped handler. If it returns a response, the wrapped
+      handler isn't called and this response is returned instead,
+      without calling ``after``.
+    :param after: function that is called with the request and the
+      response returned by the wrapped handler. It returns the
+      response to use, which can be the same response.
+    :param exception: function that is called with the request and the
+      exception if the wrapped handler raises an exception. It returns
+      a response to use instead, or ``None`` to let the exception
+      propagate.
+    """
+    def __init__(self, before=None, after=None, exception=None):
+        self.before = before
+        self.after = after
+        self.exception = exception
+
+    def tween(self, handler):
+        """Create a tween that calls the hooks around a handler.
+
+        :param handler: the handler to wrap, a function that takes a
+          request and returns a response.
+        :return: a tween.
+        """
+        return hooks_handler([self], handler)
+
+
+def hooks_handler(hooks, handler):
+    """Create a handler that calls hooks around a handler.
+
+    This behaves the same as wrapping ``handler`` in the tweens
+    created by :meth:`TweenHooks.tween` for each of the hooks, but
+    uses a single loop.
+
+    :param hooks: list of :class:`TweenHooks`, outermost first.
+    :param handler: the handler to wrap.
+    :return: a function that takes a request and returns a response.
+    """
+    amount = len(hooks)
+    # only the hooks that are set, with the level of their tween
+    befores = [(level, h.before) for level, h in enumerate(hooks)
+               if h.before is not None]
+    ascent = [(level, h.after, h.exception)
+              for level, h in reversed(list(enumerate(hooks)))
+              if h.after is not None or h.exception is not None]
+
+    def handle(request):
+        level = amount
+        exc_info = None
+        try:
+            for level, before in befores:
+                response = before(request)
+                if response is not None:
+                    break
+            else:
+                level = amount
+                response = handler(request)
+        except Exception:
+            exc_info = sys.exc_info()
+        # the hooks of the tweens below level have been entered
+        for hook_level, after, exception in ascent:
+            if hook_level >= level:
+                continue
+            if exc_info is None:
+                if after is not None:
+                    try:
+                        response = after(request, response)
+                    except Exception:
+                        exc_info = sys.exc_info()
+            elif exception is not None:
+                try:
+                    result = exception(request, exc_info[1])
+                except Exception:
+                    exc_info = sys.exc_info()
+                    continue
+                if result is not None:
+                    response = result
+                    exc_info = None
+        if exc_info is not None:
+            reraise(*exc_info)
+        return response
+    return handle
+
+
 class TweenRegistry(object):
     """Registry for tweens.
     """
@@ -44,12 +142,28 @@ class TweenRegistry(object):
 
         This wraps :func:`morepath.publish.publish` with tweens.
 
+        Consecutive tween factories that return :class:`TweenHooks`
+        are combined into a single handler with
+        :func:`hooks_handler`.
+
         :param app: an instance of :class:`morepath.App`.
         :return: the application wrapped with tweens. This is a function
           that takes request and returns a a response.
         """
         # to avoid circular import import publish here
-        from .publish import publish as result
+        from .publish import publish as handler
+        # hooks that wrap handler, outermost first
+        hooks = []
         for tween_factory in reversed(self.sorted_tween_factories()):
-            result = tween_factory(app, result)
-        return result
+            if hooks:
+                result = tween_factory(app, hooks_handler(hooks, handler))
+            else:
+                result = tween_factory(app, handler)
+            if isinstance(result, TweenHooks):
+                hooks.insert(0, result)
+                continue
+            hooks = []
+            handler = result
+        if hooks:
+            return hooks_handler(hooks, handler)
+        return handler
@@ -0,0 +1,128 @@
+"""Encoding of paths and URL parameters for link generation.
+
+This gives the same results as quoting the path with
+:func:`urllib.quote` (with ``/`` and ``~`` as safe characters) and
+encoding the URL parameters with :func:`morepath.path.fixed_urlencode`,
+but avoids most of the work for the common case where nothing needs
+to be quoted.
+
+See also :class:`morepath.path.PathInfo`.
+"""
+
+import re
+
+try:
+    # Python 2
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+
+SAFE_PATH = re.compile(r'[A-Za-z0-9_.\-~/]*\Z')
+"""regex that matches paths that need no quoting.
+"""
+
+SAFE_QUERY_VALUE = re.compile(r'[A-Za-z0-9_.\-~]*\Z')
+"""regex that matches URL parameter names and values that need no quoting.
+"""
+
+INTERPOLATION_VARIABLE = re.compile(r'%\(([^)]*)\)s')
+"""regex to find the variables in an interpolation path.
+"""
+
+
+def _query_table():
+    result = []
+    for i in range(256):
+        c = chr(i)
+        if SAFE_QUERY_VALUE.match(c):
+            result.append(c)
+        elif c == ' ':
+            result.append('+')
+        else:
+            result.append('%%%02X' % i)
+    return result
+
+
+QUERY_TABLE = _query_table()
+"""list that maps each byte to its quoted form in a URL parameter.
+"""
+
+
+def quote_path(path):
+    """Quote a path for use in a URL.
+
+    The result is the same as that of :func:`urllib.quote` for the
+    UTF-8 encoded path, with ``/`` and ``~`` as safe characters.
+
+    :param path: the path to quote.
+    :return: the quoted path.
+    """
+    if SAFE_PATH.match(path) is not None:
+        return path
+    return quote(path.encode('utf-8'), '/~')
+
+
+def quote_query_value(value):
+    """Quote a URL parameter name or value.
+
+    The result is the same as that of :func:`urllib.quote_plus` for
+    the UTF-8 encoded value, except that ``~`` is never quoted.
+
+    :param value: the text to quote.
+    :return: the quoted text.
+    """
+    if SAFE_QUERY_VALUE.match(value) is not None:
+        return value
+    table = QUERY_TABLE
+    return ''.join([table[b] for b in bytearray(value.encode('utf-8'))])
+
+
+def encode_query(parameters):
+    """Encode URL parameters.
+
+    The result is the same as :func:`morepath.path.fixed_urlencode` with
+    ``doseq`` for the parameters with the values encoded as UTF-8.
+
+    :param parameters: a dict with as keys the parameter names and as
+      values lists of values.
+    :return: the encoded parameters, without a leading ``?``.
+    """
+    result = []
+    for name, values in parameters.items():
+        name = quote_query_value(str(name)) + '='
+        for value in values:
+            result.append(name + quote_query_value(value))
+    return '&'.join(result)
+
+
+class PathTemplate(object):
+    """Quotes paths created from an interpolation path.
+
+    The static parts of the interpolation path are quoted once, so that
+    only the variable values need to be quoted for each path.
+
+    :param interpolation_path: a string such as ``'foo/%(id)s'``, as
+      created by :meth:`morepath.traject.Path.interpolation_str`.
+    """
+    def __init__(self, interpolation_path):
+        parts = INTERPOLATION_VARIABLE.split(interpolation_path)
+        self.static = [quote_path(part.replace('%%', '%'))
+                       for part in parts[0::2]]
+        self.names = parts[1::2]
+
+    def quote(self, path, variables):
+        """Quote a path.
+
+        :param path: the path, interpolated with ``variables``.
+        :param variables: dict with the variables used to create the path.
+        :return: the quoted path.
+        """
+        if SAFE_PATH.match(path) is not None:
+            return path
+        static = self.static
+        result = [static[0]]
+        for name, part in zip(self.names, static[1:]):
+            result.append(quote_path('%s' % (variables[name],)))
+            result.append(part)
+        return ''.join(result)
@@ -6,16 +6,26 @@ dict) that should be rendered *to* a response. If the view is a JSON
 view this dumps this structure as JSON. If the view is a HTML view
 this structure can be converted to HTML using a template.
 
-:func:`morepath.render_json`, :func:`morepath.render_html` and
-:func:`morepath.redirect` are members of the public API.
+:func:`morepath.render_json`, :func:`morepath.render_json_stream`,
+:func:`morepath.render_html` and :func:`morepath.redirect` are members
+of the public API.
 
 """
 
 import json
+from reg import Dispatch
 from webob.exc import HTTPFound, HTTPNotFound, HTTPForbidden
 from webob import Response as BaseResponse
 
 from .request import Response
+from .cache import LRUCache
+from .predicate import PredicateRegistry
+from .settings import SettingRegistry, get_setting
+
+
+STREAM_CHUNK_SIZE = 1000
+"""Amount of items per chunk produced by :func:`render_json_stream`.
+"""
 
 
 class View(object):
@@ -57,12 +67,53 @@ class View(object):
         :param request: the request
         :return: A :class:`webob.response.Response` instance.
         """
+        self.check(obj, request)
+        return self.respond(self.func(obj, request), request)
+
+    def check(self, obj, request):
+        """Check whether this view may be rendered.
+
+        :param obj: the model instance
+        :param request: the request
+        :raises: :class:`webob.exc.HTTPNotFound` if the view is
+          internal, :class:`webob.exc.HTTPForbidden` if the identity
+          does not have the permission.
+        """
         if self.internal:
             raise HTTPNotFound()
-        if self.permission is not None and\
-           not request.app._permits(request.identity, obj, self.permission):
-            raise HTTPForbidden()
-        content = self.func(obj, request)
+        if self.permission is not None:
+            if not self.permits(obj, request, self.identify(request)):
+                raise HTTPForbidden()
+
+    def identify(self, request):
+        """Get the identity to check the permission of this view for.
+
+        :param request: the request
+        :return: :attr:`morepath.Request.identity`.
+        """
+        return request.identity
+
+    def permits(self, obj, request, identity):
+        """Check whether the identity has the permission of this view.
+
+        :param obj: the model instance
+        :param request: the request
+        :param identity: the identity, as returned by :meth:`identify`.
+        :return: ``True`` if the identity has the permission.
+        """
+        app = request.app
+        return app.config.permission_memo.permits(
+            app, request, identity, obj, self.permission)
+
+    def respond(self, content, request):
+        """Turn the return value of the view function into a response.
+
+        Runs the functions specified using :meth:`morepath.Request.after`.
+
+        :param content: the value returned by the view function.
+        :param request: the request
+        :return: A :class:`webob.response.Response` instance.
+        """
         if isinstance(content, BaseResponse):
             # the view took full control over the response
             response = content
@@ -74,6 +125,207 @@ class View(object):
         return response
 
 
+class ViewLookup(object):
+    """Look up views for requests, with a cache.
+
+    When only the view predicates of :mod:`morepath.core` are
+    installed for :meth:`morepath.App.get_view`, the predicate key is
+    computed directly from the model class, the view name, the request
+    method and the class of the request body object. The view (or
+    fallback) found for this key is kept in a
+    :class:`morepath.cache.LRUCache`, available as the ``cache``
+    attribute.
+
+    Its size is controlled by the ``cache_size`` setting in the
+    ``view`` section, 1000 by default. Use ``0`` to disable the
+    cache.
+
+    If no view is registered with a ``body_model`` predicate other
+    than ``object``, :attr:`morepath.Request.body_obj` is not needed
+    to look up a view, and the body of the request is not read. The
+    :class:`morepath.directive.ViewAction` records this in
+    ``uses_body_model``.
+
+    If other predicates are installed, or before :meth:`install` is
+    called, lookup is done by :meth:`morepath.App.get_view` itself.
+    """
+    app_class_arg = True
+
+    factory_arguments = {
+        'predicate_registry': PredicateRegistry,
+        'setting_registry': SettingRegistry,
+    }
+
+    def __init__(self, app_class, predicate_registry, setting_registry):
+        self.app_class = app_class
+        self.predicate_registry = predicate_registry
+        self.setting_registry = setting_registry
+        self.cache = None
+        self.core_predicates = False
+        self.uses_body_model = False
+
+    def install(self):
+        """Set up the lookup once settings and predicates are known.
+        """
+        cache_size = get_setting(
+            self.setting_registry, 'view', 'cache_size', 1000)
+        self.cache = LRUCache(cache_size) if cache_size else None
+        # avoid circular import
+        from .core import (model_predicate, name_predicate,
+                           request_method_predicate, body_model_predicate)
+        funcs = self.predicate_registry.predicate_functions('get_view')
+        self.core_predicates = (
+            len(funcs) == 4 and
+            set(funcs) == {model_predicate, name_predicate,
+                           request_method_predicate, body_model_predicate})
+
+    def __call__(self, app, obj, request):
+        """Look up the view for ``obj`` and call it.
+
+        :param app: the :class:`morepath.App` instance to look up
+          the view in.
+        :param obj: model object to represent with view.
+        :param request: :class:`morepath.Request` instance.
+        :return: :class:`morepath.Response` object.
+        """
+        if not self.core_predicates:
+            return app.get_view(obj, request)
+        return self.view(app, obj, request)(app, obj, request)
+
+    def view(self, app, obj, request):
+        """Look up the view for ``obj`` without calling it.
+
+        :param app: the :class:`morepath.App` instance to look up
+          the view in. Predicates other than the core ones are called
+          with it.
+        :param obj: model object to represent with view.
+        :param request: :class:`morepath.Request` instance.
+        :return: the registered :class:`View`, the predicate fallback,
+          or the implementation of :meth:`morepath.App.get_view`.
+          Call it with the app, ``obj`` and ``request``.
+        """
+        if not self.core_predicates:
+            # the predicate_key of a dispatch method passes None for
+            # self, so use that of the plain dispatch to pass the app
+            dispatch = self.app_class.get_view.predicate_key.__self__
+            return self.lookup(
+                Dispatch.predicate_key(dispatch, app, obj, request))
+        method = request.method
+        # this mirrors what the predicates in morepath.core do
+        if method == 'GET' or not self.uses_body_model:
+            body_class = None.__class__
+        else:
+            body_class = request.body_obj.__class__
+        key = (obj.__class__, request.view_name, method, body_class)
+        cache = self.cache
+        if cache is None:
+            return self.lookup(key)
+        func = cache.get(key)
+        if func is None:
+            func = self.lookup(key)
+            cache.put(key, func)
+        return func
+
+    def lookup(self, key):
+        """Look up the view function for a predicate key.
+
+        :param key: a ``(model class, view name, request method,
+          body class)`` tuple.
+        :return: the registered :class:`View`, the predicate fallback,
+          or the implementation of :meth:`morepath.App.get_view`.
+        """
+        get_view = self.app_class.get_view
+        key_lookup = get_view.key_lookup
+        return (key_lookup.component(key) or
+                key_lookup.fallback(key) or
+                get_view.wrapped_func)
+
+
+class JsonRegistry(object):
+    """Serialize JSON for :func:`render_json` and
+    :func:`render_json_stream`, and configure reading JSON bodies.
+
+    It is configured with the settings in the ``json`` section:
+
+    ``encoder``
+      a function that serializes an object to JSON, returning ``str``
+      or ``bytes``, like :func:`json.dumps`. It must take a ``default``
+      keyword argument if ``recursive`` is true. Use it to plug in a
+      faster JSON library. The default is :func:`json.dumps`.
+
+    ``recursive``
+      if true, objects inside the structure returned by
+      :meth:`morepath.App.dump_json` that the encoder cannot serialize
+      are passed to :meth:`morepath.App.dump_json` too, through the
+      ``default`` hook of the encoder. The default is ``False``: only
+      the object returned by the view is dumped.
+
+    ``stream_arrays``
+      if true, :attr:`morepath.Request.body_obj` of a request with a
+      JSON array as its body is the first item, so that
+      :meth:`morepath.Request.iter_body_objs` can read the rest of the
+      items incrementally. The default is ``False``.
+
+    :param setting_registry: a :class:`morepath.settings.SettingRegistry`
+      instance.
+    """
+    factory_arguments = {
+        'setting_registry': SettingRegistry,
+    }
+
+    def __init__(self, setting_registry):
+        self.setting_registry = setting_registry
+        self.encoder = json.dumps
+        self.recursive = False
+        self.stream_arrays = False
+
+    def install(self):
+        """Set up serialization with the settings.
+        """
+        settings = self.setting_registry
+        self.encoder = get_setting(settings, 'json', 'encoder', json.dumps)
+        self.recursive = get_setting(settings, 'json', 'recursive', False)
+        self.stream_arrays = get_setting(
+            settings, 'json', 'stream_arrays', False)
+
+    def dumps(self, obj, request):
+        """Serialize an object that is JSON in Python form.
+
+        :param obj: the object to serialize, as returned by
+          :meth:`morepath.App.dump_json`.
+        :param request: a :class:`morepath.Request` instance.
+        :return: the JSON as ``bytes`` encoded in UTF-8.
+        """
+        if self.recursive:
+            result = self.encoder(obj, default=dump_json_hook(request))
+        else:
+            result = self.encoder(obj)
+        if isinstance(result, bytes):
+            return result
+        return result.encode('utf-8')
+
+
+def dump_json_hook(request):
+    """Create a ``default`` hook for a JSON encoder.
+
+    The hook uses :meth:`morepath.App.dump_json` to convert objects.
+
+    :param request: a :class:`morepath.Request` instance.
+    :return: a function that takes an object and returns its JSON
+      representation, or raises :exc:`TypeError` if there is no
+      ``dump_json`` for it.
+    """
+    dump_json = request.app._dump_json
+
+    def default(obj):
+        result = dump_json(obj, request)
+        if result is obj:
+            raise TypeError("Object of type %s is not JSON serializable" %
+                            obj.__class__.__name__)
+        return result
+    return default
+
+
 def render_view(content, request):
     """Default render function for view if none was supplied.
 
@@ -92,17 +344,94 @@ def render_json(content, request):
 
     This respects the :meth:`morepath.App.dump_json` directive that
     can be used to serialize any object to JSON. By default this
-    serializes Python objects like dicts, strings to JSON.
+    serializes Python objects like dicts, strings to JSON. The
+    ``json`` settings described in :class:`JsonRegistry` control
+    the serialization.
 
     :param content: content as returned from view function.
     :param request: a :class:`morepath.Request` instance.
     :return: a :class:`morepath.Response` instance with a serialized
       JSON body.
     """
-    return Response(json.dumps(request.app._dump_json(content, request)),
+    app = request.app
+    return Response(
+        body=app.config.json_registry.dumps(
+            app._dump_json(content, request), request),
+        content_type='application/json')
+
+
+def render_json_stream(content, request):
+    """Take an iterable and return a response that streams a json array.
+
+    Each item of ``content`` is converted separately, respecting the
+    :meth:`morepath.App.dump_json` directive, and serialized in chunks
+    of :data:`STREAM_CHUNK_SIZE` items. The response body is produced
+    while it is sent, so ``content`` can be a generator that produces
+    a large amount of items without keeping them all in memory.
+
+    Since the response headers are sent before the items are
+    serialized, an error while producing the items cannot result in
+    an error response anymore.
+
+    Used by :meth:`morepath.App.json` if ``stream`` is true.
+
+    :param content: iterable of items as returned from view function.
+    :param request: a :class:`morepath.Request` instance.
+    :return: a :class:`morepath.Response` instance with an app_iter
+      that produces the JSON array.
+    """
+    return Response(app_iter=iter_json_array(content, request),
                     content_type='application/json')
 
 
+def iter_json_array(content, request, chunk_size=STREAM_CHUNK_SIZE):
+    """Serialize items as a JSON array, in chunks.
+
+    Each chunk is serialized as an array by the ``json`` encoder, and
+    its items are joined with the separator the encoder uses between
+    array items. With the default encoder the result is the same as
+    serializing the list of all items with :func:`render_json`; other
+    encoders, for instance ones that indent, produce the same JSON
+    but whitespace can differ.
+
+    :param content: iterable of items to serialize.
+    :param request: a :class:`morepath.Request` instance.
+    :param chunk_size: the amount of items serialized per chunk.
+    :return: iterator of ``bytes`` chunks.
+    """
+    app = request.app
+    dump_json = app._dump_json
+    dumps = app.config.json_registry.dumps
+
+    def dump_items(items):
+        # the items of the array, without the brackets and any
+        # whitespace around them
+        result = dumps(items, request).strip()
+        if not (result.startswith(b'[') and result.endswith(b']')):
+            raise ValueError(
+                "JSON encoder did not serialize a list to an array: %r" %
+                result)
+        return result[1:-1].strip()
+
+    separator = None
+    batch = []
+    for item in content:
+        batch.append(dump_json(item, request))
+        if len(batch) == chunk_size:
+            if separator is None:
+                separator = dump_items([0, 0])[1:-1]
+                yield b'[' + dump_items(batch)
+            else:
+                yield separator + dump_items(batch)
+            batch = []
+    if separator is None:
+        yield b'[' + dump_items(batch) + b']'
+    elif batch:
+        yield separator + dump_items(batch) + b']'
+    else:
+        yield b']'
+
+
 def render_html(content, request):
     """Take string and return text/html response.
 
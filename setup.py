@@ -35,8 +35,8 @@ setup(
     install_requires=[
         'setuptools',
         'webob >= 1.3.1',
-        'reg >= 0.10',
-        'dectate >= 0.12',
+        'reg >= 0.10, < 0.11',
+        'dectate >= 0.12, < 0.14',
         'importscan',
     ],
     extras_require=dict(